@@ -1,5 +1,4 @@
-from flask import Blueprint, render_template, request, redirect, url_for, session, flash
-from supabase import create_client, Client
+from flask import Blueprint, render_template, request, redirect, url_for, session, flash, Response
 from functools import wraps
 import os
 from datetime import datetime, timedelta
@@ -7,7 +6,17 @@ import json # For handling JSON data from user_progress
 import uuid
 from collections import Counter, defaultdict
 from werkzeug.utils import secure_filename
+from postgrest.exceptions import APIError
 import re, requests
+import question_sampler
+import catalog_cache
+import inventory_service
+import user_cache
+import write_buffer
+import fanout
+import metrics
+import profiler
+from services import supabase  # 🔐 shared, created on first use
 
 # For password hashing (Highly Recommended!)
 from werkzeug.security import generate_password_hash, check_password_hash
@@ -15,10 +24,6 @@ from werkzeug.security import generate_password_hash, check_password_hash
 # 📘 Blueprint setup
 admin_bp = Blueprint('admin', __name__, template_folder='templates/admin')
 
-# 🔐 Supabase connection
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 
 # 📅 Inject current year for layout template footer
 @admin_bp.context_processor
@@ -27,18 +32,62 @@ def inject_year():
     return {'year': datetime.now().year}
 
 # 🔒 Admin-only access decorator
+def is_admin():
+    """True when the logged-in user has the 'admin' role."""
+    return 'user_id' in session and session.get('role') == 'admin'
+
 def admin_required(f):
     """Decorator to restrict access to admin users only."""
     @wraps(f)
     def decorated_function(*args, **kwargs):
         # Check if user is logged in and has 'admin' role
-        if 'user_id' not in session or session.get('role') != 'admin':
+        if not is_admin():
             # Flash a message for unauthorized access
             flash("You do not have permission to access this page.", "danger")
             return redirect(url_for('index')) # Redirect to a non-admin page, e.g., home
         return f(*args, **kwargs)
     return decorated_function
 
+# 📄 Long lists (questions, distractors) are shown a page at a time
+ADMIN_PAGE_SIZE = 50
+
+def paginate(make_query):
+    """
+    Run `make_query()` (selected with count="exact") for the requested ?page=;
+    returns (rows, page, total_pages). A page past the end (a stale link, or the
+    last row of the last page deleted) shows the last page instead.
+    """
+    page = max(request.args.get('page', 1, type=int), 1)
+    try:
+        result = make_query().range((page - 1) * ADMIN_PAGE_SIZE, page * ADMIN_PAGE_SIZE - 1).execute()
+    except APIError as e:
+        if e.code != 'PGRST103':  # Requested range not satisfiable
+            raise
+        total = make_query().range(0, 0).execute().count or 0
+        page = max((total + ADMIN_PAGE_SIZE - 1) // ADMIN_PAGE_SIZE, 1)
+        result = make_query().range((page - 1) * ADMIN_PAGE_SIZE, page * ADMIN_PAGE_SIZE - 1).execute()
+    total_pages = ((result.count or 0) + ADMIN_PAGE_SIZE - 1) // ADMIN_PAGE_SIZE
+    return result.data or [], page, total_pages
+
+def _question_counts(max_level):
+    """Counter of questions per level, for levels 1..max_level."""
+    try:
+        rows = supabase.rpc('question_counts_by_level', {'p_max_level': max_level}).execute().data or []
+        return Counter({row['level']: row['questions'] for row in rows})
+    except APIError as e:
+        if e.code != 'PGRST202':  # Could not find the function
+            raise
+        # sql/question_counts_by_level.sql not applied yet: count the levels a page at a time
+        counts = Counter()
+        offset = 0
+        while True:
+            page = supabase.table('questionanswer').select('level').lte('level', max_level) \
+                .order('id').range(offset, offset + question_sampler.PAGE_SIZE - 1).execute().data or []
+            counts.update(row['level'] for row in page)
+            if len(page) < question_sampler.PAGE_SIZE:
+                return counts
+            offset += len(page)
+
 # --- User Management ---
 
 @admin_bp.route('/dashboard')
@@ -102,52 +151,41 @@ def manage_users():
 def user_detail(user_id):
     """Displays the detailed profile of a specific user."""
     
-    # Fetch basic user info
-    user_response = supabase.table('users').select('*').eq('id', str(user_id)).single().execute()
-    user = user_response.data if user_response.data else None
+    uid = str(user_id)
+
+    # All of these reads are independent, so run them in parallel (see fanout.py)
+    results = fanout.run(
+        # Fetch basic user info
+        user=lambda: supabase.table('users').select('*').eq('id', uid).single().execute(),
+        # Current avatar
+        user_avatar=lambda: supabase.table('user_avatars').select('avatars(*)') \
+            .eq('user_id', uid).limit(1).execute(),
+        # All avatars (still needed for context, even if not used for selection form)
+        all_avatars=lambda: supabase.table('avatars').select('*').execute(),
+        # User's items (quantities merged with the cached items catalog)
+        user_items=lambda: inventory_service.get_inventory(supabase, uid),
+        # All available items (still needed for context, even if not used for adding form)
+        all_items=lambda: supabase.table('items').select('*').execute(),
+        # ✅ Fetch user's progress data
+        progress=lambda: supabase.table('user_progress').select('*').eq('user_id', uid).execute()
+    )
+
+    user = results['user'].data if results['user'].data else None
 
     if not user:
         flash("User not found.", "danger")
         return redirect(url_for('admin.admin_dashboard'))
 
-    # Current avatar
-    user_avatar_response = supabase.table('user_avatars').select('avatars(*)') \
-        .eq('user_id', str(user_id)).limit(1).execute()
+    user_avatar_response = results['user_avatar']
     user_avatar = user_avatar_response.data[0]['avatars'] if user_avatar_response.data and user_avatar_response.data[0] and 'avatars' in user_avatar_response.data[0] else None
+    all_avatars = results['all_avatars'].data if results['all_avatars'].data else []
+    user_items = results['user_items']
+    all_items = results['all_items'].data if results['all_items'].data else []
+    user_progress_data = results['progress'].data if results['progress'].data else []
 
-    # All avatars (still needed for context, even if not used for selection form)
-    all_avatars_response = supabase.table('avatars').select('*').execute()
-    all_avatars = all_avatars_response.data if all_avatars_response.data else []
-
-    # Fetch user_items (item_id, quantity)
-    user_items_raw = supabase.table("user_items") \
-        .select("item_id, quantity") \
-        .eq("user_id", str(user_id)) \
-        .execute().data
-
-    # Get item details for user's items
-    user_items = []
-    if user_items_raw:
-        item_ids = [item["item_id"] for item in user_items_raw]
-        item_data = supabase.table("items").select("id, name, description, filename, price").in_("id", item_ids).execute().data
-        
-        # Merge item details with user_item quantities
-        for item_detail in item_data:
-            matching_user_item = next((ui for ui in user_items_raw if ui["item_id"] == item_detail["id"]), None)
-            if matching_user_item:
-                item_detail["quantity"] = matching_user_item.get("quantity", 0)
-                # Ensure the correct Supabase Storage bucket for items (should match inventory: /shopitems/)
-                item_detail["image_url"] = f"https://uktdymsgfgodbwesdvsj.supabase.co/storage/v1/object/public/shopitems/{item_detail['filename']}"
-                user_items.append(item_detail)
-
-    # All available items (still needed for context, even if not used for adding form)
-    all_items_response = supabase.table('items').select('*').execute()
-    all_items = all_items_response.data if all_items_response.data else []
-
-    # ✅ Fetch user's progress data
-    user_progress_data_response = supabase.table('user_progress').select('*') \
-                                          .eq('user_id', str(user_id)).execute()
-    user_progress_data = user_progress_data_response.data if user_progress_data_response.data else []
+    # Question counts for every level we'll show, in one query instead of one per level
+    max_unlocked = max((p.get('highest_unlocked') or 1 for p in user_progress_data), default=0)
+    question_counts = _question_counts(max_unlocked) if max_unlocked else Counter()
 
     # --- DETAILED PROGRESS ---
     detailed_progress = []
@@ -168,8 +206,7 @@ def user_detail(user_id):
             else:
                 score_value = best_score
             # Get total questions for this level in this lesson
-            q_count_resp = supabase.table('questionanswer').select('id').eq('level', lvl).execute()
-            total_questions = len(q_count_resp.data) if q_count_resp.data else 0
+            total_questions = question_counts[lvl]
             # Mastered if score_value >= 80
             mastered = score_value >= 80
             levels.append({
@@ -224,8 +261,11 @@ def edit_user(user_id):
             'current_exp': current_exp
         }
 
-        # Update user in Supabase
+        # Update user in Supabase (buffered coin grants land first, so the
+        # admin's coin value is the final one)
+        write_buffer.flush_user(supabase, str(user_id))
         response = supabase.table('users').update(update_data).eq('id', str(user_id)).execute()
+        user_cache.invalidate(str(user_id))
 
         if response.data:
             flash(f"User '{username}' updated successfully!", "success")
@@ -293,6 +333,7 @@ def delete_user(user_id):
 
     # Finally, delete the user from the users table
     response = supabase.table('users').delete().eq('id', str(user_id)).execute()
+    user_cache.invalidate(str(user_id))
 
     if response.data:
         flash("User and all associated data deleted successfully!", "success")
@@ -352,6 +393,7 @@ def add_item():
                 'description': description,
                 'required_level': required_level
             }).execute()
+            catalog_cache.invalidate('items')
             flash("Item added successfully!", "success")
             return redirect(url_for('admin.manage_items'))
         except Exception as e:
@@ -392,6 +434,7 @@ def edit_item(item_id):
                 'description': description,
                 'required_level': required_level
             }).eq('id', item_id).execute()
+            catalog_cache.invalidate('items')
 
             if response.data:
                 flash("Item updated successfully!", "success")
@@ -418,6 +461,7 @@ def edit_item(item_id):
 def delete_item(item_id):
     try:
         response = supabase.table('items').delete().eq('id', item_id).execute()
+        catalog_cache.invalidate('items')
         if response.data:
             flash("Item deleted successfully!", "success")
         else:
@@ -475,6 +519,7 @@ def add_avatar():
                 'price': int(price),
                 'description': description
             }).execute()
+            catalog_cache.invalidate('avatars')
 
             flash("Avatar uploaded and added successfully!", "success")
             return redirect(url_for('admin.manage_avatars'))
@@ -516,6 +561,7 @@ def edit_avatar(avatar_id):
                 'price': price,
                 'description': description
             }).eq('id', avatar_id).execute()
+            catalog_cache.invalidate('avatars')
 
             if response.data:
                 flash("Avatar updated successfully!", "success")
@@ -542,6 +588,7 @@ def edit_avatar(avatar_id):
 def delete_avatar(avatar_id):
     try:
         response = supabase.table('avatars').delete().eq('id', avatar_id).execute()
+        catalog_cache.invalidate('avatars')
         if response.data:
             flash("Avatar deleted successfully!", "success")
         else:
@@ -604,6 +651,7 @@ def upload_lesson():
                 column: content,
                 "level": level
             }).execute()
+            catalog_cache.invalidate_content(f"lesson:{lang}:")
 
             flash(f"{lang.capitalize()} lesson for level {level} uploaded successfully!", "success")
             return redirect(url_for('admin.upload_lesson'))
@@ -653,13 +701,15 @@ def edit_lesson(lang, level):
                 file=updated_content.encode('utf-8'),
                 file_options={"content-type": "text/plain", "x-upsert": "true"}
             )
+            catalog_cache.invalidate_content(f"lesson:{lang}:")
             flash(f"{filename} updated successfully!", "success")
             return redirect(url_for('admin.manage_lessons'))
         except Exception as e:
             flash(f"Update failed: {e}", "danger")
 
     try:
-        res = requests.get(file_url)
+        with metrics.upstream("storage"):
+            res = requests.get(file_url)
         res.raise_for_status()
         content = res.text
     except Exception as e:
@@ -680,8 +730,16 @@ def dashboard():
     week_ago = now - timedelta(days=7)
     month_ago = now - timedelta(days=30)
 
+    # All dashboard queries are independent, so run them in parallel (see fanout.py)
+    tables = ['users', 'user_progress', 'questionanswer', 'items', 'avatars',
+              'tagalog_lessons', 'waray_lessons', 'cebuano_lessons']
+    responses = fanout.run(**{
+        table: (lambda table=table: supabase.table(table).select('*').execute())
+        for table in tables
+    })
+
     # 🔍 Fetch all users
-    users_response = supabase.table('users').select('*').execute()
+    users_response = responses['users']
     users = users_response.data
 
     total_users = len(users)
@@ -691,20 +749,20 @@ def dashboard():
     total_admins = sum(1 for u in users if u.get('role') == 'admin')
 
     # ✅ Active user logic: simulate "active" based on recent progress
-    progress_response = supabase.table('user_progress').select('*').execute()
+    progress_response = responses['user_progress']
     progress = progress_response.data
     active_user_ids = {p['user_id'] for p in progress if p.get('lesson') and p.get('highest_unlocked', 0) > 1}
     active_users_today = len(active_user_ids)
 
     # 📊 Additional Platform Statistics
     # Fetch questions, items, avatars counts
-    questions_response = supabase.table('questionanswer').select('*').execute()
+    questions_response = responses['questionanswer']
     total_questions = len(questions_response.data) if questions_response.data else 0
 
-    items_response = supabase.table('items').select('*').execute()
+    items_response = responses['items']
     total_items = len(items_response.data) if items_response.data else 0
 
-    avatars_response = supabase.table('avatars').select('*').execute()
+    avatars_response = responses['avatars']
     total_avatars = len(avatars_response.data) if avatars_response.data else 0
 
     # 📊 Economy Overview
@@ -725,9 +783,9 @@ def dashboard():
         })
 
     # 📊 Total Lessons (across all languages)
-    tagalog_lessons = supabase.table('tagalog_lessons').select('*').execute()
-    waray_lessons = supabase.table('waray_lessons').select('*').execute()
-    cebuano_lessons = supabase.table('cebuano_lessons').select('*').execute()
+    tagalog_lessons = responses['tagalog_lessons']
+    waray_lessons = responses['waray_lessons']
+    cebuano_lessons = responses['cebuano_lessons']
     
     total_tagalog = len(tagalog_lessons.data) if tagalog_lessons.data else 0
     total_waray = len(waray_lessons.data) if waray_lessons.data else 0
@@ -828,17 +886,18 @@ def manage_questions():
     level = request.args.get("level")
     type_filter = request.args.get("type")
 
-    query = supabase.table("questionanswer").select("*")
+    def make_query():
+        query = supabase.table("questionanswer").select("*", count="exact")
+        if level:
+            query = query.eq("level", int(level))
+        if type_filter:
+            query = query.eq("type", type_filter)
+        return query.order("level").order("itemnum").order("id")
 
-    if level:
-        query = query.eq("level", int(level))
-    if type_filter:
-        query = query.eq("type", type_filter)
+    questions, page, total_pages = paginate(make_query)
 
-    result = query.order("level").order("itemnum").execute()
-    questions = result.data
-
-    return render_template("admin/questions/manage_questions.html", questions=questions, title="Manage Questions")
+    return render_template("admin/questions/manage_questions.html", questions=questions, title="Manage Questions",
+                           page=page, total_pages=total_pages)
 
 
 
@@ -871,6 +930,7 @@ def add_question():
             "type": request.form["type"]
         }
         supabase.table("questionanswer").insert(data).execute()
+        question_sampler.invalidate(level)
         flash("Question added successfully!", "success")
         return redirect(url_for('admin.manage_questions'))
 
@@ -909,6 +969,7 @@ def edit_question(question_id):
             "type": request.form["type"]
         }
         supabase.table("questionanswer").update(updated).eq("id", question_id).execute()
+        question_sampler.invalidate()  # level may have changed, drop every pool
         flash("Question updated successfully", "success")
         return redirect(url_for('admin.manage_questions'))
 
@@ -919,6 +980,7 @@ def edit_question(question_id):
 @admin_bp.route('/questions/delete/<int:question_id>', methods=['POST'])
 def delete_question(question_id):
     supabase.table("questionanswer").delete().eq("id", question_id).execute()
+    question_sampler.invalidate()
     flash("Question deleted", "danger")
     return redirect(url_for('admin.manage_questions'))
 
@@ -932,19 +994,21 @@ def manage_distractors():
     level = request.args.get("level", type=int)
     itemnum = request.args.get("itemnum", type=int)
 
-    query = supabase.table("distractor").select("*")
-
-    if level:
-        query = query.eq("level", level)
-    if itemnum:
-        query = query.eq("itemnum", itemnum)
+    def make_query():
+        query = supabase.table("distractor").select("*", count="exact")
+        if level:
+            query = query.eq("level", level)
+        if itemnum:
+            query = query.eq("itemnum", itemnum)
+        return query.order("level").order("itemnum").order("id")
 
-    result = query.order("level").order("itemnum").execute()
-    distractors = result.data
+    distractors, page, total_pages = paginate(make_query)
 
     return render_template("admin/distractors/manage_distractors.html", 
                          distractors=distractors, 
-                         title="Manage Distractors")
+                         title="Manage Distractors",
+                         page=page,
+                         total_pages=total_pages)
 
 
 @admin_bp.route('/distractors/add', methods=['GET', 'POST'])
@@ -1129,19 +1193,19 @@ def process_bulk_add_distractors():
     
     # Get all form data
     form_data = request.form.to_dict()
-    
+
+    # Items that already have a distractor are skipped (one query for all of them)
+    existing = supabase.table("distractor")\
+        .select("itemnum")\
+        .eq("level", level)\
+        .execute()
+    existing_itemnums = {row["itemnum"] for row in existing.data or []}
+
+    rows = []
     for key, value in form_data.items():
         if key.startswith('itemnum_'):
             itemnum = int(key.replace('itemnum_', ''))
-            
-            # Check if this question already has a distractor
-            existing = supabase.table("distractor")\
-                .select("id")\
-                .eq("level", level)\
-                .eq("itemnum", itemnum)\
-                .execute()
-            
-            if existing.data:
+            if itemnum in existing_itemnums:
                 continue  # Skip if distractor already exists
             
             # Get the distractor data for this item
@@ -1152,20 +1216,22 @@ def process_bulk_add_distractors():
             
             # Only add if at least one language field is filled
             if english or tagalog or waray or cebuano:
-                data = {
+                rows.append({
                     "level": level,
                     "itemnum": itemnum,
                     "english": english,
                     "tagalog": tagalog,
                     "waray": waray,
                     "cebuano": cebuano
-                }
-                
-                try:
-                    supabase.table("distractor").insert(data).execute()
-                    added_count += 1
-                except Exception as e:
-                    flash(f"Error adding distractor for item {itemnum}: {e}", "danger")
+                })
+
+    # Insert them all in one request
+    if rows:
+        try:
+            supabase.table("distractor").insert(rows).execute()
+            added_count = len(rows)
+        except Exception as e:
+            flash(f"Error adding distractors: {e}", "danger")
     
     if added_count > 0:
         flash(f"Successfully added {added_count} distractors for level {level}!", "success")
@@ -1220,6 +1286,7 @@ def add_boss_level():
                 'cebuano': cebuano,
                 'type': type_
             }).execute()
+            catalog_cache.invalidate_content("boss_words:")
             flash("Boss level added successfully!", "success")
             return redirect(url_for('admin.manage_boss_levels'))
         except Exception as e:
@@ -1259,6 +1326,7 @@ def edit_boss_level(boss_level_id):
                 'cebuano': cebuano,
                 'type': type_
             }).eq('id', boss_level_id).execute()
+            catalog_cache.invalidate_content("boss_words:")
             flash("Boss level updated successfully!", "success")
             return redirect(url_for('admin.manage_boss_levels'))
         except Exception as e:
@@ -1270,6 +1338,7 @@ def edit_boss_level(boss_level_id):
 def delete_boss_level(boss_level_id):
     try:
         response = supabase.table('boss_levels').delete().eq('id', boss_level_id).execute()
+        catalog_cache.invalidate_content("boss_words:")
         if response.data:
             flash("Boss level deleted successfully!", "success")
         else:
@@ -1282,3 +1351,35 @@ def delete_boss_level(boss_level_id):
 
 
 
+
+
+# --- Profiler (see profiler.py) ---
+@admin_bp.route('/profiler')
+@admin_required
+def manage_profiles():
+    profiles = profiler.list_profiles()
+    for profile in profiles:
+        profile['saved'] = datetime.fromtimestamp(profile['saved_at']).strftime('%Y-%m-%d %H:%M:%S')
+    window = profiler.active_window()
+    if window:
+        window = {'id': window[0], 'until': datetime.fromtimestamp(window[1]).strftime('%H:%M:%S')}
+    return render_template('profiler.html', profiles=profiles, window=window,
+                           max_seconds=profiler.PROFILE_MAX_WINDOW_SECONDS, title='Profiler')
+
+@admin_bp.route('/profiler/window', methods=['POST'])
+@admin_required
+def start_profile_window():
+    seconds = request.form.get('seconds', type=int) or 30
+    profile_id = profiler.start_window(seconds)
+    flash(f"Profiling every request: {profile_id}", "success")
+    return redirect(url_for('admin.manage_profiles'))
+
+@admin_bp.route('/profiler/<profile_id>.folded')
+@admin_required
+def download_profile(profile_id):
+    folded = profiler.load(profile_id)
+    if folded is None:
+        flash("Profile not found.", "warning")
+        return redirect(url_for('admin.manage_profiles'))
+    return Response(folded, mimetype='text/plain',
+                    headers={'Content-Disposition': f'attachment; filename="{profile_id}.folded"'})
@@ -1,61 +1,118 @@
 from flask import Flask, render_template, jsonify, request, redirect, Response
-from supabase import create_client, Client
-from dotenv import load_dotenv
 from werkzeug.security import generate_password_hash
 from werkzeug.security import check_password_hash
 import os
 import random
-import google.generativeai as genai
 from datetime import datetime, timezone, timedelta
 from flask import session, redirect, url_for
 from functools import wraps
 import requests
 import base64
-from speech_routes import speech_bp
-from admin import admin_bp
-from level_lesson import level_bp  # Import your blueprint
 import json
+import logging
+import threading
 import time
+import inventory_service
+import catalog_cache
+import ownership
+import life_regen
+import user_cache
+import progression
+import reward_schedule
+import write_buffer
+from idempotency import idempotent
+import fanout
+import logs
+import metrics
+import compression
+import fast_json
+import http_cache
+import profiler
+import query_budget
+import services
+import static_assets
+from services import supabase, model
 
 # Add database connection helper
 def ensure_db_connection():
     """Test database connection and reconnect if needed"""
-    global supabase
     try:
         # Simple test query
         supabase.table("users").select("id").limit(1).execute()
         return True
     except Exception as e:
-        print(f"❌ Database connection error: {str(e)}")
+        log.warning("Database connection error: %s", e)
         try:
             # Try to recreate the connection
-            supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
-            print("✅ Database connection reestablished")
+            services.reset_supabase()
+            log.info("Database connection reestablished")
             return True
         except Exception as reconnect_error:
-            print(f"❌ Failed to reconnect to database: {str(reconnect_error)}")
+            log.error("Failed to reconnect to database: %s", reconnect_error)
             return False
 
-# Load environment variables from .env file
+log = logging.getLogger(__name__)
 
-load_dotenv()
+# Overridable so load tests can point TTS at a local stand-in
+GOOGLE_TTS_URL = os.getenv("GOOGLE_TTS_URL", "https://texttospeech.googleapis.com/v1/text:synthesize")
 
+# Environment variables are loaded from .env by services.py, which also
+# creates the Supabase client and Gemini model the first time they're used.
+#
+# Importing this module only builds `app`: routes, blueprints and request
+# hooks (see _setup_app at the bottom). Nothing starts a thread, opens a file
+# or touches the network. The log listener and the coin write buffer start in
+# create_app(), which wsgi.py / asgi.py call at start-up, or on the first
+# request when a server is pointed at `app:app` directly.
 app = Flask(__name__)
-app.register_blueprint(speech_bp)
-app.register_blueprint(admin_bp, url_prefix='/admin')
-app.register_blueprint(level_bp)
+_services_started = False
+_services_lock = threading.Lock()
 
 
-# Supabase credentials
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-app.secret_key = os.getenv("FLASK_SECRET_KEY")
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+def _setup_app():
+    """Register blueprints and request hooks (import time, no side effects)."""
+    from speech_routes import speech_bp
+    from admin import admin_bp, is_admin
+    from level_lesson import level_bp
 
-# Gemini AI setup
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel("gemini-1.5-flash")
+    @app.before_request
+    def _start_services_on_first_request():
+        start_services()
+
+    logs.init_app(app)
+    profiler.init_app(app, allowed=is_admin)
+    metrics.init_app(app)
+    query_budget.init_app(app)
+    compression.init_app(app)
+    http_cache.init_app(app)
+
+    app.json = fast_json.JSONProvider(app)
+    static_assets.init_app(app)
+
+    app.secret_key = os.getenv("FLASK_SECRET_KEY")
+    app.register_blueprint(speech_bp)
+    app.register_blueprint(admin_bp, url_prefix='/admin')
+    app.register_blueprint(level_bp)
+
+
+def start_services():
+    """Start the log listener and the coin write buffer, once per process."""
+    global _services_started
+    if _services_started:
+        return
+    with _services_lock:
+        if _services_started:
+            return
+        logs.setup()
+        # Coin grants are buffered and flushed in batches (see write_buffer.py)
+        write_buffer.start(supabase)
+        _services_started = True
+
+
+def create_app():
+    """The app, with its background services running. Safe to call more than once."""
+    start_services()
+    return app
 
 
 
@@ -84,7 +141,7 @@ def signup():
         return "❌ Passwords do not match", 400
 
     # Check if email already exists
-    existing_user = supabase.table("users").select("*").eq("email", email).execute()
+    existing_user = supabase.table("users").select("id").eq("email", email).execute()
     if existing_user.data:
         return "❌ Email already registered", 400
 
@@ -106,7 +163,7 @@ def login():
     email = request.form.get("email")
     password = request.form.get("password")
 
-    user_data = supabase.table("users").select("*").eq("email", email).execute()
+    user_data = supabase.table("users").select("id, username, role, password").eq("email", email).execute()
     if not user_data.data:
         return "❌ Email not found", 400
 
@@ -137,20 +194,23 @@ def tutorial():
     return render_template('div.html', page='tutorial.html')
 
 
-@app.route('/api/google-tts', methods=['POST'])
-@login_required
-def google_tts():
-    data = request.get_json()
-    text = data.get("text")
-    language_code = data.get("language", "id-ID")
+def tts_request(data):
+    """
+    Validate a /api/google-tts body and build the Google TTS call.
+
+    Returns (url, payload, mapped_language, None) or (None, None, None, (error_body, status)).
+    Shared by the Flask route and the async handler in asgi.py.
+    """
+    text = (data or {}).get("text")
+    language_code = (data or {}).get("language", "id-ID")
 
     if not text:
-        return jsonify({"error": "No text provided"}), 400
+        return None, None, None, ({"error": "No text provided"}, 400)
 
     # Clean the text - remove extra spaces and trim
     text = text.strip()
     if not text:
-        return jsonify({"error": "Empty text after cleaning"}), 400
+        return None, None, None, ({"error": "Empty text after cleaning"}, 400)
 
     # Map language codes to supported Google TTS codes
     language_mapping = {
@@ -167,10 +227,9 @@ def google_tts():
 
     GOOGLE_TTS_API_KEY = os.getenv("GOOGLE_TTS_API_KEY")
     if not GOOGLE_TTS_API_KEY:
-        return jsonify({"error": "Google TTS API key not configured"}), 500
+        return None, None, None, ({"error": "Google TTS API key not configured"}, 500)
 
-    url = f"https://texttospeech.googleapis.com/v1/text:synthesize?key={GOOGLE_TTS_API_KEY}"
-    headers = {"Content-Type": "application/json"}
+    url = f"{GOOGLE_TTS_URL}?key={GOOGLE_TTS_API_KEY}"
     payload = {
         "input": {"text": text},
         "voice": {
@@ -181,33 +240,45 @@ def google_tts():
             "audioEncoding": "MP3"
         }
     }
+    return url, payload, mapped_language, None
+
+
+def tts_response(status_code, body_json, body_text, data, mapped_language):
+    """Turn the Google TTS reply into our (body, status)."""
+    if status_code == 200:
+        return {"audio": body_json()["audioContent"]}, 200
+    log.warning("Google TTS API error %s: %s", status_code, body_text)
+    return {
+        "error": "TTS failed", 
+        "details": body_text,
+        "language_code": (data or {}).get("language", "id-ID"),
+        "mapped_language": mapped_language
+    }, 500
+
+
+@app.route('/api/google-tts', methods=['POST'])
+@login_required
+def google_tts():
+    data = request.get_json()
+    url, payload, mapped_language, error = tts_request(data)
+    if error:
+        return jsonify(error[0]), error[1]
 
     try:
-        response = requests.post(url, headers=headers, json=payload, timeout=10)
-        
-        if response.status_code == 200:
-            audio_content = response.json()["audioContent"]
-            return jsonify({"audio": audio_content})
-        else:
-            error_details = response.text
-            print(f"Google TTS API Error: {response.status_code} - {error_details}")
-            return jsonify({
-                "error": "TTS failed", 
-                "details": error_details,
-                "language_code": language_code,
-                "mapped_language": mapped_language
-            }), 500
+        with metrics.upstream("tts"):
+            response = requests.post(url, headers={"Content-Type": "application/json"}, json=payload, timeout=10)
+        body, status = tts_response(response.status_code, response.json, response.text, data, mapped_language)
+        return jsonify(body), status
             
     except requests.exceptions.RequestException as e:
-        print(f"Google TTS Request Error: {str(e)}")
+        log.warning("Google TTS request error: %s", e)
         return jsonify({"error": "TTS request failed", "details": str(e)}), 500
 
 @app.route('/profile')
 @login_required
 def profile():
     user_id = session['user_id']
-    result = supabase.table('users').select('*').eq('id', user_id).single().execute()
-    user = result.data
+    user = user_cache.get_user(supabase, user_id, user_cache.PROFILE_COLUMNS)
 
     # Fallback image
     if not user.get('profile_picture'):
@@ -218,7 +289,7 @@ def profile():
     # EXP Progress Calculation
     account_level = user.get("account_level", 1)
     current_exp = user.get("current_exp", 0)
-    required_exp = 50 * (1.05 ** (account_level - 1))
+    required_exp = progression.required_exp(account_level)
     exp_percent = round((current_exp / required_exp) * 100, 1)
 
     user["required_exp"] = round(required_exp, 2)
@@ -237,9 +308,9 @@ def update_preferred_language():
     if language not in ["english", "tagalog", "waray", "cebuano"]:
         return jsonify({"success": False, "message": "Invalid language."})
 
-    result = supabase.table("users").update({
+    result = user_cache.update_user(supabase, user_id, {
         "preferred_language": language
-    }).eq("id", user_id).execute()
+    })
 
     if result.data:
         return jsonify({"success": True})
@@ -253,19 +324,17 @@ def update_preferred_language():
 def select_avatar():
     user_id = session.get("user_id")
 
-    # Get all avatar_ids the user has bought
-    user_avatars = supabase.table("user_avatars").select("avatar_id").eq("user_id", user_id).execute().data
-    unlocked_avatar_ids = [ua['avatar_id'] for ua in user_avatars]
-
-    # Fetch avatar data for those ids only
-    if unlocked_avatar_ids:
-        avatars = supabase.table("avatars").select("*").in_("id", unlocked_avatar_ids).execute().data
-    else:
-        avatars = []
+    # Avatars the user has bought (ownership set from the session, details from the catalog)
+    unlocked_avatar_ids = ownership.get_owned(supabase, "avatars")
+    catalog = catalog_cache.get_avatars(supabase)
 
-    # Add full Supabase public URL to each avatar
-    for avatar in avatars:
-        avatar["url"] = f"https://uktdymsgfgodbwesdvsj.supabase.co/storage/v1/object/public/avatars/{avatar['filename']}"
+    avatars = []
+    for avatar_id in unlocked_avatar_ids:
+        if avatar_id in catalog:
+            # Copy so we don't add the URL to the shared cached row
+            avatar = dict(catalog[avatar_id])
+            avatar["url"] = f"https://uktdymsgfgodbwesdvsj.supabase.co/storage/v1/object/public/avatars/{avatar['filename']}"
+            avatars.append(avatar)
 
     return render_template("div.html", page="select_avatar.html", avatars=avatars)
 
@@ -278,18 +347,19 @@ def set_avatar():
     user_id = session.get("user_id")
 
     # Get filename of selected avatar
-    avatar_data = supabase.table("avatars").select("filename").eq("id", avatar_id).single().execute().data
+    avatar_data = catalog_cache.get_avatars(supabase).get(int(avatar_id)) if avatar_id else None
 
     if avatar_data:
         # Save selected avatar to user's profile
-        supabase.table("users").update({
+        user_cache.update_user(supabase, user_id, {
             "profile_picture": avatar_data["filename"]
-        }).eq("id", user_id).execute()
+        })
 
     return redirect('/profile')
 
 @app.route('/api/boss-reward', methods=['POST'])
 @login_required
+@idempotent
 def reward_boss_level():
     user_id = session.get("user_id")
     data = request.json
@@ -299,91 +369,21 @@ def reward_boss_level():
     if not boss_num or not lesson:
         return jsonify({"message": "Missing boss number or lesson"}), 400
 
-    # Get previous boss reward from user's progress
-    previous_boss_reward = 0
-    if int(boss_num) > 1:
-        # Get the previous boss reward from user's progress
-        progress_data = supabase.table("user_progress") \
-            .select("boss_rewards") \
-            .eq("user_id", user_id) \
-            .eq("lesson", lesson) \
-            .single() \
-            .execute().data
-        
-        if progress_data and progress_data.get("boss_rewards"):
-            boss_rewards = progress_data["boss_rewards"]
-            if isinstance(boss_rewards, str):
-                try:
-                    boss_rewards = json.loads(boss_rewards)
-                except:
-                    boss_rewards = {}
-            
-            previous_boss_reward = boss_rewards.get(str(int(boss_num) - 1), 0)
+    # Rewards come from the precomputed boss schedule (see reward_schedule.py)
+    previous_boss_reward = reward_schedule.boss_coins(int(boss_num) - 1)
+    reward = reward_schedule.boss_coins(int(boss_num))
     
-    # Calculate new reward: 30% higher than previous, or base reward for first boss
-    if previous_boss_reward > 0:
-        reward = int(round(previous_boss_reward * 1.3))  # 30% increase
-    else:
-        reward = 200  # Base reward for first boss
-    
-    print(f"🧮 Boss {boss_num} reward calculation:")
-    print(f"   Previous boss reward: {previous_boss_reward}")
-    print(f"   New reward: {reward}")
-
-    # Get current coin count
-    user_data = (
-        supabase.table("users")
-        .select("coins")
-        .eq("id", user_id)
-        .single()
-        .execute()
-    )
+    log.debug("Boss %s reward %s (previous boss %s)", boss_num, reward, previous_boss_reward)
 
-    user = user_data.data
-    if not user:
-        print("❌ User not found.")
+    # Queue the coins, they're flushed in a batch (see write_buffer.py)
+    current_coins = write_buffer.balance(supabase, user_id)
+    if current_coins is None:
+        log.warning("Boss reward: user %s not found", user_id)
         return jsonify({"message": "User not found"}), 404
 
-    current_coins = user.get("coins", 0)
+    write_buffer.add_coins(user_id, reward)
     new_coins = current_coins + reward
-    print(f"💰 Coins before: {current_coins}, after: {new_coins}")
-
-    # Update coins
-    supabase.table("users").update({"coins": new_coins}).eq("id", user_id).execute()
-
-    # Store this boss reward for future calculations
-    progress_data = supabase.table("user_progress") \
-        .select("boss_rewards") \
-        .eq("user_id", user_id) \
-        .eq("lesson", lesson) \
-        .single() \
-        .execute().data
-    
-    boss_rewards = {}
-    if progress_data and progress_data.get("boss_rewards"):
-        stored_rewards = progress_data["boss_rewards"]
-        if isinstance(stored_rewards, str):
-            try:
-                boss_rewards = json.loads(stored_rewards)
-            except:
-                boss_rewards = {}
-        else:
-            boss_rewards = stored_rewards
-    
-    boss_rewards[str(boss_num)] = reward
-    
-    # Update or insert the boss rewards
-    if progress_data:
-        supabase.table("user_progress").update({
-            "boss_rewards": json.dumps(boss_rewards)
-        }).eq("user_id", user_id).eq("lesson", lesson).execute()
-    else:
-        supabase.table("user_progress").insert({
-            "user_id": user_id,
-            "lesson": lesson,
-            "highest_unlocked": 1,
-            "boss_rewards": json.dumps(boss_rewards)
-        }).execute()
+    log.debug("Coins before: %s, after: %s", current_coins, new_coins)
 
     return jsonify({
         "message": "✅ Boss coins rewarded!",
@@ -396,6 +396,7 @@ def reward_boss_level():
 
 @app.route('/api/reward', methods=['POST'])
 @login_required
+@idempotent
 def reward_user():
     try:
         # Ensure database connection
@@ -412,7 +413,6 @@ def reward_user():
         data = request.json or {}
         level = data.get("level")
         lesson = data.get("lesson")
-        base_reward = 10  # Initial reward for level 1
 
         if not level or not lesson:
             return jsonify({"message": "Missing level or lesson"}), 400
@@ -432,26 +432,12 @@ def reward_user():
         # Only treat as repeat if level is less than the most recently completed level
         is_repeat = int(level) < int(highest_unlocked) - 1
 
-        # Calculate reward:
-        reward = base_reward * (1.15 ** (int(level) - 1))
-        if is_repeat:
-            reward *= 0.5  # 50% penalty for repeated levels
-        reward = int(round(reward))
-
-        # Get current coin count
-        user = (
-            supabase.table("users")
-            .select("coins")
-            .eq("id", user_id)
-            .single()
-            .execute()
-            .data
-        )
-        current_coins = user.get("coins", 0)
-        new_coins = current_coins + reward
+        # Reward from the precomputed level schedule (50% for repeated levels)
+        reward = reward_schedule.level_reward(int(level), is_repeat)
 
-        # Update coins
-        supabase.table("users").update({"coins": new_coins}).eq("id", user_id).execute()
+        # Queue the coins, they're flushed in a batch (see write_buffer.py)
+        write_buffer.add_coins(user_id, reward)
+        new_coins = write_buffer.balance(supabase, user_id)
 
         # ✅ Step: Count discovered words based on completed levels
         last_level = highest_unlocked
@@ -486,7 +472,7 @@ def reward_user():
             "discovered_words": word_count
         })
     except Exception as e:
-        print(f"❌ ERROR in reward_user: {str(e)}")
+        log.exception("reward_user failed")
         return jsonify({
             "message": "Error processing reward",
             "error": str(e),
@@ -510,9 +496,9 @@ def select_lesson():
 
         if lesson_lang:
             # Update user's current selected lesson
-            supabase.table("users").update({
+            user_cache.update_user(supabase, user_id, {
                 "lesson_language": lesson_lang
-            }).eq("id", user_id).execute()
+            })
 
             # Check if user_progress entry exists
             existing = supabase.table("user_progress") \
@@ -534,7 +520,7 @@ def select_lesson():
         return jsonify({"message": "❌ No lesson language selected."}), 400
 
     # Get user data for the dashboard
-    user_data = supabase.table("users").select("*").eq("id", user_id).single().execute().data
+    user_data = user_cache.get_user(supabase, user_id, user_cache.PROFILE_COLUMNS)
     
     return render_template("div.html", page="select_lesson.html", user=user_data)
 
@@ -548,24 +534,23 @@ def select_lesson():
 def avatar_shop():
     user_id = session.get("user_id")
 
-    # Get user data (coins + account level)
-    user_result = supabase.table("users").select("coins", "account_level").eq("id", user_id).single().execute()
-    coins = user_result.data["coins"]
-    account_level = user_result.data["account_level"]
-
-    # Get all avatars
-    avatar_data = supabase.table("avatars").select("*").execute().data
-
-    # Get owned avatar ids
-    owned_avatars = supabase.table("user_avatars").select("avatar_id").eq("user_id", user_id).execute().data
-    owned_avatar_ids = {item["avatar_id"] for item in owned_avatars}
-
-    # Get all items
-    item_data = supabase.table("items").select("*").execute().data
+    # User data (coins + account level) and the global catalogs (cached,
+    # invalidated by the admin blueprint), loaded in parallel on a cold cache.
+    # prefetch_user stays off `g`; get_user below then reads the worker cache
+    loaded = fanout.run(
+        user=lambda: user_cache.prefetch_user(supabase, user_id, "coins", "account_level"),
+        avatars=lambda: catalog_cache.get_avatars(supabase),
+        items=lambda: catalog_cache.get_items(supabase)
+    )
+    user = user_cache.get_user(supabase, user_id, "coins", "account_level")
+    coins = user["coins"] + write_buffer.pending_coins(user_id)
+    account_level = user["account_level"]
+    avatar_data = list(loaded["avatars"].values())
+    item_data = list(loaded["items"].values())
 
-    # Get owned item ids
-    owned_items = supabase.table("user_items").select("item_id").eq("user_id", user_id).execute().data
-    owned_item_ids = {item["item_id"] for item in owned_items}
+    # Owned ids (cached in the user's session; a miss loads both kinds in one read)
+    owned_avatar_ids = ownership.get_owned(supabase, "avatars")
+    owned_item_ids = ownership.get_owned(supabase, "items")
 
     return render_template("div.html", 
         page="shop.html", 
@@ -584,35 +569,15 @@ def avatar_shop():
 def inventory():
     user_id = session["user_id"]
 
-    # Get user items with quantity
-    user_items = supabase.table("user_items") \
-        .select("item_id, quantity") \
-        .eq("user_id", user_id) \
-        .execute().data
-
-    if not user_items:
-        return render_template("div.html", page="inventory.html", items=[])
-
-    # Get item IDs
-    item_ids = [item["item_id"] for item in user_items]
-
-    # Fetch item details
-    item_data = supabase.table("items") \
-        .select("*") \
-        .in_("id", item_ids) \
-        .execute().data
-
-    # Add quantity and full image URL to each item
-    for item in item_data:
-        matching = next((ui for ui in user_items if ui["item_id"] == item["id"]), {})
-        item["quantity"] = matching.get("quantity", 1)
-        item["image_url"] = f"https://uktdymsgfgodbwesdvsj.supabase.co/storage/v1/object/public/shopitems/{item['filename']}"
+    # User's items merged with the cached items catalog
+    items = inventory_service.get_inventory(supabase, user_id)
 
-    return render_template("div.html", page="inventory.html", items=item_data)
+    return render_template("div.html", page="inventory.html", items=items)
 
 
 @app.route('/buy-lives', methods=['POST'])
 @login_required
+@idempotent
 def buy_lives():
     user_id = session['user_id']
     data = request.get_json()
@@ -622,48 +587,33 @@ def buy_lives():
     if amount not in PRICES:
         return jsonify({"success": False, "message": "Invalid amount."})
 
-    user = supabase.table("users").select("*").eq("id", user_id).single().execute().data
-    current_coins = user.get("coins", 0)
-    current_lives = user.get("lives", 5)
+    user = user_cache.get_user(supabase, user_id, life_regen.LIVES_COLUMNS, fresh=True)
+    current_lives = life_regen.compute(user)["lives"]
 
-    if current_lives >= 5:
+    if current_lives >= life_regen.MAX_LIVES:
         return jsonify({"success": False, "message": "You already have max lives."})
 
-    cost = PRICES[amount]
-    if current_coins < cost:
+    if write_buffer.spend(supabase, user_id, PRICES[amount]) is None:
         return jsonify({"success": False, "message": "Not enough coins."})
 
-    new_lives = min(5, current_lives + amount)
-    supabase.table("users").update({
-        "coins": current_coins - cost,
-        "lives": new_lives,
-        "life_regen_start": None,
-        "next_life_time": None
-    }).eq("id", user_id).execute()
+    state, updates = life_regen.gain_lives_updates(user, amount)
+    user_cache.update_user(supabase, user_id, updates)
 
-    return jsonify({"success": True, "message": f"✅ You bought {amount} lives!"})
+    return jsonify({"success": True, "message": f"✅ You bought {amount} lives!", **life_regen.public_state(state)})
 
 
 
 @app.route('/api/buy-full-health', methods=['POST'])
 @login_required
+@idempotent
 def buy_full_health():
     user_id = session['user_id']
-    user = supabase.table("users").select("*").eq("id", user_id).single().execute().data
-
-    coins = user.get("coins", 0)
-    if coins < 80:
+    if write_buffer.spend(supabase, user_id, 80) is None:
         return jsonify({"success": False, "message": "Not enough coins."})
 
-    # Update lives and subtract coins
-    supabase.table("users").update({
-        "lives": 5,
-        "coins": coins - 80,
-        "life_regen_start": None,
-        "next_life_time": None
-    }).eq("id", user_id).execute()
+    user_cache.update_user(supabase, user_id, life_regen.refill_updates())
 
-    return jsonify({"success": True, "new_lives": 5})
+    return jsonify({"success": True, "new_lives": life_regen.MAX_LIVES})
 
 
 
@@ -671,6 +621,7 @@ def buy_full_health():
 
 @app.route('/buy-avatar/<int:avatar_id>', methods=['POST'])
 @login_required
+@idempotent
 def buy_avatar(avatar_id):
     user_id = session.get("user_id")
 
@@ -680,23 +631,25 @@ def buy_avatar(avatar_id):
         return jsonify({"success": False, "message": "You already own this avatar."})
 
     # Get avatar price
-    avatar = supabase.table("avatars").select("*").eq("id", avatar_id).single().execute()
-    if not avatar.data:
+    avatar = catalog_cache.get_avatars(supabase).get(avatar_id)
+    if not avatar:
         return jsonify({"success": False, "message": "Avatar not found."})
 
-    # Check user's coin balance
-    user = supabase.table("users").select("*").eq("id", user_id).single().execute().data
-    if user["coins"] < avatar.data["price"]:
+    # Deduct coins (buffered grants included) and grant avatar
+    if write_buffer.spend(supabase, user_id, avatar["price"]) is None:
         return jsonify({"success": False, "message": "Not enough coins."})
-
-    # Deduct coins and grant avatar
-    supabase.table("users").update({"coins": user["coins"] - avatar.data["price"]}).eq("id", user_id).execute()
-    supabase.table("user_avatars").insert({"user_id": user_id, "avatar_id": avatar_id}).execute()
+    try:
+        supabase.table("user_avatars").insert({"user_id": user_id, "avatar_id": avatar_id}).execute()
+    except Exception:
+        write_buffer.add_coins(user_id, avatar["price"])  # refund
+        raise
+    ownership.add_owned("avatars", avatar_id)
 
     return jsonify({"success": True, "message": "✅ Avatar purchased!"})
 
 @app.route('/buy-item/<int:item_id>', methods=['POST'])
 @login_required
+@idempotent
 def buy_item(item_id):
     user_id = session.get("user_id")
     data = request.get_json()
@@ -706,24 +659,16 @@ def buy_item(item_id):
         return jsonify({"success": False, "message": "Invalid quantity."})
 
     # Get item info
-    item_resp = supabase.table("items").select("*").eq("id", item_id).single().execute()
-    item = item_resp.data
+    item = catalog_cache.get_items(supabase).get(item_id)
     if not item:
         return jsonify({"success": False, "message": "Item not found."})
 
     total_price = item["price"] * quantity
 
-    # Check user coins
-    user_resp = supabase.table("users").select("coins").eq("id", user_id).single().execute()
-    user = user_resp.data
-    if user["coins"] < total_price:
+    # Deduct coins (buffered grants included)
+    if write_buffer.spend(supabase, user_id, total_price) is None:
         return jsonify({"success": False, "message": "Not enough coins."})
 
-    # Deduct coins
-    supabase.table("users").update({
-        "coins": user["coins"] - total_price
-    }).eq("id", user_id).execute()
-
     # Check if user already has the item
     existing_resp = supabase.table("user_items") \
         .select("id", "quantity") \
@@ -747,6 +692,8 @@ def buy_item(item_id):
             "quantity": quantity
         }).execute()
 
+    ownership.add_owned("items", item_id)
+
     return jsonify({"success": True, "message": f"✅ Bought {quantity} x {item['description']}!"})
 
 
@@ -759,9 +706,9 @@ def level_home():
     user_id = session["user_id"]
     
     # Get lives and selected lesson_language
-    user_data = supabase.table("users").select("lives", "lesson_language").eq("id", user_id).single().execute().data
+    user_data = user_cache.get_user(supabase, user_id, life_regen.LIVES_COLUMNS, "lesson_language")
 
-    lives = user_data.get("lives", 5)
+    lives = life_regen.compute(user_data)["lives"]
     selected_lesson = user_data.get("lesson_language")
 
     return render_template("div.html", lives=lives, selected_lesson=selected_lesson, page="levelscreen.html")
@@ -773,12 +720,13 @@ def level_home():
 @login_required
 def quiz():
     level = request.args.get('level', 1)
-    user = supabase.table("users").select("lives").eq("id", session['user_id']).single().execute().data
+    user = user_cache.get_user(supabase, session['user_id'], life_regen.LIVES_COLUMNS)
+    lives = life_regen.compute(user)["lives"]
 
-    if user['lives'] <= 0:
+    if lives <= 0:
         return render_template('div.html', level_file=None, error="No lives left")
 
-    return render_template('div.html', level_file="levels/quiz.html", user_lives=user["lives"], level=level)
+    return render_template('div.html', level_file="levels/quiz.html", user_lives=lives, level=level)
 
 
 
@@ -786,64 +734,23 @@ def quiz():
 @login_required
 def lose_life():
     user_id = session["user_id"]
-    user = supabase.table("users").select("lives", "life_regen_start").eq("id", user_id).single().execute().data
-    current_lives = user.get("lives", 5)
+    user = user_cache.get_user(supabase, user_id, life_regen.LIVES_COLUMNS, fresh=True)
 
-    if current_lives > 0:
-        new_lives = current_lives - 1
-        updates = {"lives": new_lives}
+    # Only write when a life is actually lost
+    state, updates = life_regen.lose_life_updates(user)
+    if updates:
+        user_cache.update_user(supabase, user_id, updates)
 
-        if new_lives < 5 and not user.get("life_regen_start"):
-            now = datetime.now(timezone.utc)
-            updates["life_regen_start"] = now.isoformat()
-            updates["next_life_time"] = (now + timedelta(minutes=2)).isoformat()
-
-        supabase.table("users").update(updates).eq("id", user_id).execute()
-        return jsonify({"lives": new_lives})
-    else:
-        return jsonify({"lives": 0})
+    return jsonify(life_regen.public_state(state))
 
 @app.route('/api/regenerate-lives')
 @login_required
 def regenerate_lives():
     user_id = session["user_id"]
-    now = datetime.now(timezone.utc)
-
-    user = supabase.table("users").select("*").eq("id", user_id).single().execute().data
-    lives = user.get("lives", 5)
-    regen_start = user.get("life_regen_start")
-
-    if lives >= 5 or not regen_start:
-        return jsonify({"lives": lives, "next_life_in": None})
 
-    # Fix: Handle naive datetime from DB
-    regen_start_dt = datetime.fromisoformat(regen_start)
-    if regen_start_dt.tzinfo is None:
-        regen_start_dt = regen_start_dt.replace(tzinfo=timezone.utc)
-
-    elapsed_seconds = (now - regen_start_dt).total_seconds()
-    lives_gained = int(elapsed_seconds // 120)
-    new_lives = min(5, lives + lives_gained)
-
-    if new_lives >= 5:
-        supabase.table("users").update({
-            "lives": 5,
-            "life_regen_start": None,
-            "next_life_time": None
-        }).eq("id", user_id).execute()
-        return jsonify({"lives": 5, "next_life_in": None})
-
-    next_life_in = 120 - (elapsed_seconds % 120)
-    new_start_time = regen_start_dt + timedelta(seconds=lives_gained * 120)
-    next_life_time = new_start_time + timedelta(minutes=2)
-
-    supabase.table("users").update({
-        "lives": new_lives,
-        "life_regen_start": new_start_time.isoformat(),
-        "next_life_time": next_life_time.isoformat()
-    }).eq("id", user_id).execute()
-
-    return jsonify({"lives": new_lives, "next_life_in": int(next_life_in)})
+    # Regeneration is computed on read, nothing is written here
+    user = user_cache.get_user(supabase, user_id, life_regen.LIVES_COLUMNS)
+    return jsonify(life_regen.public_state(life_regen.compute(user)))
 
 
 
@@ -851,15 +758,12 @@ def regenerate_lives():
 @login_required
 def get_lives():
     user_id = session["user_id"]
-    user = supabase.table("users").select("lives").eq("id", user_id).single().execute().data
-    return jsonify({"lives": user["lives"]})
+    user = user_cache.get_user(supabase, user_id, life_regen.LIVES_COLUMNS)
+    return jsonify(life_regen.public_state(life_regen.compute(user)))
 
 
-# /api/unlocked_level
-@app.route('/api/unlocked_level', methods=['GET'])
-def get_unlocked_level():
-    user_id = session["user_id"]
-    lesson = request.args.get('lesson')
+def load_progress(user_id, lesson):
+    """Highest unlocked level and mastery map for one lesson (creates the row on first visit)."""
     result = supabase.table('user_progress') \
         .select('highest_unlocked, level_mastery') \
         .eq('user_id', user_id) \
@@ -877,10 +781,10 @@ def get_unlocked_level():
             except:
                 level_mastery = {}
         
-        return jsonify({
+        return {
             'highest_unlocked': result.data['highest_unlocked'],
             'level_mastery': level_mastery
-        })
+        }
     else:
         supabase.table('user_progress').insert({
             'user_id': user_id,
@@ -888,10 +792,58 @@ def get_unlocked_level():
             'highest_unlocked': 1,
             'level_mastery': '{}'
         }).execute()
-        return jsonify({
+        return {
             'highest_unlocked': 1,
             'level_mastery': {}
-        })
+        }
+
+
+# /api/unlocked_level
+@app.route('/api/unlocked_level', methods=['GET'])
+@http_cache.cache_control(http_cache.USER_STATE)
+def get_unlocked_level():
+    user_id = session["user_id"]
+    lesson = request.args.get('lesson')
+    return jsonify(load_progress(user_id, lesson))
+
+
+@app.route('/api/bootstrap')
+@login_required
+def session_bootstrap():
+    """
+    Everything the level screen / quiz needs in one round trip: lives state,
+    languages, progress for `lesson` and, when `level` is given, the question
+    pack for that level. The independent reads run in parallel (see fanout.py).
+    """
+    user_id = session["user_id"]
+    level = request.args.get('level', type=int)
+
+    user = user_cache.get_user(supabase, user_id, life_regen.LIVES_COLUMNS, "preferred_language", "lesson_language")
+    lives_state = life_regen.public_state(life_regen.compute(user))
+    preferred = user.get("preferred_language", "tagalog")
+    lesson = user.get("lesson_language", "waray")
+    progress_lesson = request.args.get('lesson') or lesson
+
+    calls = {"progress": lambda: load_progress(user_id, progress_lesson)}
+    # No point building questions the player can't start
+    if level is not None and lives_state["lives"] > 0:
+        calls["questions"] = lambda: question_rows(level)
+        calls["distractors"] = lambda: distractor_rows(level)
+    results = fanout.run(**calls)
+
+    questions = None
+    if "questions" in results:
+        questions = build_question_pack(results["questions"], results["distractors"], preferred, lesson)
+
+    return jsonify({
+        **lives_state,
+        "preferred_language": preferred,
+        "lesson_language": lesson,
+        "lesson": progress_lesson,
+        **results["progress"],
+        "level": level,
+        "questions": questions
+    })
 
 
 # /api/complete_level
@@ -920,14 +872,7 @@ def complete_level():
         if not lesson:
             return jsonify({'message': 'Missing lesson parameter'}), 400
         
-        print(f"🔍 DEBUG: Level {completed_level}, Perfect: {is_perfect_score}, Score: {correct_answers}/{total_questions}")
-        print(f"🔍 DEBUG: Raw data received: {data}")
-        print(f"🔍 DEBUG: perfect_score type: {type(is_perfect_score)}, value: {is_perfect_score}")
-        print(f"🔍 DEBUG: correct_answers type: {type(correct_answers)}, value: {correct_answers}")
-        print(f"🔍 DEBUG: total_questions type: {type(total_questions)}, value: {total_questions}")
-        print(f"🔍 DEBUG: Calculated percentage: {(correct_answers / total_questions) * 100 if total_questions > 0 else 0}%")
-        print(f"🔍 DEBUG: Lesson: {lesson}")
-        print(f"🔍 DEBUG: User ID: {user_id}")
+        log.debug("complete_level user=%s lesson=%s level=%s payload=%r", user_id, lesson, completed_level, data)
 
         # Get current progress
         result = supabase.table('user_progress') \
@@ -971,13 +916,12 @@ def complete_level():
         
         # Double-check perfect score calculation
         calculated_perfect = correct_answers == total_questions and total_questions > 0
-        print(f"🔍 DEBUG: Calculated perfect score: {calculated_perfect} (correct: {correct_answers}, total: {total_questions})")
-        print(f"🔍 DEBUG: Received perfect_score: {is_perfect_score}")
-        print(f"🔍 DEBUG: Current score: {current_score}%")
+        log.debug("Score %.1f%%, calculated perfect %s, received perfect %r",
+                  current_score, calculated_perfect, is_perfect_score)
         
         if current_score > level_mastery[level_key]['best_score']:
             level_mastery[level_key]['best_score'] = current_score
-            print(f"🔍 DEBUG: New best score: {current_score}%")
+            log.debug("New best score: %.1f%%", current_score)
         
         # Use the calculated perfect score if there's a mismatch
         final_perfect_score = is_perfect_score or calculated_perfect
@@ -985,9 +929,6 @@ def complete_level():
         if final_perfect_score:
             level_mastery[level_key]['perfect_attempts'] += 1
             level_mastery[level_key]['mastered'] = True
-            print(f"🔍 DEBUG: Perfect score confirmed! Setting mastered = True")
-        else:
-            print(f"🔍 DEBUG: Not perfect score. mastered remains {level_mastery[level_key]['mastered']}")
         
         # Check if we can unlock the next level - NOW REQUIRES PERFECT SCORE
         can_unlock_next = False
@@ -997,40 +938,32 @@ def complete_level():
         if completed_level == current_progress['highest_unlocked'] and final_perfect_score:
             can_unlock_next = True
             new_highest_unlocked = completed_level + 1
-            print(f"🔍 DEBUG: Perfect score achieved! Unlocking next level! New highest: {new_highest_unlocked}")
-        elif completed_level == current_progress['highest_unlocked'] and not final_perfect_score:
-            print(f"🔍 DEBUG: Level completed but not perfect score. Need perfect score to unlock next level.")
-        else:
-            print(f"🔍 DEBUG: Not unlocking. Level match: {completed_level == current_progress['highest_unlocked']}, Perfect: {final_perfect_score}")
+
+        log.debug("Perfect %s, mastered %s, highest unlocked %s -> %s",
+                  final_perfect_score, level_mastery[level_key]['mastered'],
+                  current_progress['highest_unlocked'], new_highest_unlocked)
         
         # Update the database
-        print(f"🔍 DEBUG: About to save - highest_unlocked: {new_highest_unlocked}, level_mastery: {level_mastery}")
-        
         # Convert level_mastery to proper JSON string for Supabase
         level_mastery_json = json.dumps(level_mastery)
-        print(f"🔍 DEBUG: JSON serialized level_mastery: {level_mastery_json}")
         
         # Use update if record exists, insert if it doesn't
         if result.data:
             # Record exists, use update
-            print(f"🔍 DEBUG: Updating existing record for user {user_id}, lesson {lesson}")
             update_result = supabase.table('user_progress').update({
                 'highest_unlocked': new_highest_unlocked,
                 'level_mastery': level_mastery_json
             }).eq('user_id', user_id).eq('lesson', lesson).execute()
-            print(f"🔍 DEBUG: Update result: {update_result}")
+            log.debug("Updated progress: %r", update_result)
         else:
             # Record doesn't exist, use insert
-            print(f"🔍 DEBUG: Inserting new record for user {user_id}, lesson {lesson}")
             insert_result = supabase.table('user_progress').insert({
                 'user_id': user_id,
                 'lesson': lesson,
                 'highest_unlocked': new_highest_unlocked,
                 'level_mastery': level_mastery_json
             }).execute()
-            print(f"🔍 DEBUG: Insert result: {insert_result}")
-        
-        print(f"🔍 DEBUG: Database update completed")
+            log.debug("Inserted progress: %r", insert_result)
 
         return jsonify({
             'message': 'Progress updated',
@@ -1040,7 +973,7 @@ def complete_level():
             'mastery_stats': level_mastery[level_key]
         })
     except Exception as e:
-        print(f"❌ ERROR in complete_level: {str(e)}")
+        log.exception("complete_level failed")
         return jsonify({
             'message': 'Error updating progress',
             'error': str(e),
@@ -1074,8 +1007,7 @@ def debug_mastery():
             except:
                 level_mastery = {}
         
-        print(f"🔍 DEBUG MASTERY: Raw data from DB: {result.data}")
-        print(f"🔍 DEBUG MASTERY: Parsed level_mastery: {level_mastery}")
+        log.debug("Mastery row %r, parsed %r", result.data, level_mastery)
         
         return jsonify({
             'highest_unlocked': result.data['highest_unlocked'],
@@ -1140,7 +1072,7 @@ def set_mastery():
         
         if level == current_highest and mastered:
             new_highest_unlocked = level + 1
-            print(f"🔍 DEBUG: Setting mastery and unlocking next level! New highest: {new_highest_unlocked}")
+            log.debug("Setting mastery and unlocking level %s", new_highest_unlocked)
         
         # Update database
         level_mastery_json = json.dumps(level_mastery)
@@ -1165,7 +1097,7 @@ def set_mastery():
             'level_mastered': mastered
         })
     except Exception as e:
-        print(f"❌ ERROR in set_mastery: {str(e)}")
+        log.exception("set_mastery failed")
         return jsonify({
             'message': 'Error setting mastery',
             'error': str(e)
@@ -1219,11 +1151,8 @@ def test_mastery():
         # Only unlock the next level if this level is mastered (perfect score) and it's the current highest unlocked level
         if level == current_highest and level_mastery[level_key]['mastered']:
             new_highest_unlocked = level + 1
-            print(f"🔍 DEBUG: Perfect score achieved! Unlocking next level! New highest: {new_highest_unlocked}")
-        elif level == current_highest and not level_mastery[level_key]['mastered']:
-            print(f"🔍 DEBUG: Level completed but not perfect score. Need perfect score to unlock next level.")
-        else:
-            print(f"🔍 DEBUG: Not unlocking. Level match: {level == current_highest}, Mastered: {level_mastery[level_key]['mastered']}")
+        log.debug("Mastered %s, highest unlocked %s -> %s",
+                  level_mastery[level_key]['mastered'], current_highest, new_highest_unlocked)
         
         # Update database - use update if record exists, insert if it doesn't
         level_mastery_json = json.dumps(level_mastery)
@@ -1251,7 +1180,7 @@ def test_mastery():
             'level_mastered': level_mastery[level_key]['mastered']
         })
     except Exception as e:
-        print(f"❌ ERROR in test_mastery: {str(e)}")
+        log.exception("test_mastery failed")
         return jsonify({
             'message': 'Error setting mastery for testing',
             'error': str(e),
@@ -1275,7 +1204,7 @@ def words_discovered():
             "total_words": len(words)  # This would be total words discovered across all levels
         })
     except Exception as e:
-        print(f"❌ ERROR in words_discovered: {str(e)}")
+        log.exception("words_discovered failed")
         return jsonify({
             "new_words": 0,
             "total_words": 0,
@@ -1285,6 +1214,7 @@ def words_discovered():
 
 @app.route('/api/gain-exp', methods=['POST'])
 @login_required
+@idempotent
 def gain_exp():
     try:
         # Ensure database connection
@@ -1308,36 +1238,26 @@ def gain_exp():
         penalty = base_exp * 0.10 * wrong_count
         gained_exp = max(base_exp - penalty, 0)
 
-        # Get user's current level, exp, and coins
-        user = supabase.table("users").select("account_level", "current_exp", "coins").eq("id", user_id).single().execute().data
+        # Get user's current level and exp, and coins so balance() below needs no re-read
+        user = user_cache.get_user(supabase, user_id, "account_level", "current_exp", "coins", fresh=True)
         account_level = user.get("account_level", 1)
         current_exp = user.get("current_exp", 0)
-        current_coins = user.get("coins", 0)
-
-        # Calculate required EXP for next level
-        required_exp = 50 * (1.05 ** (account_level - 1))
 
-        current_exp += gained_exp
-        leveled_up = False
-        level_up_coins = 0
-        new_coins = current_coins
+        # Resolve every level-up this EXP causes in one step (see progression.py)
+        result = progression.apply_exp(account_level, current_exp, 0, gained_exp)
+        account_level = result["account_level"]
+        current_exp = result["current_exp"]
+        required_exp = result["required_exp"]
+        leveled_up = result["leveled_up"]
+        level_up_coins = result["level_up_coins"]
 
-        while current_exp >= required_exp:
-            current_exp -= required_exp
-            account_level += 1
-            required_exp *= 1.05
-            leveled_up = True
-
-            # Calculate level up coin reward: 50 * (1.2^(account_level-1))
-            level_up_coins += int(round(50 * (1.2 ** (account_level - 1))))
-            new_coins += level_up_coins
-
-        # Update user's level, exp, and coins
-        supabase.table("users").update({
+        # Update user's level and exp, level-up coins go through the coin buffer
+        user_cache.update_user(supabase, user_id, {
             "account_level": account_level,
-            "current_exp": current_exp,
-            "coins": new_coins
-        }).eq("id", user_id).execute()
+            "current_exp": current_exp
+        })
+        write_buffer.add_coins(user_id, result["new_coins"])
+        new_coins = write_buffer.balance(supabase, user_id)
 
         return jsonify({
             "message": f"✅ Gained {gained_exp:.2f} EXP",
@@ -1349,7 +1269,7 @@ def gain_exp():
             "new_coin_balance": new_coins
         })
     except Exception as e:
-        print(f"❌ ERROR in gain_exp: {str(e)}")
+        log.exception("gain_exp failed")
         return jsonify({
             "message": "Error gaining EXP",
             "error": str(e),
@@ -1366,7 +1286,7 @@ def my_words():
     user_id = session["user_id"]
 
     # Get selected lesson
-    user = supabase.table("users").select("lesson_language").eq("id", user_id).single().execute().data
+    user = user_cache.get_user(supabase, user_id, "lesson_language")
     lesson = user.get("lesson_language", "tagalog")
 
     # Get highest completed level
@@ -1399,6 +1319,24 @@ def my_words():
 
 
 
+def word_info_prompt(word, rows, lesson_lang, preferred_lang):
+    """Gemini prompt for /api/word-info (shared with asgi.py)."""
+    # Find the most likely matching sentence
+    matched = next((r for r in rows if word.lower() in r.get(lesson_lang, "").lower()), rows[0])
+    english_text = matched["english"]
+
+    # Prompt Gemini using the English phrase as the correct context
+    return f"""
+    [Target Language: {preferred_lang.upper()}]
+    The learner is studying the word "{word}" from the {lesson_lang} language.
+    It appears in this English phrase: "{english_text}"
+
+    Based on that context, give:
+    1. A short definition of the word in {preferred_lang}.
+    2. A simple example sentence using the word (translated to {preferred_lang} if possible).
+    """
+
+
 @app.route("/api/word-info", methods=["POST"])
 @login_required
 def get_word_info():
@@ -1410,7 +1348,7 @@ def get_word_info():
         return jsonify({"error": "Missing word"}), 400
 
     # Get user lesson language and preferred display language
-    user = supabase.table("users").select("lesson_language", "preferred_language").eq("id", user_id).single().execute().data
+    user = user_cache.get_user(supabase, user_id, "lesson_language", "preferred_language")
     lesson_lang = user.get("lesson_language", "waray").lower()
     preferred_lang = user.get("preferred_language", "tagalog").lower()
 
@@ -1423,20 +1361,7 @@ def get_word_info():
     if not rows:
         return jsonify({"error": "Word not found in context"}), 404
 
-    # Find the most likely matching sentence
-    matched = next((r for r in rows if word.lower() in r.get(lesson_lang, "").lower()), rows[0])
-    english_text = matched["english"]
-
-    # Prompt Gemini using the English phrase as the correct context
-    prompt = f"""
-    [Target Language: {preferred_lang.upper()}]
-    The learner is studying the word "{word}" from the {lesson_lang} language.
-    It appears in this English phrase: "{english_text}"
-
-    Based on that context, give:
-    1. A short definition of the word in {preferred_lang}.
-    2. A simple example sentence using the word (translated to {preferred_lang} if possible).
-    """
+    prompt = word_info_prompt(word, rows, lesson_lang, preferred_lang)
 
     try:
         response = model.generate_content(prompt)
@@ -1450,32 +1375,40 @@ def get_word_info():
 @app.route('/leaderboard')
 def leaderboard():
     lessons = ['tagalog', 'waray', 'cebuano']
-    lesson_leaderboards = {}
 
-    for lesson in lessons:
-        response = supabase.table('user_progress') \
+    def lesson_top(lesson):
+        return supabase.table('user_progress') \
             .select('user_id, highest_unlocked, users(username)') \
             .eq('lesson', lesson) \
             .order('highest_unlocked', desc=True) \
             .limit(10) \
-            .execute()
-        lesson_leaderboards[lesson] = response.data
+            .execute().data
 
     # Account Level Leaderboard
-    level_response = supabase.table('users') \
-        .select('username, account_level') \
-        .order('account_level', desc=True) \
-        .limit(10) \
-        .execute()
-    top_by_level = level_response.data
+    def level_top():
+        return supabase.table('users') \
+            .select('username, account_level') \
+            .order('account_level', desc=True) \
+            .limit(10) \
+            .execute().data
 
     # Coin Leaderboard
-    coins_response = supabase.table('users') \
-        .select('username, coins') \
-        .order('coins', desc=True) \
-        .limit(10) \
-        .execute()
-    top_by_coins = coins_response.data
+    def coins_top():
+        return supabase.table('users') \
+            .select('username, coins') \
+            .order('coins', desc=True) \
+            .limit(10) \
+            .execute().data
+
+    # All five boards are independent, fetch them in parallel (see fanout.py)
+    boards = fanout.run(
+        level=level_top,
+        coins=coins_top,
+        **{lesson: (lambda lesson=lesson: lesson_top(lesson)) for lesson in lessons}
+    )
+    lesson_leaderboards = {lesson: boards[lesson] for lesson in lessons}
+    top_by_level = boards["level"]
+    top_by_coins = boards["coins"]
 
     return render_template("div.html", page="leaderboard.html",
                            lesson_leaderboards=lesson_leaderboards,
@@ -1487,19 +1420,33 @@ def leaderboard():
 import random
 from flask import jsonify
 
+def question_rows(level):
+    return supabase.table("questionanswer").select("*").eq("level", level).order("itemnum").execute().data
+
+
+def distractor_rows(level):
+    return supabase.table("distractor").select("*").eq("level", level).order("itemnum").execute().data
+
+
 @app.route('/api/questions/<int:level>')
 @login_required
 def get_questions(level):
     user_id = session['user_id']
 
-    user = supabase.table("users").select("preferred_language", "lesson_language").eq("id", user_id).single().execute().data
+    user = user_cache.get_user(supabase, user_id, "preferred_language", "lesson_language")
     preferred = user.get("preferred_language", "tagalog")
     lesson = user.get("lesson_language", "waray")
-    target_lang = lesson
 
-    questions = supabase.table("questionanswer").select("*").eq("level", level).order("itemnum").execute().data
-    distractors = supabase.table("distractor").select("*").eq("level", level).order("itemnum").execute().data
+    rows = fanout.run(
+        questions=lambda: question_rows(level),
+        distractors=lambda: distractor_rows(level)
+    )
+    return jsonify(build_question_pack(rows["questions"], rows["distractors"], preferred, lesson))
+
 
+def build_question_pack(questions, distractors, preferred, lesson):
+    """Turn questionanswer + distractor rows into the quiz's question list."""
+    target_lang = lesson
     combined = []
 
     for q in questions:
@@ -1589,7 +1536,7 @@ def get_questions(level):
                 "choices_language": target_lang
             })
 
-    return jsonify(combined)
+    return combined
 
 
 
@@ -1605,6 +1552,7 @@ def combat():
 
 @app.route('/api/streak-reward', methods=['POST'])
 @login_required
+@idempotent
 def streak_reward():
     try:
         # Ensure database connection
@@ -1630,20 +1578,9 @@ def streak_reward():
         # Calculate streak bonus: 1 coin per correct answer in streak
         streak_bonus = streak
         
-        # Get current coin count
-        user = (
-            supabase.table("users")
-            .select("coins")
-            .eq("id", user_id)
-            .single()
-            .execute()
-            .data
-        )
-        current_coins = user.get("coins", 0)
-        new_coins = current_coins + streak_bonus
-
-        # Update coins
-        supabase.table("users").update({"coins": new_coins}).eq("id", user_id).execute()
+        # Queue the coins, they're flushed in a batch (see write_buffer.py)
+        write_buffer.add_coins(user_id, streak_bonus)
+        new_coins = write_buffer.balance(supabase, user_id)
 
         return jsonify({
             "message": f"🔥 Streak Bonus: +{streak_bonus} coins!",
@@ -1651,7 +1588,7 @@ def streak_reward():
             "new_balance": new_coins
         })
     except Exception as e:
-        print(f"❌ ERROR in streak_reward: {str(e)}")
+        log.exception("streak_reward failed")
         return jsonify({
             "message": "Error processing streak reward",
             "error": str(e),
@@ -1683,50 +1620,62 @@ def health_check():
         }), 500
 
 @app.route('/api/dashboard-stats')
+@http_cache.cache_control(http_cache.USER_STATE)
 @login_required
 def get_dashboard_stats():
     user_id = session['user_id']
     
     # Get user's overall stats
-    user = supabase.table("users").select("*").eq("id", user_id).single().execute().data
+    user = user_cache.get_user(supabase, user_id, "account_level", "current_exp", "coins", life_regen.LIVES_COLUMNS)
+    user["coins"] = (user.get("coins") or 0) + write_buffer.pending_coins(user_id)
     
-    # Get the maximum level based on boss_levels table
-    boss_data = supabase.table("boss_levels").select("boss").execute().data
-    max_boss = max([row["boss"] for row in boss_data]) if boss_data else 1
-    max_level = max_boss * 10  # Each boss represents 10 levels
-    
-    # Get progress for all languages
     languages = ['tagalog', 'waray', 'cebuano']
-    progress_data = {}
-    
-    for lang in languages:
+
+    def lesson_progress(lang):
         progress = supabase.table("user_progress") \
             .select("highest_unlocked") \
             .eq("user_id", user_id) \
             .eq("lesson", lang) \
             .single() \
             .execute().data
-        
-        progress_data[lang] = progress["highest_unlocked"] if progress else 1
+        return progress["highest_unlocked"] if progress else 1
+
+    # Boss table and per-language progress are independent, fetch them in parallel
+    first = fanout.run(
+        bosses=lambda: supabase.table("boss_levels").select("boss").execute().data,
+        **{lang: (lambda lang=lang: lesson_progress(lang)) for lang in languages}
+    )
+
+    # Get the maximum level based on boss_levels table
+    boss_data = first["bosses"]
+    max_boss = max([row["boss"] for row in boss_data]) if boss_data else 1
+    max_level = max_boss * 10  # Each boss represents 10 levels
+    
+    # Get progress for all languages
+    progress_data = {lang: first[lang] for lang in languages}
     
-    # Calculate total words learned
+    # Calculate total words learned (word queries for each language run in parallel)
+    def words_rows(level):
+        return supabase.table("questionanswer") \
+            .select("itemnum, level, english, tagalog, waray, cebuano") \
+            .lte("level", level - 1) \
+            .execute().data
+
+    # Only count if they've completed at least level 1
+    started = {lang: level for lang, level in progress_data.items() if level > 1}
+    words = fanout.run(**{lang: (lambda level=level: words_rows(level)) for lang, level in started.items()})
+
     total_words = 0
-    for lang, level in progress_data.items():
-        if level > 1:  # Only count if they've completed at least level 1
-            words_data = supabase.table("questionanswer") \
-                .select("itemnum, level, english, tagalog, waray, cebuano") \
-                .lte("level", level - 1) \
-                .execute().data
-            
-            language_column = lang.lower()
-            word_set = set()
-            
-            for row in words_data:
-                raw = row.get(language_column, "")
-                cleaned = ''.join(c for c in raw if c.isalnum() or c.isspace()).title()
-                word_set.update(cleaned.split())
-            
-            total_words += len(word_set)
+    for lang, words_data in words.items():
+        language_column = lang.lower()
+        word_set = set()
+        
+        for row in words_data:
+            raw = row.get(language_column, "")
+            cleaned = ''.join(c for c in raw if c.isalnum() or c.isspace()).title()
+            word_set.update(cleaned.split())
+        
+        total_words += len(word_set)
     
     # Get recent achievements (mock data for now)
     achievements = [
@@ -1738,7 +1687,7 @@ def get_dashboard_stats():
     # Calculate required EXP for current level
     account_level = user.get("account_level", 1)
     current_exp = user.get("current_exp", 0)
-    required_exp = 50 * (1.05 ** (account_level - 1))
+    required_exp = progression.required_exp(account_level)
     
     return jsonify({
         "user_stats": {
@@ -1746,7 +1695,7 @@ def get_dashboard_stats():
             "current_exp": current_exp,
             "required_exp": required_exp,
             "coins": user.get("coins", 0),
-            "lives": user.get("lives", 5),
+            "lives": life_regen.compute(user)["lives"],
             "total_words": total_words
         },
         "progress": progress_data,
@@ -1779,6 +1728,7 @@ def test_boss_levels():
 
 @app.route('/api/boss-exp-reward', methods=['POST'])
 @login_required
+@idempotent
 def reward_boss_exp():
     user_id = session.get("user_id")
     data = request.json
@@ -1788,101 +1738,32 @@ def reward_boss_exp():
     if not boss_num or not lesson:
         return jsonify({"message": "Missing boss number or lesson"}), 400
 
-    # Get previous boss EXP reward from user's progress
-    previous_boss_exp = 0
-    if int(boss_num) > 1:
-        # Get the previous boss EXP reward from user's progress
-        progress_data = supabase.table("user_progress") \
-            .select("boss_exp_rewards") \
-            .eq("user_id", user_id) \
-            .eq("lesson", lesson) \
-            .single() \
-            .execute().data
-        
-        if progress_data and progress_data.get("boss_exp_rewards"):
-            boss_exp_rewards = progress_data["boss_exp_rewards"]
-            if isinstance(boss_exp_rewards, str):
-                try:
-                    boss_exp_rewards = json.loads(boss_exp_rewards)
-                except:
-                    boss_exp_rewards = {}
-            
-            previous_boss_exp = boss_exp_rewards.get(str(int(boss_num) - 1), 0)
-    
-    # Calculate new EXP reward: 30% higher than previous, or base reward for first boss
-    if previous_boss_exp > 0:
-        exp_reward = int(round(previous_boss_exp * 1.3))  # 30% increase
-    else:
-        exp_reward = 300  # Base EXP reward for first boss (boss level * 100 * 3)
+    # EXP comes from the precomputed boss schedule (see reward_schedule.py)
+    previous_boss_exp = reward_schedule.boss_exp(int(boss_num) - 1)
+    exp_reward = reward_schedule.boss_exp(int(boss_num))
     
-    print(f"⭐ Boss {boss_num} EXP calculation:")
-    print(f"   Previous boss EXP: {previous_boss_exp}")
-    print(f"   New EXP reward: {exp_reward}")
+    log.debug("Boss %s EXP %s (previous boss %s)", boss_num, exp_reward, previous_boss_exp)
 
-    # Get user's current level, exp, and coins
-    user = supabase.table("users").select("account_level", "current_exp", "coins").eq("id", user_id).single().execute().data
+    # Get user's current level and exp, and coins so balance() below needs no re-read
+    user = user_cache.get_user(supabase, user_id, "account_level", "current_exp", "coins", fresh=True)
     account_level = user.get("account_level", 1)
     current_exp = user.get("current_exp", 0)
-    current_coins = user.get("coins", 0)
 
-    # Calculate required EXP for next level
-    required_exp = 50 * (1.05 ** (account_level - 1))
+    # Resolve every level-up this EXP causes in one step (see progression.py)
+    result = progression.apply_exp(account_level, current_exp, 0, exp_reward)
+    account_level = result["account_level"]
+    current_exp = result["current_exp"]
+    required_exp = result["required_exp"]
+    leveled_up = result["leveled_up"]
+    level_up_coins = result["level_up_coins"]
 
-    current_exp += exp_reward
-    leveled_up = False
-    level_up_coins = 0
-    new_coins = current_coins
-
-    while current_exp >= required_exp:
-        current_exp -= required_exp
-        account_level += 1
-        required_exp *= 1.05
-        leveled_up = True
-
-        # Calculate level up coin reward: 50 * (1.2^(account_level-1))
-        level_up_coins += int(round(50 * (1.2 ** (account_level - 1))))
-        new_coins += level_up_coins
-
-    # Update user's EXP, level, and coins
-    supabase.table("users").update({
+    # Update user's EXP and level, level-up coins go through the coin buffer
+    user_cache.update_user(supabase, user_id, {
         "account_level": account_level,
-        "current_exp": current_exp,
-        "coins": new_coins
-    }).eq("id", user_id).execute()
-
-    # Store this boss EXP reward for future calculations
-    progress_data = supabase.table("user_progress") \
-        .select("boss_exp_rewards") \
-        .eq("user_id", user_id) \
-        .eq("lesson", lesson) \
-        .single() \
-        .execute().data
-    
-    boss_exp_rewards = {}
-    if progress_data and progress_data.get("boss_exp_rewards"):
-        stored_rewards = progress_data["boss_exp_rewards"]
-        if isinstance(stored_rewards, str):
-            try:
-                boss_exp_rewards = json.loads(stored_rewards)
-            except:
-                boss_exp_rewards = {}
-        else:
-            boss_exp_rewards = stored_rewards
-    
-    boss_exp_rewards[str(boss_num)] = exp_reward
-    
-    # Update or insert the boss EXP rewards
-    if progress_data:
-        supabase.table("user_progress").update({
-            "boss_exp_rewards": json.dumps(boss_exp_rewards)
-        }).eq("user_id", user_id).eq("lesson", lesson).execute()
-    else:
-        supabase.table("user_progress").insert({
-            "user_id": user_id,
-            "lesson": lesson,
-            "highest_unlocked": 1,
-            "boss_exp_rewards": json.dumps(boss_exp_rewards)
-        }).execute()
+        "current_exp": current_exp
+    })
+    write_buffer.add_coins(user_id, result["new_coins"])
+    new_coins = write_buffer.balance(supabase, user_id)
 
     return jsonify({
         "message": f"✅ Gained {exp_reward} EXP from boss!",
@@ -1900,53 +1781,24 @@ def reward_boss_exp():
 @app.route('/api/debug-boss-rewards', methods=['GET'])
 @login_required
 def debug_boss_rewards():
-    """Debug endpoint to check current boss rewards"""
+    """Debug endpoint to check the boss reward schedule"""
     user_id = session["user_id"]
     lesson = request.args.get('lesson', 'tagalog')
-    
-    progress_data = supabase.table("user_progress") \
-        .select("boss_rewards, boss_exp_rewards") \
-        .eq("user_id", user_id) \
-        .eq("lesson", lesson) \
-        .single() \
-        .execute().data
-    
-    if progress_data:
-        boss_rewards = progress_data.get("boss_rewards", {})
-        boss_exp_rewards = progress_data.get("boss_exp_rewards", {})
-        
-        # Parse JSON strings if needed
-        if isinstance(boss_rewards, str):
-            try:
-                boss_rewards = json.loads(boss_rewards)
-            except:
-                boss_rewards = {}
-        
-        if isinstance(boss_exp_rewards, str):
-            try:
-                boss_exp_rewards = json.loads(boss_exp_rewards)
-            except:
-                boss_exp_rewards = {}
-        
-        return jsonify({
-            "user_id": user_id,
-            "lesson": lesson,
-            "boss_rewards": boss_rewards,
-            "boss_exp_rewards": boss_exp_rewards,
-            "raw_data": progress_data
-        })
-    else:
-        return jsonify({
-            "user_id": user_id,
-            "lesson": lesson,
-            "boss_rewards": {},
-            "boss_exp_rewards": {},
-            "note": "No progress record found"
-        })
+    bosses = request.args.get('bosses', 10, type=int)
+
+    # Boss rewards no longer depend on per-user history, so this is just the schedule
+    return jsonify({
+        "user_id": user_id,
+        "lesson": lesson,
+        "boss_rewards": {str(n): reward_schedule.boss_coins(n) for n in range(1, bosses + 1)},
+        "boss_exp_rewards": {str(n): reward_schedule.boss_exp(n) for n in range(1, bosses + 1)},
+        "note": "Rewards come from reward_schedule.py"
+    })
 
 
 @app.route('/api/boss-reward-reduced', methods=['POST'])
 @login_required
+@idempotent
 def reward_boss_reduced():
     user_id = session.get("user_id")
     data = request.json
@@ -1957,28 +1809,17 @@ def reward_boss_reduced():
     if not boss_num or not lesson:
         return jsonify({"message": "Missing boss number or lesson"}), 400
 
-    print(f"💀 Reduced boss reward: {reduced_amount} coins for boss {boss_num}")
-
-    # Get current coin count
-    user_data = (
-        supabase.table("users")
-        .select("coins")
-        .eq("id", user_id)
-        .single()
-        .execute()
-    )
+    log.debug("Reduced boss reward: %s coins for boss %s", reduced_amount, boss_num)
 
-    user = user_data.data
-    if not user:
-        print("❌ User not found.")
+    # Queue the coins, they're flushed in a batch (see write_buffer.py)
+    current_coins = write_buffer.balance(supabase, user_id)
+    if current_coins is None:
+        log.warning("Boss reward: user %s not found", user_id)
         return jsonify({"message": "User not found"}), 404
 
-    current_coins = user.get("coins", 0)
+    write_buffer.add_coins(user_id, reduced_amount)
     new_coins = current_coins + reduced_amount
-    print(f"💰 Coins before: {current_coins}, after: {new_coins}")
-
-    # Update coins
-    supabase.table("users").update({"coins": new_coins}).eq("id", user_id).execute()
+    log.debug("Coins before: %s, after: %s", current_coins, new_coins)
 
     return jsonify({
         "message": "✅ Reduced boss coins rewarded!",
@@ -1989,6 +1830,7 @@ def reward_boss_reduced():
 
 @app.route('/api/boss-exp-reward-reduced', methods=['POST'])
 @login_required
+@idempotent
 def reward_boss_exp_reduced():
     user_id = session.get("user_id")
     data = request.json
@@ -1999,38 +1841,28 @@ def reward_boss_exp_reduced():
     if not boss_num or not lesson:
         return jsonify({"message": "Missing boss number or lesson"}), 400
 
-    print(f"💀 Reduced boss EXP: {reduced_amount} EXP for boss {boss_num}")
+    log.debug("Reduced boss EXP: %s for boss %s", reduced_amount, boss_num)
 
-    # Get user's current level, exp, and coins
-    user = supabase.table("users").select("account_level", "current_exp", "coins").eq("id", user_id).single().execute().data
+    # Get user's current level and exp, and coins so balance() below needs no re-read
+    user = user_cache.get_user(supabase, user_id, "account_level", "current_exp", "coins", fresh=True)
     account_level = user.get("account_level", 1)
     current_exp = user.get("current_exp", 0)
-    current_coins = user.get("coins", 0)
-
-    # Calculate required EXP for next level
-    required_exp = 50 * (1.05 ** (account_level - 1))
-
-    current_exp += reduced_amount
-    leveled_up = False
-    level_up_coins = 0
-    new_coins = current_coins
-
-    while current_exp >= required_exp:
-        current_exp -= required_exp
-        account_level += 1
-        required_exp *= 1.05
-        leveled_up = True
 
-        # Calculate level up coin reward: 50 * (1.2^(account_level-1))
-        level_up_coins += int(round(50 * (1.2 ** (account_level - 1))))
-        new_coins += level_up_coins
+    # Resolve every level-up this EXP causes in one step (see progression.py)
+    result = progression.apply_exp(account_level, current_exp, 0, reduced_amount)
+    account_level = result["account_level"]
+    current_exp = result["current_exp"]
+    required_exp = result["required_exp"]
+    leveled_up = result["leveled_up"]
+    level_up_coins = result["level_up_coins"]
 
-    # Update user's EXP, level, and coins
-    supabase.table("users").update({
+    # Update user's EXP and level, level-up coins go through the coin buffer
+    user_cache.update_user(supabase, user_id, {
         "account_level": account_level,
-        "current_exp": current_exp,
-        "coins": new_coins
-    }).eq("id", user_id).execute()
+        "current_exp": current_exp
+    })
+    write_buffer.add_coins(user_id, result["new_coins"])
+    new_coins = write_buffer.balance(supabase, user_id)
 
     return jsonify({
         "message": f"✅ Gained {reduced_amount} reduced EXP from boss!",
@@ -2044,11 +1876,14 @@ def reward_boss_exp_reduced():
     })
 
 @app.route('/api/items-by-level/<int:level>')
+@http_cache.cache_control(http_cache.MEMBER_CONTENT)
 @login_required
 def get_items_by_level(level):
     """Get items that unlock at a specific level"""
     try:
-        items = supabase.table("items").select("*").eq("required_level", level).execute().data
+        # Served from the shared items catalog (see catalog_cache.py)
+        catalog = catalog_cache.get_items(supabase)
+        items = [catalog[item_id] for item_id in sorted(catalog) if catalog[item_id].get("required_level") == level]
         return jsonify({
             "success": True,
             "items": items
@@ -2060,15 +1895,9 @@ def get_items_by_level(level):
             "items": []
     })
 
-@app.route('/api/feedback', methods=['POST'])
-@login_required
-def get_feedback():
-    data = request.json
-    user_id = session['user_id']
-    user = supabase.table("users").select("preferred_language").eq("id", user_id).single().execute().data
-    lang = user.get("preferred_language", "tagalog")
-
-    prompt = f"""
+def feedback_prompt(lang, data):
+    """Gemini prompt for /api/feedback (shared with asgi.py)."""
+    return f"""
     [Language: {lang.upper()}]
     A student just answered a language quiz.
     Question: {data.get("question", "")}
@@ -2077,6 +1906,17 @@ def get_feedback():
     
     Give a friendly, educational feedback in {lang}. Help the student understand why their answer is correct or not, and a tip to improve.
     """
+
+
+@app.route('/api/feedback', methods=['POST'])
+@login_required
+def get_feedback():
+    data = request.json
+    user_id = session['user_id']
+    user = user_cache.get_user(supabase, user_id, "preferred_language")
+    lang = user.get("preferred_language", "tagalog")
+
+    prompt = feedback_prompt(lang, data)
     try:
         response = model.generate_content(prompt)
         return jsonify({"feedback": response.text.strip()})
@@ -2085,6 +1925,8 @@ def get_feedback():
 
 
 
-        
+
+_setup_app()
+
 if __name__ == "__main__":
-    app.run(debug=False)
+    create_app().run(debug=False)
@@ -0,0 +1,407 @@
+import asyncio
+import contextvars
+import functools
+import json
+import logging
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from http.cookies import SimpleCookie
+from tempfile import SpooledTemporaryFile
+from urllib.parse import parse_qs
+
+import httpx
+from itsdangerous import BadSignature
+from supabase import acreate_client
+
+import app as flask_module
+import catalog_cache
+import compression
+import fast_json
+import http_cache
+import level_lesson
+import logs
+import metrics
+import services
+import user_cache
+
+# ⚡ ASGI entry point
+#
+#   uvicorn asgi:application --workers 4
+#
+# The slow endpoints mostly wait on another service: Google TTS, Gemini, and
+# lesson files in Supabase Storage. In the WSGI app each of those calls holds a
+# worker thread until it returns. Here they are handled natively on the event
+# loop with async clients (httpx.AsyncClient, supabase AsyncClient and Gemini's
+# generate_content_async), so one process can keep thousands of them in flight.
+#
+# Every other path is passed through to the Flask app unchanged, each request
+# on a thread from a pool of WSGI_THREADS (asgiref's own WsgiToAsgi would run
+# them all on a single thread per process, one at a time). The handlers below
+# reuse the Flask routes' helpers, so both modes build the same requests and
+# responses. `python app.py` / any WSGI server keeps working exactly as before.
+
+HTTP_TIMEOUT_SECONDS = float(os.getenv("ASYNC_HTTP_TIMEOUT_SECONDS", "10"))
+MAX_CONNECTIONS = int(os.getenv("ASYNC_MAX_CONNECTIONS", "1000"))
+MAX_BODY_BYTES = 1024 * 1024
+WSGI_THREADS = int(os.getenv("WSGI_THREADS", "32"))
+
+log = logging.getLogger(__name__)
+
+_wsgi_executor = ThreadPoolExecutor(max_workers=WSGI_THREADS, thread_name_prefix="wsgi")
+
+
+# === WSGI passthrough ===
+
+def _wsgi_environ(scope, body):
+    """The PEP 3333 environ for an ASGI http `scope` whose request body is in `body`."""
+    script_name = scope.get("root_path", "")
+    path_info = scope["path"]
+    if script_name and path_info.startswith(script_name):
+        path_info = path_info[len(script_name):]
+    server = scope.get("server") or ("localhost", 80)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": script_name.encode("utf-8").decode("latin-1"),
+        "PATH_INFO": path_info.encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1] or 80),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": body,
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    if scope.get("client"):
+        environ["REMOTE_ADDR"], environ["REMOTE_PORT"] = scope["client"][0], str(scope["client"][1])
+    for name, value in scope.get("headers") or []:
+        name = name.decode("latin-1")
+        if name in ("content-length", "content-type"):
+            key = name.upper().replace("-", "_")
+        else:
+            key = "HTTP_" + name.upper().replace("-", "_")
+        value = value.decode("latin-1")
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+def _run_wsgi(wsgi_app, environ, send, loop):
+    """Run one request through `wsgi_app` on this (pool) thread, streaming the response to `send`."""
+    def send_sync(message):
+        asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+    response = {}
+
+    def start_response(status, headers, exc_info=None):
+        if exc_info and response.get("sent"):
+            raise exc_info[1].with_traceback(exc_info[2])
+        response["status"] = int(status.split(" ", 1)[0])
+        response["headers"] = [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers]
+
+    def send_start():
+        if not response.get("sent"):
+            response["sent"] = True
+            send_sync({"type": "http.response.start", "status": response["status"], "headers": response["headers"]})
+
+    result = wsgi_app(environ, start_response)
+    try:
+        for chunk in result:
+            if chunk:
+                send_start()
+                send_sync({"type": "http.response.body", "body": chunk, "more_body": True})
+        send_start()
+        send_sync({"type": "http.response.body", "body": b""})
+    finally:
+        if hasattr(result, "close"):
+            result.close()
+
+
+class _PooledWsgi:
+    """ASGI -> WSGI adapter running every request on its own thread from _wsgi_executor."""
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            raise ValueError(f"WSGI passthrough can't handle {scope['type']!r} connections")
+        body = SpooledTemporaryFile(max_size=MAX_BODY_BYTES)
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            body.write(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+        body.seek(0)
+        loop = asyncio.get_running_loop()
+        # Same context as the caller, like a thread_sensitive=False sync_to_async
+        call = functools.partial(_run_wsgi, self.wsgi_app, _wsgi_environ(scope, body), send, loop)
+        try:
+            await loop.run_in_executor(_wsgi_executor, contextvars.copy_context().run, call)
+        finally:
+            body.close()
+
+
+flask_app = flask_module.create_app()
+_wsgi = _PooledWsgi(flask_app)
+_clients = {}
+_startup_lock = asyncio.Lock()
+
+
+# === Clients ===
+
+async def _startup():
+    if "http" in _clients and "supabase" in _clients:
+        return
+    # Concurrent first requests wait here instead of each building clients
+    async with _startup_lock:
+        if "http" not in _clients:
+            _clients["http"] = httpx.AsyncClient(
+                timeout=HTTP_TIMEOUT_SECONDS,
+                limits=httpx.Limits(max_connections=MAX_CONNECTIONS)
+            )
+        if "supabase" not in _clients:
+            client = await acreate_client(services.SUPABASE_URL, services.SUPABASE_KEY)
+            metrics.instrument_httpx(client.postgrest.session, "supabase")
+            _clients["supabase"] = client
+
+
+async def _shutdown():
+    client = _clients.pop("http", None)
+    if client:
+        await client.aclose()
+    _clients.pop("supabase", None)
+
+
+# === Request / response helpers ===
+
+def _session(scope):
+    """Read (not write) the signed Flask session cookie."""
+    headers = dict(scope.get("headers") or [])
+    cookie = SimpleCookie(headers.get(b"cookie", b"").decode("latin-1"))
+    name = flask_app.config["SESSION_COOKIE_NAME"]
+    if name not in cookie:
+        return {}
+    serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+    if serializer is None:
+        return {}
+    try:
+        return serializer.loads(
+            cookie[name].value,
+            max_age=int(flask_app.permanent_session_lifetime.total_seconds())
+        )
+    except BadSignature:
+        return {}
+
+
+async def _read_json(receive):
+    body = b""
+    more = True
+    while more:
+        message = await receive()
+        body += message.get("body", b"")
+        more = message.get("more_body", False)
+        if len(body) > MAX_BODY_BYTES:
+            return None
+    try:
+        return json.loads(body) if body else None
+    except ValueError:
+        return None
+
+
+def _query(scope):
+    params = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    return {k: v[0] for k, v in params.items()}
+
+
+async def _send_json(send, body, status=200, scope=None, cache_control=None):
+    """
+    Send `body` as JSON, compressed when it's big enough and the client accepts it.
+    With `cache_control`, adds an ETag and answers a matching If-None-Match with a 304.
+    """
+    payload = fast_json.dumps_bytes(body)
+    request_headers = dict(scope.get("headers") or []) if scope else {}
+    headers = [(b"vary", b"Accept-Encoding")]
+    tag = None
+    if cache_control and status == 200:
+        tag = http_cache.etag(payload)
+        if http_cache.not_modified(request_headers.get(b"if-none-match", b"").decode("latin-1"), tag):
+            status, payload = 304, b""
+    encoding = None
+    if status != 304 and compression.compressible("application/json", len(payload)):
+        encoding = compression.choose_encoding(request_headers.get(b"accept-encoding", b"").decode("latin-1"))
+    if encoding:
+        payload = compression.compress(payload, encoding, tag)
+        headers.append((b"content-encoding", encoding.encode("ascii")))
+    if tag:
+        etag = f'W/"{tag}"' if encoding else f'"{tag}"'
+        headers += [(b"etag", etag.encode("ascii")), (b"cache-control", cache_control.encode("ascii"))]
+    if status != 304:
+        headers += [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(payload)).encode("ascii"))
+        ]
+    request_id = logs.current_request_id()
+    if request_id:
+        headers.append((logs.REQUEST_ID_HEADER.lower().encode("ascii"), request_id.encode("ascii")))
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": payload})
+
+
+async def _redirect_to_login(send):
+    await send({"type": "http.response.start", "status": 302, "headers": [(b"location", b"/")]})
+    await send({"type": "http.response.body", "body": b""})
+
+
+# === Async handlers (same behaviour as the Flask routes) ===
+
+async def google_tts(scope, receive, send, session):
+    data = await _read_json(receive)
+    url, payload, mapped_language, error = flask_module.tts_request(data)
+    if error:
+        return await _send_json(send, *error)
+
+    try:
+        with metrics.upstream("tts"):
+            response = await _clients["http"].post(url, json=payload)
+        body, status = flask_module.tts_response(
+            response.status_code, response.json, response.text, data, mapped_language
+        )
+    except httpx.HTTPError as e:
+        log.warning("Google TTS request error: %s", e)
+        body, status = {"error": "TTS request failed", "details": str(e)}, 500
+    await _send_json(send, body, status, scope)
+
+
+async def feedback(scope, receive, send, session):
+    data = await _read_json(receive) or {}
+    user = await user_cache.aget_user(_clients["supabase"], session["user_id"], "preferred_language")
+    lang = user.get("preferred_language", "tagalog")
+
+    try:
+        response = await services.model.generate_content_async(flask_module.feedback_prompt(lang, data))
+        await _send_json(send, {"feedback": response.text.strip()})
+    except Exception:
+        await _send_json(send, {"feedback": "AI feedback is unavailable at the moment."})
+
+
+async def word_info(scope, receive, send, session):
+    data = await _read_json(receive) or {}
+    word = data.get("word")
+    if not word:
+        return await _send_json(send, {"error": "Missing word"}, 400)
+
+    user = await user_cache.aget_user(
+        _clients["supabase"], session["user_id"], "lesson_language", "preferred_language"
+    )
+    lesson_lang = user.get("lesson_language", "waray").lower()
+    preferred_lang = user.get("preferred_language", "tagalog").lower()
+
+    rows = (await _clients["supabase"].table("questionanswer")
+            .select("english, tagalog, waray, cebuano")
+            .ilike(lesson_lang, f"%{word}%")
+            .execute()).data
+    if not rows:
+        return await _send_json(send, {"error": "Word not found in context"}, 404)
+
+    prompt = flask_module.word_info_prompt(word, rows, lesson_lang, preferred_lang)
+    try:
+        response = await services.model.generate_content_async(prompt)
+        await _send_json(send, {"definition": response.text.strip()})
+    except Exception:
+        await _send_json(send, {"definition": "⚠️ Definition unavailable at the moment."})
+
+
+async def lesson_content(scope, receive, send, session):
+    params = _query(scope)
+    lesson = params.get("lesson")
+    level = params.get("level")
+
+    if lesson not in level_lesson.LESSONS:
+        return await _send_json(send, {"success": False, "error": "Invalid lesson type"}, 400)
+
+    try:
+        # Same memoized lesson text as the Flask route (see catalog_cache.py)
+        cache_key = f"lesson:{lesson}:{int(level)}"
+        content = catalog_cache.cached_content(cache_key)
+        if content is not None:
+            return await _send_json(send, {"success": True, "content": content},
+                                    scope=scope, cache_control=http_cache.CONTENT)
+
+        response = await _clients["supabase"].table(f"{lesson}_lessons") \
+            .select(lesson).eq("level", int(level)).single().execute()
+        if not (response.data and lesson in response.data):
+            return await _send_json(send, {"success": False, "error": "Lesson not found in database"}, 404)
+
+        file_url = level_lesson.lesson_file_url(response.data[lesson])
+        if not file_url:
+            return await _send_json(send, {"success": False, "error": "Unexpected Supabase response"}, 500)
+
+        with metrics.upstream("storage"):
+            file_response = await _clients["http"].get(file_url)
+        if file_response.status_code == 200:
+            catalog_cache.store_content(cache_key, file_response.text)
+            return await _send_json(send, {"success": True, "content": file_response.text},
+                                    scope=scope, cache_control=http_cache.CONTENT)
+        return await _send_json(send, {
+            "success": False,
+            "error": f"Failed to fetch file content (status {file_response.status_code})"
+        }, 404)
+    except Exception as e:
+        log.exception("lesson_content failed")
+        await _send_json(send, {"success": False, "error": str(e)}, 500)
+
+
+# (method, path) -> (handler, login required)
+ASYNC_ROUTES = {
+    ("POST", "/api/google-tts"): (google_tts, True),
+    ("POST", "/api/feedback"): (feedback, True),
+    ("POST", "/api/word-info"): (word_info, True),
+    ("GET", "/api/lesson-content"): (lesson_content, False),
+}
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await _startup()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await _shutdown()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    route = ASYNC_ROUTES.get((scope.get("method"), scope.get("path"))) if scope["type"] == "http" else None
+    if route is None:
+        return await _wsgi(scope, receive, send)
+
+    handler, needs_login = route
+    session = _session(scope)
+    if needs_login and "user_id" not in session:
+        return await _redirect_to_login(send)
+
+    # Same request ID handling as the Flask app (see logs.py)
+    incoming = dict(scope.get("headers") or []).get(logs.REQUEST_ID_HEADER.lower().encode("ascii"), b"")
+    tokens = logs.bind_request(logs.new_request_id(incoming.decode("latin-1")))
+    metrics_tokens = metrics.begin_request(scope["path"])
+    status = [500]
+
+    async def send_and_record(message):
+        if message["type"] == "http.response.start":
+            status[0] = message["status"]
+        await send(message)
+
+    try:
+        # Servers without lifespan support create the clients on first use
+        await _startup()
+        await handler(scope, receive, send_and_record, session)
+    finally:
+        metrics.end_request(metrics_tokens, scope["method"], status[0])
+        logs.unbind_request(tokens)
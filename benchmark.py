@@ -0,0 +1,326 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+
+from jinja2 import ChoiceLoader, DictLoader, TemplateNotFound
+
+import fake_supabase
+import seed_data
+
+# ⏱️ Benchmarks for the learner hot paths
+#
+#   python benchmark.py                                  (writes bench_results/<commit>.json)
+#   python benchmark.py --latency-ms 20 --iterations 300
+#   python benchmark.py --compare bench_results/abc1234.json
+#
+# Seeds fake_supabase.py with seed_data.generate(), then drives the real Flask
+# routes through the test client, rotating through the seeded users so the
+# per-user caches behave as they would with real traffic. Each scenario runs
+# twice: a timed pass (latency percentiles and Supabase calls per iteration)
+# and a shorter pass under tracemalloc (peak allocation per iteration), kept
+# separate because tracing slows everything down.
+#
+# Results are JSON so two commits can be compared: --compare prints the
+# change per scenario and exits with 1 when p95 latency or DB calls grew by
+# more than --threshold percent.
+#
+# A scenario with any failed iteration is reported as FAILED, without
+# latencies, and the run exits with 1. A scenario whose page template isn't
+# in the tree (shop.html) renders an empty stub instead, so only its data
+# loading is measured; the output says so.
+
+SCENARIOS = {}
+STUB_TEMPLATES = {}  # scenario -> templates stubbed out when missing
+
+
+def scenario(name, stub_templates=()):
+    def register(fn):
+        SCENARIOS[name] = fn
+        STUB_TEMPLATES[name] = tuple(stub_templates)
+        return fn
+    return register
+
+
+def _check(response):
+    if response.status_code >= 400:
+        raise RuntimeError(f"{response.request.method} {response.request.path} -> {response.status_code}")
+    return response
+
+
+@scenario("questions")
+def questions(client, user):
+    _check(client.get(f"/api/questions/{user['level']}"))
+
+
+@scenario("level_complete")
+def level_complete(client, user):
+    """What quiz.html sends when a level ends: progress, coins, streak bonus, EXP."""
+    key = {"Idempotency-Key": uuid.uuid4().hex}
+    level, lesson = user["level"], user["lesson"]
+    _check(client.post("/api/complete_level", json={
+        "level": level, "lesson": lesson, "perfect_score": True,
+        "total_questions": 10, "correct_answers": 10
+    }))
+    _check(client.post("/api/reward", json={"level": level, "lesson": lesson}, headers=key))
+    _check(client.post("/api/streak-reward", json={"streak": 10}, headers=key))
+    _check(client.post("/api/gain-exp", json={"level": level, "wrong_count": 0}, headers=key))
+
+
+@scenario("my_words")
+def my_words(client, user):
+    _check(client.get("/my-words"))
+
+
+@scenario("dashboard_stats")
+def dashboard_stats(client, user):
+    _check(client.get("/api/dashboard-stats"))
+
+
+@scenario("leaderboard")
+def leaderboard(client, user):
+    _check(client.get("/leaderboard"))
+
+
+@scenario("shop", stub_templates=("shop.html",))
+def shop(client, user):
+    _check(client.get("/shop"))
+
+
+# === Running ===
+
+def _percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(p / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)), check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _setup(args):
+    """Start the fake backend and import the app against it."""
+    dataset = seed_data.generate(users=args.users, levels=args.levels, seed=args.seed)
+    fake = fake_supabase.FakeSupabase(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, seed=dataset).start()
+
+    os.environ.update({
+        "SUPABASE_URL": fake.url,
+        "SUPABASE_KEY": "benchmark",
+        "FLASK_SECRET_KEY": "benchmark",
+        "GEMINI_API_KEY": "benchmark",
+        # Only the requests being measured should reach the fake
+        "WRITE_BUFFER_FLUSH_SECONDS": "3600",
+        "WRITE_BUFFER_SPEND_RETRY_SECONDS": "0",
+        "WRITE_BUFFER_DIR": tempfile.mkdtemp(prefix="bench-write-buffer-"),
+        # Failures are counted per scenario instead of logged
+        "LOG_LEVEL": os.getenv("LOG_LEVEL", "CRITICAL"),
+        "QUERY_BUDGET_MODE": os.getenv("QUERY_BUDGET_MODE", "off"),
+    })
+    os.environ.pop("METRICS_DIR", None)
+    import app
+    flask_app = app.create_app()
+
+    users = []
+    progress = {(p["user_id"], p["lesson"]): p["highest_unlocked"] for p in dataset["tables"]["user_progress"]}
+    for row in dataset["tables"]["users"]:
+        lesson = row["lesson_language"]
+        users.append({"id": row["id"], "lesson": lesson, "level": progress[(row["id"], lesson)]})
+    return fake, flask_app, users
+
+
+def _login(client, user):
+    with client.session_transaction() as session:
+        session["user_id"] = user["id"]
+
+
+def _stub_missing_templates(flask_app, names):
+    """Serve an empty template for each of `names` the app can't find; return the stubbed ones."""
+    missing = []
+    for name in names:
+        try:
+            flask_app.jinja_env.get_template(name)
+        except TemplateNotFound:
+            missing.append(name)
+    if missing:
+        flask_app.jinja_env.loader = ChoiceLoader([
+            flask_app.jinja_env.loader,
+            DictLoader({name: "" for name in missing})
+        ])
+    return missing
+
+
+def run_scenario(name, fn, fake, client, users, args):
+    cursor = [0]
+
+    def next_user():
+        user = users[cursor[0] % len(users)]
+        cursor[0] += 1
+        _login(client, user)
+        return user
+
+    for _ in range(args.warmup):
+        try:
+            fn(client, next_user())
+        except RuntimeError:
+            pass
+
+    latencies, db_calls, errors = [], [], {}
+    for _ in range(args.iterations):
+        user = next_user()
+        before = fake.requests
+        start = time.perf_counter()
+        try:
+            fn(client, user)
+        except RuntimeError as e:
+            errors[str(e)] = errors.get(str(e), 0) + 1
+        latencies.append((time.perf_counter() - start) * 1000)
+        db_calls.append(fake.requests - before)
+
+    peaks = []
+    tracemalloc.start()
+    for _ in range(args.alloc_iterations):
+        user = next_user()
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        try:
+            fn(client, user)
+        except RuntimeError:
+            pass
+        peaks.append((tracemalloc.get_traced_memory()[1] - base) / 1024)
+    tracemalloc.stop()
+
+    if errors:
+        # Timings of requests that failed say nothing about the hot path
+        return {
+            "iterations": args.iterations,
+            "failed": True,
+            "errors": sum(errors.values()),
+            "error_samples": dict(list(errors.items())[:5]),
+        }
+
+    latencies.sort()
+    return {
+        "iterations": args.iterations,
+        "failed": False,
+        "errors": 0,
+        "error_samples": {},
+        "p50_ms": round(_percentile(latencies, 50), 2),
+        "p95_ms": round(_percentile(latencies, 95), 2),
+        "p99_ms": round(_percentile(latencies, 99), 2),
+        "mean_ms": round(sum(latencies) / len(latencies), 2),
+        "max_ms": round(latencies[-1], 2),
+        "db_calls_mean": round(sum(db_calls) / len(db_calls), 2),
+        "db_calls_max": max(db_calls),
+        "alloc_peak_kib_mean": round(sum(peaks) / len(peaks), 1) if peaks else None,
+    }
+
+
+def compare(old, new, threshold):
+    """Print old vs new per scenario; return True when something regressed."""
+    regressed = False
+    print(f"{'scenario':<18}{'p50 ms':>18}{'p95 ms':>18}{'db calls':>16}")
+    for name, result in new["scenarios"].items():
+        before = old["scenarios"].get(name)
+        if result["failed"]:
+            print(f"{name:<18}{'FAILED':>18}")
+            regressed = True
+            continue
+        if before is None or before.get("failed"):
+            print(f"{name:<18}{'(new)':>18}")
+            continue
+        flags = []
+        for key in ("p95_ms", "db_calls_mean"):
+            if before[key] and (result[key] - before[key]) / before[key] * 100 > threshold:
+                flags.append(key)
+        regressed = regressed or bool(flags)
+        print(
+            f"{name:<18}"
+            f"{before['p50_ms']:>8} → {result['p50_ms']:<7}"
+            f"{before['p95_ms']:>8} → {result['p95_ms']:<7}"
+            f"{before['db_calls_mean']:>6} → {result['db_calls_mean']:<7}"
+            + ("  ⚠️ " + ", ".join(flags) if flags else "")
+        )
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the learner hot paths against fake_supabase.py")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--levels", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--latency-ms", type=float, default=20, help="simulated Supabase round trip")
+    parser.add_argument("--jitter-ms", type=float, default=5)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--alloc-iterations", type=int, default=20)
+    parser.add_argument("--only", nargs="*", choices=sorted(SCENARIOS), help="run only these scenarios")
+    parser.add_argument("--output", help="where to write the results (default bench_results/<commit>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=20, help="regression threshold in percent")
+    args = parser.parse_args()
+
+    fake, flask_app, users = _setup(args)
+    client = flask_app.test_client()
+
+    results = {
+        "commit": _commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "config": {k: getattr(args, k) for k in ("users", "levels", "seed", "latency_ms", "jitter_ms", "iterations")},
+        "scenarios": {},
+    }
+    failed = []
+    for name, fn in SCENARIOS.items():
+        if args.only and name not in args.only:
+            continue
+        stubbed = _stub_missing_templates(flask_app, STUB_TEMPLATES[name])
+        if stubbed:
+            print(f"⚠️  {name}: {', '.join(stubbed)} not found, rendering an empty stub (template cost not measured)")
+        result = run_scenario(name, fn, fake, client, users, args)
+        result["stubbed_templates"] = stubbed
+        results["scenarios"][name] = result
+        if result["failed"]:
+            failed.append(name)
+            print(f"{name:<18} FAILED  {result['errors']}/{result['iterations']} iterations errored")
+            for error, count in result["error_samples"].items():
+                print(f"{'':<18}   {count}x {error}")
+            continue
+        print(
+            f"{name:<18} p50 {result['p50_ms']:>8.2f}ms  p95 {result['p95_ms']:>8.2f}ms  "
+            f"p99 {result['p99_ms']:>8.2f}ms  db {result['db_calls_mean']:>5.1f}  "
+            f"alloc {result['alloc_peak_kib_mean']}KiB"
+        )
+
+    output = args.output or os.path.join("bench_results", f"{results['commit']}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"📄 Results written to {output}")
+
+    import write_buffer
+    write_buffer.stop()
+    fake.stop()
+
+    if args.compare:
+        with open(args.compare) as f:
+            old = json.load(f)
+        return 1 if compare(old, results, args.threshold) else 0
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+import threading
+import time
+
+# 🗂️ Cache for global catalog tables (shop items, avatars)
+#
+# These tables are the same for every player and only change through the admin
+# blueprint, so we keep one copy per worker and let admin routes invalidate it.
+#
+# get_content() memoizes other global content the same way (lesson text, boss
+# word lists), under keys like "lesson:tagalog:3" so a whole kind can be
+# dropped with invalidate_content("lesson:").
+
+CATALOG_TTL_SECONDS = 300   # Safety net in case an edit happens outside admin.py
+CONTENT_MAX_ENTRIES = 2000
+
+_catalogs = {}              # table name -> (rows keyed by id, loaded_at)
+_catalogs_lock = threading.Lock()
+_content = {}               # key -> (value, loaded_at)
+
+
+def invalidate(table=None):
+    """Drop one cached catalog table, or all of them."""
+    with _catalogs_lock:
+        if table is None:
+            _catalogs.clear()
+        else:
+            _catalogs.pop(table, None)
+
+
+def get_catalog(supabase, table):
+    """Return {id: row} for a whole catalog table, loading it if stale."""
+    now = time.monotonic()
+    with _catalogs_lock:
+        cached = _catalogs.get(table)
+    if cached and now - cached[1] < CATALOG_TTL_SECONDS:
+        return cached[0]
+
+    rows = supabase.table(table).select("*").execute().data or []
+    by_id = {row["id"]: row for row in rows}
+    with _catalogs_lock:
+        _catalogs[table] = (by_id, now)
+    return by_id
+
+
+def get_items(supabase):
+    """All shop items keyed by id."""
+    return get_catalog(supabase, "items")
+
+
+def get_avatars(supabase):
+    """All shop avatars keyed by id."""
+    return get_catalog(supabase, "avatars")
+
+
+def cached_content(key):
+    """The memoized value for `key`, or None when it's missing or stale."""
+    with _catalogs_lock:
+        cached = _content.get(key)
+    if cached and time.monotonic() - cached[1] < CATALOG_TTL_SECONDS:
+        return cached[0]
+    return None
+
+
+def store_content(key, value):
+    """Memoize `value` under `key`, dropping the oldest entry when full."""
+    with _catalogs_lock:
+        if key not in _content and len(_content) >= CONTENT_MAX_ENTRIES:
+            del _content[min(_content, key=lambda k: _content[k][1])]
+        _content[key] = (value, time.monotonic())
+
+
+def get_content(key, load):
+    """Return the memoized value for `key`, calling load() when missing or stale."""
+    value = cached_content(key)
+    if value is None:
+        value = load()
+        store_content(key, value)
+    return value
+
+
+def invalidate_content(prefix=""):
+    """Drop every memoized value whose key starts with `prefix` (all of them by default)."""
+    with _catalogs_lock:
+        for key in [k for k in _content if k.startswith(prefix)]:
+            del _content[key]
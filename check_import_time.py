@@ -0,0 +1,56 @@
+import os
+import subprocess
+import sys
+
+# ⏱️ Import-time budget
+#
+#   python check_import_time.py            (exit code 1 when over budget)
+#   python check_import_time.py wsgi       (measure another module)
+#
+# Imports the module in a fresh interpreter with `python -X importtime` and
+# compares the total against IMPORT_BUDGET_SECONDS. The slowest imports are
+# printed so a regression points at its cause (usually a heavy SDK imported at
+# module level instead of inside services.py).
+
+IMPORT_BUDGET_SECONDS = float(os.getenv("IMPORT_BUDGET_SECONDS", "1.5"))
+SHOW_SLOWEST = 15
+
+
+def measure(module):
+    """Return (total seconds, [(cumulative seconds, package), ...]) for importing `module`."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    # Lines look like: "import time:   self [us] |  cumulative | imported package"
+    timings = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, package = line[len("import time:"):].split("|", 2)
+        timings.append((int(cumulative) / 1e6, package.rstrip()))
+
+    total = next((t for t, pkg in timings if pkg.strip() == module), 0.0)
+    return total, sorted(timings, reverse=True)
+
+
+def main():
+    module = sys.argv[1] if len(sys.argv) > 1 else "app"
+    total, timings = measure(module)
+
+    print(f"Slowest imports under '{module}':")
+    for seconds, package in timings[:SHOW_SLOWEST]:
+        print(f"  {seconds * 1000:8.1f} ms  {package}")
+
+    if total > IMPORT_BUDGET_SECONDS:
+        print(f"❌ import {module}: {total:.3f}s, over the {IMPORT_BUDGET_SECONDS:.3f}s budget")
+        return 1
+    print(f"✅ import {module}: {total:.3f}s (budget {IMPORT_BUDGET_SECONDS:.3f}s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
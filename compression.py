@@ -0,0 +1,114 @@
+import gzip
+import os
+import threading
+from collections import OrderedDict
+
+from werkzeug.http import parse_accept_header
+
+try:
+    import brotli
+except ImportError:  # pinned in requirements.txt; gzip only without it
+    brotli = None
+
+# 🗜️ Response compression
+#
+# HTML, JSON and other text responses of at least COMPRESS_MIN_BYTES are sent
+# compressed to clients that accept it: brotli when the `brotli` package is
+# installed and the client asks for it, gzip otherwise. Smaller responses
+# aren't worth the CPU; images, audio and already-encoded bodies pass through.
+#
+# A compressed response keeps its ETag, marked weak (W/"..."): the bytes
+# differ from the uncompressed ones, but If-None-Match still matches, so the
+# 304s from http_cache.py keep working.
+#
+# Bodies that carry an ETag are the same bytes every time (memoized lesson
+# content, the item catalog...), so their compressed variants are kept, keyed
+# by ETag, and a repeat costs no compression at all. COMPRESS_CACHE_ENTRIES
+# variants at most, oldest dropped first.
+
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+COMPRESS_GZIP_LEVEL = int(os.getenv("COMPRESS_GZIP_LEVEL", "6"))
+COMPRESS_BROTLI_QUALITY = int(os.getenv("COMPRESS_BROTLI_QUALITY", "5"))
+COMPRESS_CACHE_ENTRIES = int(os.getenv("COMPRESS_CACHE_ENTRIES", "256"))
+
+COMPRESSIBLE_TYPES = {
+    "text/html", "text/plain", "text/css", "text/javascript", "text/csv",
+    "application/json", "application/javascript", "image/svg+xml",
+}
+
+_lock = threading.Lock()
+_variants = OrderedDict()  # (etag, encoding) -> compressed body
+
+
+def choose_encoding(accept_encoding):
+    """The encoding to answer an Accept-Encoding header value with ("br", "gzip" or None)."""
+    accepted = parse_accept_header(accept_encoding or "")
+    if brotli is not None and accepted.quality("br") > 0:
+        return "br"
+    if accepted.quality("gzip") > 0:
+        return "gzip"
+    return None
+
+
+def compressible(mimetype, size):
+    return mimetype in COMPRESSIBLE_TYPES and size >= COMPRESS_MIN_BYTES
+
+
+def compress(body, encoding, tag=None):
+    """`body` compressed with `encoding`; with a `tag` (the body's ETag) the result is kept for next time."""
+    if tag is not None:
+        with _lock:
+            data = _variants.get((tag, encoding))
+            if data is not None:
+                _variants.move_to_end((tag, encoding))
+                return data
+    if encoding == "br":
+        data = brotli.compress(body, quality=COMPRESS_BROTLI_QUALITY)
+    else:
+        # mtime=0 so the same body always compresses to the same bytes
+        data = gzip.compress(body, compresslevel=COMPRESS_GZIP_LEVEL, mtime=0)
+    if tag is not None:
+        with _lock:
+            _variants[(tag, encoding)] = data
+            while len(_variants) > COMPRESS_CACHE_ENTRIES:
+                _variants.popitem(last=False)
+    return data
+
+
+def init_app(app):
+    """
+    Compress responses on the way out. Register before http_cache.init_app:
+    after_request hooks run in reverse, so this one sees the final body.
+    """
+    from flask import request
+
+    @app.after_request
+    def _compress(response):
+        if response.mimetype not in COMPRESSIBLE_TYPES:
+            return response
+        response.vary.add("Accept-Encoding")
+        if (response.status_code < 200 or response.status_code in (204, 304)
+                or response.direct_passthrough or response.is_streamed
+                or "Content-Encoding" in response.headers):
+            return response
+        encoding = choose_encoding(request.headers.get("Accept-Encoding"))
+        if encoding is None:
+            return response
+        body = response.get_data()
+        if len(body) < COMPRESS_MIN_BYTES:
+            return response
+        tag, weak = response.get_etag()
+        response.set_data(compress(body, encoding, tag if tag and not weak else None))
+        response.headers["Content-Encoding"] = encoding
+        if tag:
+            response.set_etag(tag, weak=True)
+        return response
+
+
+def _after_fork_in_child():
+    global _lock
+    _lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
@@ -0,0 +1,678 @@
+import argparse
+import base64
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+# 🧪 Local stand-in for Supabase (PostgREST + Storage)
+#
+#   python fake_supabase.py --port 54321 --latency-ms 25 --seed seed.json
+#   SUPABASE_URL=http://127.0.0.1:54321 SUPABASE_KEY=fake python app.py
+#
+# or in-process (benchmarks, load tests):
+#
+#   fake = fake_supabase.FakeSupabase(latency_ms=25, seed=data).start()
+#   os.environ["SUPABASE_URL"] = fake.url     # before importing app / services
+#
+# It speaks the HTTP protocol the supabase client uses, so every module talks
+# to it through the normal client with no code changes. Covered: select with
+# column lists and embedded parents ("users(username)"), eq / neq / gt / gte /
+# lt / lte / like / ilike / in / is / not.* / or filters, order, limit / range,
+# single(), count="exact", insert / upsert / update / delete, the RPCs in
+# sql/, and Storage upload / update / list / download / remove / public URLs.
+#
+# It also answers Gemini generateContent and Google TTS synthesize with canned
+# replies after gemini_latency_ms / tts_latency_ms (±50%), for load tests that
+# need the slow blocking calls without the real APIs:
+#
+#   GEMINI_API_ENDPOINT=http://127.0.0.1:54321
+#   GOOGLE_TTS_URL=http://127.0.0.1:54321/v1/text:synthesize
+#
+# Those count in google_requests, not requests.
+#
+# Every Supabase request sleeps for latency_ms (+ up to jitter_ms) before it is served,
+# outside the lock, so concurrent requests overlap like real round trips. Each
+# statement runs under one lock, so a statement is atomic but two statements
+# are not: a read-then-write race in the app behaves like it would on Postgres.
+#
+# Like PostgREST's db-max-rows, a read never returns more than max_rows rows
+# (default 1000, None for no cap), whatever limit or range it asked for; the
+# count still covers every match. Code that reads a whole table without paging
+# comes up short here just as it would against Supabase.
+#
+# Rows are plain dicts and there is no schema: missing columns read as null
+# and nothing but primary keys is checked.
+
+DEFAULT_PORT = 54321
+DEFAULT_MAX_ROWS = 1000
+GEMINI_PATH = "/v1beta/models/"
+TTS_PATH = "/v1/text:synthesize"
+
+# Tables whose generated ids are UUIDs (the rest count up from 1)
+UUID_TABLES = {"users"}
+# Primary keys other than "id"
+PRIMARY_KEYS = {"coin_batches": ("batch_id",), "idempotency_keys": ("user_id", "path", "key")}
+# Columns filled in when an insert leaves them out
+DEFAULT_COLUMNS = {"created_at": lambda: datetime.now(timezone.utc).isoformat()}
+
+
+class PostgrestError(Exception):
+    def __init__(self, status, message, code="PGRST000", details=None):
+        super().__init__(message)
+        self.status = status
+        self.body = {"code": code, "message": message, "details": details, "hint": None}
+
+
+# === Database ===
+
+class Database:
+    """Tables as lists of dict rows, plus Storage buckets."""
+
+    def __init__(self, tables=None, storage=None):
+        self.lock = threading.RLock()
+        self.tables = {}
+        self.buckets = {}
+        self._next_id = {}
+        self.rpcs = {"apply_coin_batch": _apply_coin_batch, "consume_user_item": _consume_user_item,
+                     "spend_coins": _spend_coins, "question_counts_by_level": _question_counts_by_level,
+                     "claim_idempotency_key": _claim_idempotency_key, "owned_ids": _owned_ids}
+        self.seed(tables or {}, storage or {})
+
+    def seed(self, tables, storage=None):
+        with self.lock:
+            for name, rows in tables.items():
+                for row in rows:
+                    self.insert_row(name, dict(row))
+            for bucket, files in (storage or {}).items():
+                for path, content in files.items():
+                    if isinstance(content, str):
+                        content = content.encode("utf-8")
+                    self.put_file(bucket, path, content, "text/plain")
+
+    def table(self, name):
+        return self.tables.setdefault(name, [])
+
+    def _key(self, name):
+        return PRIMARY_KEYS.get(name, ("id",))
+
+    def insert_row(self, name, row, upsert=False, on_conflict=None):
+        rows = self.table(name)
+        key = tuple(on_conflict.split(",")) if on_conflict else self._key(name)
+        if key == ("id",) and row.get("id") is None:
+            if name in UUID_TABLES:
+                row["id"] = str(uuid.uuid4())
+            else:
+                row["id"] = self._next_id.get(name, 1)
+        if isinstance(row.get("id"), int):
+            self._next_id[name] = max(self._next_id.get(name, 1), row["id"] + 1)
+        for column, default in DEFAULT_COLUMNS.items():
+            row.setdefault(column, default())
+
+        if all(row.get(k) is not None for k in key):
+            for existing in rows:
+                if all(_same(existing.get(k), row[k]) for k in key):
+                    if upsert == "merge":
+                        existing.update(row)
+                        return existing
+                    if upsert == "ignore":
+                        return None
+                    raise PostgrestError(
+                        409, f'duplicate key value violates unique constraint "{name}_pkey"', "23505"
+                    )
+        rows.append(row)
+        return row
+
+    # --- Storage ---
+
+    def put_file(self, bucket, path, content, content_type, upsert=True):
+        files = self.buckets.setdefault(bucket, {})
+        if path in files and not upsert:
+            return False
+        now = datetime.now(timezone.utc).isoformat()
+        created = files[path]["created_at"] if path in files else now
+        files[path] = {
+            "content": content, "content_type": content_type,
+            "id": str(uuid.uuid4()), "created_at": created, "updated_at": now
+        }
+        return True
+
+
+def _same(a, b):
+    return a == b or (a is not None and b is not None and str(a) == str(b))
+
+
+# === RPCs (mirror sql/*.sql) ===
+
+def _apply_coin_batch(db, p_batch_id, p_user_id, p_coins):
+    user = next((u for u in db.table("users") if _same(u.get("id"), p_user_id)), None)
+    if any(_same(b.get("batch_id"), p_batch_id) for b in db.table("coin_batches")):
+        return user.get("coins") if user else None
+    db.insert_row("coin_batches", {"batch_id": p_batch_id, "user_id": p_user_id, "coins": p_coins})
+    if user is None:
+        return None
+    user["coins"] = (user.get("coins") or 0) + p_coins
+    return user["coins"]
+
+
+def _spend_coins(db, p_user_id, p_amount):
+    user = next((u for u in db.table("users") if _same(u.get("id"), p_user_id)), None)
+    if user is None or (user.get("coins") or 0) < p_amount:
+        return None
+    user["coins"] = (user.get("coins") or 0) - p_amount
+    return user["coins"]
+
+
+def _question_counts_by_level(db, p_max_level):
+    counts = Counter(q["level"] for q in db.table("questionanswer") if q.get("level") is not None and q["level"] <= p_max_level)
+    return [{"level": level, "questions": n} for level, n in sorted(counts.items())]
+
+
+def _claim_idempotency_key(db, p_user_id, p_path, p_key, p_fingerprint, p_ttl_seconds, p_stale_seconds):
+    rows = db.table("idempotency_keys")
+    existing = next((r for r in rows if _same(r.get("user_id"), p_user_id)
+                     and r.get("path") == p_path and r.get("key") == p_key), None)
+    if existing is not None:
+        age = (datetime.now(timezone.utc) - datetime.fromisoformat(existing["created_at"])).total_seconds()
+        if age < (p_ttl_seconds if existing.get("status") is not None else p_stale_seconds):
+            return {column: existing.get(column) for column in
+                    ("user_id", "path", "key", "fingerprint", "status", "mimetype", "body", "created_at")}
+        rows.remove(existing)
+    db.insert_row("idempotency_keys", {"user_id": p_user_id, "path": p_path, "key": p_key, "fingerprint": p_fingerprint})
+    return None
+
+
+def _owned_ids(db, p_user_id):
+    return {
+        kind: sorted(row[column] for row in db.table(table) if _same(row.get("user_id"), p_user_id))
+        for kind, table, column in (("avatars", "user_avatars", "avatar_id"), ("items", "user_items", "item_id"))
+    }
+
+
+def _consume_user_item(db, p_user_id, p_item_id):
+    rows = db.table("user_items")
+    for row in rows:
+        if _same(row.get("user_id"), p_user_id) and _same(row.get("item_id"), p_item_id) \
+                and (row.get("quantity") or 0) >= 1:
+            row["quantity"] -= 1
+            if row["quantity"] == 0:
+                rows.remove(row)
+            return row["quantity"]
+    return None
+
+
+# === PostgREST query language ===
+
+def _coerce(value, like):
+    """Turn a query-string value into the type of the column it's compared to."""
+    if value == "null":
+        return None
+    if isinstance(like, bool):
+        return value.lower() == "true"
+    if isinstance(like, int):
+        try:
+            return int(value)
+        except ValueError:
+            return float(value)
+    if isinstance(like, float):
+        return float(value)
+    return value
+
+
+def _like(pattern, case_insensitive):
+    regex = "".join(
+        ".*" if ch in "%*" else "." if ch == "_" else re.escape(ch) for ch in pattern
+    )
+    return re.compile(f"^{regex}$", re.IGNORECASE | re.DOTALL if case_insensitive else re.DOTALL)
+
+
+def _split_top_level(text, sep=","):
+    """Split on `sep` outside parentheses and double quotes."""
+    parts, depth, quoted, current = [], 0, False, ""
+    for ch in text:
+        if ch == '"':
+            quoted = not quoted
+        elif not quoted and ch == "(":
+            depth += 1
+        elif not quoted and ch == ")":
+            depth -= 1
+        if ch == sep and depth == 0 and not quoted:
+            parts.append(current)
+            current = ""
+        else:
+            current += ch
+    if current:
+        parts.append(current)
+    return parts
+
+
+def _matches(row, column, expression):
+    """Does row[column] satisfy a PostgREST filter such as "eq.5" or "not.in.(1,2)"?"""
+    negate = expression.startswith("not.")
+    if negate:
+        expression = expression[4:]
+    op, _, raw = expression.partition(".")
+    value = row.get(column)
+
+    if op == "is":
+        result = value is None if raw == "null" else value is (raw == "true")
+    elif op == "in":
+        options = [v.strip().strip('"') for v in _split_top_level(raw.strip("()"))]
+        result = any(_same(value, _coerce(o, value)) for o in options)
+    elif value is None:
+        result = False
+    elif op in ("like", "ilike"):
+        result = bool(_like(raw, op == "ilike").match(str(value)))
+    else:
+        other = _coerce(raw, value)
+        result = {
+            "eq": lambda: _same(value, other),
+            "neq": lambda: not _same(value, other),
+            "gt": lambda: value > other,
+            "gte": lambda: value >= other,
+            "lt": lambda: value < other,
+            "lte": lambda: value <= other,
+        }[op]()
+    return not result if negate else result
+
+
+def _or_matches(row, expression):
+    for condition in _split_top_level(expression.strip("()")):
+        column, _, rest = condition.partition(".")
+        if _matches(row, column, rest):
+            return True
+    return False
+
+
+def _filter(rows, filters):
+    for key, expression in filters:
+        if key == "or":
+            rows = [r for r in rows if _or_matches(r, expression)]
+        else:
+            rows = [r for r in rows if _matches(r, key, expression)]
+    return rows
+
+
+def _order(rows, spec):
+    for part in reversed(spec.split(",")):
+        column, *flags = part.split(".")
+        desc = "desc" in flags
+        nulls_first = "nullsfirst" in flags or ("nullslast" not in flags and desc)
+        present = [r for r in rows if r.get(column) is not None]
+        missing = [r for r in rows if r.get(column) is None]
+        present.sort(key=lambda r: r[column], reverse=desc)
+        rows = missing + present if nulls_first else present + missing
+    return rows
+
+
+def _singular(name):
+    return name[:-1] if name.endswith("s") else name
+
+
+def _project(db, table, row, select):
+    """Apply a select list ("id, users(username), alias:col") to one row."""
+    out = {}
+    for item in _split_top_level(select.replace(" ", "")):
+        alias, _, item = item.rpartition(":") if ":" in item.split("(")[0] else ("", "", item)
+        if "(" in item:
+            name, inner = item.split("(", 1)
+            name = name.split("!")[0]
+            inner = inner[:-1]
+            out[alias or name] = _embed(db, table, row, name, inner)
+        elif item == "*":
+            out.update(row)
+        else:
+            out[alias or item] = row.get(item)
+    return out
+
+
+def _embed(db, table, row, name, select):
+    # Many-to-one: user_progress.user_id -> users.id
+    fk = f"{_singular(name)}_id"
+    if fk in row:
+        parent = next((r for r in db.table(name) if _same(r.get("id"), row[fk])), None)
+        return _project(db, name, parent, select) if parent else None
+    # One-to-many: users.id <- user_items.user_id
+    back = f"{_singular(table)}_id"
+    return [_project(db, name, r, select) for r in db.table(name) if _same(r.get(back), row.get("id"))]
+
+
+# === HTTP ===
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "FakeSupabase/1.0"
+    # Headers and body go out in separate writes; without this, delayed ACKs
+    # add ~40ms to every keep-alive request
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    # --- plumbing ---
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _send(self, status, body=b"", content_type="application/json", headers=None):
+        if not isinstance(body, bytes):
+            body = json.dumps(body, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _dispatch(self):
+        fake = self.server.fake
+        url = urlsplit(self.path)
+        path = unquote(url.path)
+        params = parse_qsl(url.query, keep_blank_values=True)
+        if path.startswith(GEMINI_PATH) or path == TTS_PATH:
+            return self._google(path)
+
+        fake.requests += 1
+        delay = fake.latency_ms + random.uniform(0, fake.jitter_ms)
+        if delay:
+            time.sleep(delay / 1000)
+        try:
+            if path.startswith("/rest/v1/rpc/"):
+                return self._rpc(path[len("/rest/v1/rpc/"):])
+            if path.startswith("/rest/v1/"):
+                return self._rest(path[len("/rest/v1/"):], params)
+            if path.startswith("/storage/v1/"):
+                return self._storage(path[len("/storage/v1/"):])
+            self._send(404, {"message": f"No route for {path}"})
+        except PostgrestError as e:
+            self._send(e.status, e.body)
+
+    do_GET = do_HEAD = do_POST = do_PATCH = do_PUT = do_DELETE = _dispatch
+
+    # --- Gemini / Google TTS ---
+
+    def _google(self, path):
+        fake = self.server.fake
+        fake.google_requests += 1
+        self._body()
+        gemini = path.startswith(GEMINI_PATH)
+        delay = fake.gemini_latency_ms if gemini else fake.tts_latency_ms
+        if delay:
+            time.sleep(random.uniform(0.5, 1.5) * delay / 1000)
+        if gemini:
+            self._send(200, {"candidates": [{
+                "content": {"role": "model", "parts": [{"text": "Good try! Check the word order."}]},
+                "finishReason": "STOP", "index": 0
+            }]})
+        else:
+            self._send(200, {"audioContent": base64.b64encode(b"ID3" + bytes(1024)).decode()})
+
+    # --- PostgREST ---
+
+    def _prefer(self):
+        prefer = {}
+        for part in (self.headers.get("Prefer") or "").split(","):
+            key, _, value = part.strip().partition("=")
+            if key:
+                prefer[key] = value
+        return prefer
+
+    def _rest(self, table, params):
+        db = self.server.fake.db
+        prefer = self._prefer()
+        select = "*"
+        order = limit = offset = on_conflict = None
+        filters = []
+        for key, value in params:
+            if key == "select":
+                select = value
+            elif key == "order":
+                order = value
+            elif key == "limit":
+                limit = int(value)
+            elif key == "offset":
+                offset = int(value)
+            elif key == "on_conflict":
+                on_conflict = value
+            elif key != "columns":
+                filters.append((key, value))
+
+        body = self._body()
+        payload = json.loads(body) if body else None
+        method = self.command
+        with db.lock:
+            rows = db.table(table)
+            if method in ("GET", "HEAD"):
+                result = _filter(rows, filters)
+            elif method == "POST":
+                resolution = prefer.get("resolution", "")
+                upsert = "merge" if resolution == "merge-duplicates" else \
+                    "ignore" if resolution == "ignore-duplicates" else False
+                new_rows = payload if isinstance(payload, list) else [payload]
+                result = [
+                    r for r in (db.insert_row(table, dict(row), upsert, on_conflict) for row in new_rows)
+                    if r is not None
+                ]
+            elif method == "PATCH":
+                result = _filter(rows, filters)
+                for row in result:
+                    row.update(payload or {})
+            elif method == "DELETE":
+                result = _filter(rows, filters)
+                doomed = {id(r) for r in result}
+                rows[:] = [r for r in rows if id(r) not in doomed]
+            else:
+                raise PostgrestError(405, f"Method {method} not allowed")
+
+            total = len(result)
+            if order:
+                result = _order(result, order)
+            if offset:
+                result = result[offset:]
+            max_rows = self.server.fake.max_rows
+            if max_rows is not None and method in ("GET", "HEAD"):
+                limit = max_rows if limit is None else min(limit, max_rows)
+            if limit is not None:
+                result = result[:limit]
+            data = [_project(db, table, row, select) for row in result]
+
+        headers = {}
+        if "count" in prefer:
+            if (offset or 0) > total:
+                raise PostgrestError(
+                    416, "Requested range not satisfiable", "PGRST103",
+                    f"An offset of {offset} was requested, but there are only {total} rows."
+                )
+            start = offset or 0
+            end = start + len(data) - 1 if data else start
+            headers["Content-Range"] = f"{start}-{end}/{total}" if data else f"*/{total}"
+        status = 201 if method == "POST" else 200
+
+        if prefer.get("return") == "minimal" and method != "GET":
+            return self._send(204 if method != "POST" else 201, b"", headers=headers)
+        if "vnd.pgrst.object" in (self.headers.get("Accept") or ""):
+            if len(data) != 1:
+                raise PostgrestError(
+                    406, "JSON object requested, multiple (or no) rows returned", "PGRST116",
+                    f"The result contains {len(data)} rows"
+                )
+            return self._send(status, data[0], "application/vnd.pgrst.object+json", headers)
+        self._send(status, data, headers=headers)
+
+    def _rpc(self, name):
+        db = self.server.fake.db
+        body = self._body()
+        args = json.loads(body) if body else {}
+        fn = db.rpcs.get(name)
+        if fn is None:
+            raise PostgrestError(404, f"Could not find the function public.{name}", "PGRST202")
+        with db.lock:
+            result = fn(db, **args)
+        self._send(200, result)
+
+    # --- Storage ---
+
+    def _storage_error(self, status, error, message):
+        self._send(status, {"statusCode": str(status), "error": error, "message": message})
+
+    def _storage(self, path):
+        db = self.server.fake.db
+        method = self.command
+
+        if method == "POST" and path.startswith("object/list/"):
+            bucket = path[len("object/list/"):]
+            options = json.loads(self._body() or b"{}")
+            return self._send(200, _list_files(db, bucket, options))
+
+        if method == "DELETE" and path.startswith("object/"):
+            bucket = path[len("object/"):]
+            prefixes = json.loads(self._body() or b"{}").get("prefixes", [])
+            removed = []
+            with db.lock:
+                files = db.buckets.get(bucket, {})
+                for name in prefixes:
+                    if files.pop(name, None) is not None:
+                        removed.append({"name": name, "bucket_id": bucket})
+            return self._send(200, removed)
+
+        public = path.startswith("object/public/")
+        key = path[len("object/public/"):] if public else path[len("object/"):]
+        bucket, _, name = key.partition("/")
+
+        if method in ("GET", "HEAD"):
+            with db.lock:
+                entry = db.buckets.get(bucket, {}).get(name)
+            if entry is None:
+                return self._storage_error(404, "not_found", "Object not found")
+            return self._send(200, entry["content"], entry["content_type"])
+
+        if method in ("POST", "PUT"):
+            content, content_type = self._uploaded_file()
+            upsert = method == "PUT" or (self.headers.get("x-upsert") or "").lower() == "true"
+            with db.lock:
+                if method == "PUT" and name not in db.buckets.get(bucket, {}):
+                    return self._storage_error(404, "not_found", "Object not found")
+                stored = db.put_file(bucket, name, content, content_type, upsert)
+            if not stored:
+                return self._storage_error(409, "Duplicate", "The resource already exists")
+            return self._send(200, {"Key": f"{bucket}/{name}", "Id": str(uuid.uuid4())})
+
+        self._storage_error(405, "invalid_request", f"{method} not supported")
+
+    def _uploaded_file(self):
+        body = self._body()
+        content_type = self.headers.get("Content-Type") or "application/octet-stream"
+        if not content_type.startswith("multipart/form-data"):
+            return body, content_type
+        message = BytesParser(policy=HTTP).parsebytes(
+            f"Content-Type: {content_type}\r\n\r\n".encode("latin-1") + body
+        )
+        for part in message.iter_parts():
+            if part.get_param("name", header="content-disposition") == "file":
+                return part.get_payload(decode=True), part.get_content_type()
+        return b"", "application/octet-stream"
+
+
+def _list_files(db, bucket, options):
+    prefix = (options.get("prefix") or "").strip("/")
+    search = options.get("search") or ""
+    with db.lock:
+        files = dict(db.buckets.get(bucket, {}))
+    entries, folders = [], set()
+    for path, entry in sorted(files.items()):
+        if prefix and not path.startswith(prefix + "/"):
+            continue
+        rest = path[len(prefix) + 1:] if prefix else path
+        if "/" in rest:
+            folders.add(rest.split("/", 1)[0])
+            continue
+        if search and search not in rest:
+            continue
+        entries.append({
+            "name": rest, "id": entry["id"],
+            "created_at": entry["created_at"], "updated_at": entry["updated_at"],
+            "metadata": {"size": len(entry["content"]), "mimetype": entry["content_type"]}
+        })
+    result = [{"name": f, "id": None, "metadata": None} for f in sorted(folders)] + entries
+    offset = int(options.get("offset") or 0)
+    limit = int(options.get("limit") or 100)
+    return result[offset:offset + limit]
+
+
+class FakeSupabase:
+    """The fake server. start() runs it on a background thread."""
+
+    def __init__(self, latency_ms=0, jitter_ms=0, seed=None, host="127.0.0.1", port=0,
+                 gemini_latency_ms=0, tts_latency_ms=0, max_rows=DEFAULT_MAX_ROWS):
+        seed = seed or {}
+        self.db = Database(seed.get("tables"), seed.get("storage"))
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.gemini_latency_ms = gemini_latency_ms
+        self.tts_latency_ms = tts_latency_ms
+        self.max_rows = max_rows
+        self.requests = 0
+        self.google_requests = 0
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.fake = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-supabase", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Supabase stand-in (PostgREST + Storage)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=int(os.getenv("FAKE_SUPABASE_PORT", DEFAULT_PORT)))
+    parser.add_argument("--latency-ms", type=float, default=float(os.getenv("FAKE_SUPABASE_LATENCY_MS", "0")))
+    parser.add_argument("--jitter-ms", type=float, default=float(os.getenv("FAKE_SUPABASE_JITTER_MS", "0")))
+    parser.add_argument("--gemini-latency-ms", type=float, default=0)
+    parser.add_argument("--tts-latency-ms", type=float, default=0)
+    parser.add_argument("--max-rows", type=int, default=int(os.getenv("FAKE_SUPABASE_MAX_ROWS", DEFAULT_MAX_ROWS)),
+                        help="cap on rows per read, like PostgREST db-max-rows (0 for no cap)")
+    parser.add_argument("--seed", help='JSON file: {"tables": {name: [rows]}, "storage": {bucket: {path: text}}}')
+    args = parser.parse_args()
+
+    seed = None
+    if args.seed:
+        with open(args.seed) as f:
+            seed = json.load(f)
+    fake = FakeSupabase(args.latency_ms, args.jitter_ms, seed, args.host, args.port,
+                        args.gemini_latency_ms, args.tts_latency_ms, args.max_rows or None)
+    print(f"🧪 Fake Supabase on {fake.url} ({args.latency_ms:g}ms + up to {args.jitter_ms:g}ms per request)")
+    try:
+        fake.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+import contextvars
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# 🔀 Parallel fan-out for independent Supabase queries
+#
+# Routes that need several unrelated reads (user row, progress, question rows,
+# ...) used to run them one after another, paying one round trip each. run()
+# sends them through a shared thread pool and waits for all of them, so the
+# route pays roughly the slowest single query. Each run() has a deadline, so
+# one hung query can't hold the request forever.
+#
+# The callables run in pool threads, so they must not touch `session`, `g` or
+# `request`: read what you need from those first and close over the values.
+# They run in a copy of the caller's context, so log lines keep the request ID.
+
+FANOUT_WORKERS = int(os.getenv("FANOUT_WORKERS", "16"))
+FANOUT_TIMEOUT_SECONDS = float(os.getenv("FANOUT_TIMEOUT_SECONDS", "20"))
+
+_executor = ThreadPoolExecutor(max_workers=FANOUT_WORKERS, thread_name_prefix="fanout")
+
+
+def run(timeout=None, **calls):
+    """
+    Run each zero-argument callable in parallel and return {name: result}.
+
+    The first exception raised by any call is re-raised here, and a call still
+    running after `timeout` seconds (FANOUT_TIMEOUT_SECONDS by default) raises
+    TimeoutError. Don't call run() from inside a fanned-out callable, nested
+    fan-outs can starve the pool.
+    """
+    deadline = time.monotonic() + (FANOUT_TIMEOUT_SECONDS if timeout is None else timeout)
+    futures = {
+        name: _executor.submit(contextvars.copy_context().run, fn)
+        for name, fn in calls.items()
+    }
+    try:
+        return {
+            name: future.result(timeout=max(deadline - time.monotonic(), 0))
+            for name, future in futures.items()
+        }
+    finally:
+        for future in futures.values():
+            future.cancel()
@@ -0,0 +1,44 @@
+import multiprocessing
+import os
+
+# 🦄 Gunicorn settings for production
+#
+#   gunicorn -c gunicorn.conf.py
+#
+# Every value can be overridden through the environment. Operations:
+#
+#   kill -HUP  <master>   graceful restart of all workers (new workers finish
+#                         booting before old ones stop; with preload they keep
+#                         the master's code, so use USR2 to deploy new code)
+#   kill -USR2 <master>   start a new master + workers on the new code next to
+#                         the old one, then `kill -QUIT <old master>` once it's
+#                         up: a zero-downtime deploy
+#   kill -TTIN / -TTOU    add / remove one worker
+
+wsgi_app = "wsgi:app"
+bind = os.getenv("BIND", f"0.0.0.0:{os.getenv('PORT', '8000')}")
+
+# One process per core (plus one) and a few threads each, since most request
+# time is spent waiting on Supabase / Google
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() + 1))
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+
+# Import the app and warm the content caches once in the master, then fork
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+
+# Recycle each worker after this many requests (jittered so they don't all
+# restart together), which bounds slow memory growth
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "5000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "500"))
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+
+# Workers share their request / upstream metrics through this directory, so
+# /metrics on any worker reports all of them (see metrics.py)
+os.environ.setdefault("METRICS_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "instance", "metrics"))
+
+accesslog = os.getenv("GUNICORN_ACCESS_LOG", "-") or None
+errorlog = "-"
@@ -0,0 +1,69 @@
+import hashlib
+
+from werkzeug.http import parse_etags
+
+# 🏷️ ETags and Cache-Control for read-mostly JSON endpoints
+#
+#   @http_cache.cache_control(http_cache.CONTENT)      same for everyone, no login
+#   @http_cache.cache_control(http_cache.USER_STATE)   the player's own state
+#
+# A 200 from a marked GET route gets a strong ETag (a hash of the body) and the
+# route's Cache-Control. When the request's If-None-Match matches, the body is
+# dropped and the browser gets an empty 304 instead.
+#
+#   CONTENT           public, max-age=300    reused for 5 minutes without asking,
+#                                            proxies and CDNs included
+#   MEMBER_CONTENT    private, max-age=300   the same, but only in the browser:
+#                                            for content behind login_required
+#   USER_STATE        private, no-cache      browser only, revalidated on every
+#                                            use (a 304 when nothing changed)
+#   IMMUTABLE         public, max-age=1y,    never asked about again: for files
+#                     immutable              whose name changes with their
+#                                            content (static_assets.py)
+#
+# Never mark a route that needs a login as public: `'user_id' in session`
+# doesn't make Flask add "Vary: Cookie", so a shared cache could hand the
+# response to anyone.
+#
+# The view still runs to produce the body the ETag is computed from, so pair
+# content routes with server-side memoization (catalog_cache.get_content) to
+# make a revalidation cost no database calls either.
+
+CONTENT = "public, max-age=300"
+MEMBER_CONTENT = "private, max-age=300"
+USER_STATE = "private, no-cache"
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+def cache_control(policy):
+    """Send the decorated GET view with ETags and this Cache-Control policy."""
+    def decorator(f):
+        f._cache_control = policy
+        return f
+    return decorator
+
+
+def etag(body):
+    """Strong ETag (unquoted) for a response body."""
+    return hashlib.sha256(body).hexdigest()[:32]
+
+
+def not_modified(if_none_match, tag):
+    """Whether an If-None-Match header value matches `tag`."""
+    return bool(if_none_match) and parse_etags(if_none_match).contains_weak(tag)
+
+
+def init_app(app):
+    """Add ETags, Cache-Control and 304s to routes marked with @cache_control."""
+    from flask import request
+
+    @app.after_request
+    def _cache_headers(response):
+        if request.method not in ("GET", "HEAD") or response.status_code != 200 or response.direct_passthrough:
+            return response
+        policy = getattr(app.view_functions.get(request.endpoint), "_cache_control", None)
+        if policy is None:
+            return response
+        response.set_etag(etag(response.get_data()))
+        response.headers["Cache-Control"] = policy
+        return response.make_conditional(request.environ)
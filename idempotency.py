@@ -0,0 +1,230 @@
+import atexit
+import hashlib
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from functools import wraps
+
+from flask import Response, jsonify, make_response, request, session
+
+from services import supabase
+
+# 🔁 Idempotency keys for reward / purchase POSTs
+#
+# The client sends an `Idempotency-Key` header (one key per logical action, e.g.
+# per finished quiz or per boss fight). The first request with a key runs the
+# route and its response is stored; a retry with the same key gets the stored
+# response back without running the route again.
+#
+# Keys are scoped per user and per path, so one key can be reused across the
+# reward endpoints of a single quiz. Two places hold them:
+#
+#   - a bounded per-worker LRU of answered keys: a retry that comes back to
+#     the same worker is replayed from memory, no database call at all
+#   - the idempotency_keys table (sql/idempotency_keys.sql), so a retry that
+#     lands on another gunicorn worker still sees them
+#
+# A key missing from the LRU costs one claim_idempotency_key RPC, which
+# claims the key or returns whoever has it in the same statement. That's the
+# only call on the request path: the answer goes into the LRU at once and a
+# background thread writes answers back to the table in batches (one upsert
+# every STORE_BATCH_SECONDS at most), so the four keyed calls at the end of a
+# quiz don't add four more writes. A retry on another worker in that window
+# waits for the answer like any other in-flight duplicate. If a worker dies
+# before its batch is written, its claims go stale and the keys can be reused
+# after STALE_CLAIM_SECONDS.
+#
+# A duplicate that finds the key claimed but not answered yet waits for the
+# answer instead of running in parallel. 5xx responses are not stored (the
+# claim is deleted), so a failed request can be retried for real. Responses
+# expire after IDEMPOTENCY_TTL_SECONDS; a claim still unanswered after
+# STALE_CLAIM_SECONDS belonged to a worker that died, and is taken over.
+
+HEADER = "Idempotency-Key"
+REPLAY_HEADER = "Idempotent-Replayed"
+TABLE = "idempotency_keys"
+IDEMPOTENCY_TTL_SECONDS = 600
+STALE_CLAIM_SECONDS = 120
+MAX_STORED_RESPONSES = 10000
+MAX_KEY_LENGTH = 128
+IN_FLIGHT_WAIT_SECONDS = 15
+IN_FLIGHT_POLL_SECONDS = 0.1
+STORE_BATCH_SECONDS = float(os.getenv("IDEMPOTENCY_STORE_BATCH_SECONDS", "0.2"))
+# Every this many claims a worker deletes the expired rows
+PRUNE_EVERY = 500
+
+log = logging.getLogger(__name__)
+
+_responses = OrderedDict()  # (user_id, path, key) -> (fingerprint, body, status, mimetype, stored_at)
+_unsent = {}                # (user_id, path, key) -> row waiting for the store thread
+_lock = threading.Lock()
+_wake = threading.Event()
+_store_thread = None
+_claims = itertools.count(1)
+
+
+def _fingerprint():
+    return hashlib.sha256(request.get_data()).hexdigest()
+
+
+def _lookup(cache_key):
+    """The answered entry for `cache_key` in this worker's LRU, or None."""
+    with _lock:
+        entry = _responses.get(cache_key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[4] >= IDEMPOTENCY_TTL_SECONDS:
+            del _responses[cache_key]
+            return None
+        _responses.move_to_end(cache_key)
+        return entry
+
+
+def _remember(cache_key, fingerprint, body, status, mimetype):
+    with _lock:
+        _responses[cache_key] = (fingerprint, body, status, mimetype, time.monotonic())
+        _responses.move_to_end(cache_key)
+        while len(_responses) > MAX_STORED_RESPONSES:
+            _responses.popitem(last=False)
+
+
+def _claim(cache_key, fingerprint):
+    """Claim `cache_key`: None when this request now owns it, else the row that holds it."""
+    user_id, path, key = cache_key
+    row = supabase.rpc("claim_idempotency_key", {
+        "p_user_id": user_id,
+        "p_path": path,
+        "p_key": key,
+        "p_fingerprint": fingerprint,
+        "p_ttl_seconds": IDEMPOTENCY_TTL_SECONDS,
+        "p_stale_seconds": STALE_CLAIM_SECONDS
+    }).execute().data
+    if row is None and next(_claims) % PRUNE_EVERY == 0:
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=IDEMPOTENCY_TTL_SECONDS)
+        supabase.table(TABLE).delete().lt("created_at", cutoff.isoformat()).execute()
+    return row
+
+
+def _release(cache_key):
+    """Delete the claim on `cache_key`, so the key can be used again."""
+    user_id, path, key = cache_key
+    supabase.table(TABLE).delete().eq("user_id", user_id).eq("path", path).eq("key", key).execute()
+
+
+def _store(cache_key, fingerprint, response):
+    """Answer the claim on `cache_key`: in this worker's LRU now, in the table with the next batch."""
+    global _store_thread
+    body = response.get_data(as_text=True)
+    _remember(cache_key, fingerprint, body, response.status_code, response.mimetype)
+    user_id, path, key = cache_key
+    with _lock:
+        _unsent[cache_key] = {
+            "user_id": user_id,
+            "path": path,
+            "key": key,
+            "fingerprint": fingerprint,
+            "status": response.status_code,
+            "mimetype": response.mimetype,
+            "body": body
+        }
+        if _store_thread is None:
+            _store_thread = threading.Thread(target=_run_store_thread, name="idempotency-store", daemon=True)
+            _store_thread.start()
+    _wake.set()
+
+
+def flush_stored():
+    """Write every unsent answer to the table in one upsert."""
+    with _lock:
+        rows = list(_unsent.values())
+        _unsent.clear()
+    if not rows:
+        return
+    try:
+        supabase.table(TABLE).upsert(rows, on_conflict="user_id,path,key").execute()
+    except Exception:
+        # Don't leave unanswered claims behind for STALE_CLAIM_SECONDS of 409s
+        log.warning("Storing %s idempotent responses failed, releasing their keys", len(rows), exc_info=True)
+        for row in rows:
+            try:
+                _release((row["user_id"], row["path"], row["key"]))
+            except Exception:
+                log.warning("Releasing %s %s failed", row["path"], row["key"], exc_info=True)
+
+
+def _run_store_thread():
+    while True:
+        _wake.wait()
+        time.sleep(STORE_BATCH_SECONDS)  # let the rest of the batch arrive
+        _wake.clear()
+        flush_stored()
+
+
+def _replay(fingerprint, stored_fingerprint, body, status, mimetype):
+    if stored_fingerprint != fingerprint:
+        return jsonify({"message": f"{HEADER} was already used with a different request body"}), 422
+    response = Response(body, status=status, mimetype=mimetype)
+    response.headers[REPLAY_HEADER] = "true"
+    return response
+
+
+def idempotent(f):
+    """Route decorator: replay the stored response for a repeated Idempotency-Key."""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return f(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return jsonify({"message": f"{HEADER} is too long"}), 400
+
+        cache_key = (session.get("user_id"), request.path, key)
+        fingerprint = _fingerprint()
+        deadline = time.monotonic() + IN_FLIGHT_WAIT_SECONDS
+
+        while True:
+            entry = _lookup(cache_key)
+            if entry is not None:
+                return _replay(fingerprint, *entry[:4])
+            row = _claim(cache_key, fingerprint)
+            if row is None:
+                break
+            if row.get("status") is not None:
+                _remember(cache_key, row["fingerprint"], row["body"], row["status"], row["mimetype"])
+                return _replay(fingerprint, row["fingerprint"], row["body"], row["status"], row["mimetype"])
+            # Same key is running right now, wait for its result
+            if time.monotonic() >= deadline:
+                return jsonify({"message": "A request with this key is still running"}), 409
+            time.sleep(IN_FLIGHT_POLL_SECONDS)
+
+        try:
+            response = make_response(f(*args, **kwargs))
+        except BaseException:
+            _release(cache_key)
+            raise
+        if response.status_code < 500 and not response.direct_passthrough:
+            _store(cache_key, fingerprint, response)
+        else:
+            _release(cache_key)
+        return response
+    return decorated_function
+
+
+atexit.register(flush_stored)
+
+
+def _after_fork_in_child():
+    # The store thread doesn't survive fork(); the child starts its own when needed
+    global _lock, _wake, _store_thread
+    _lock = threading.Lock()
+    _wake = threading.Event()
+    _store_thread = None
+    _unsent.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
@@ -0,0 +1,93 @@
+from functools import lru_cache
+
+import catalog_cache
+
+# 🎒 Inventory service: everything that reads or changes user_items
+
+SHOPITEMS_URL = "https://uktdymsgfgodbwesdvsj.supabase.co/storage/v1/object/public/shopitems/"
+
+# Effects for the original four potions, used when an item row has no
+# effect_type yet (i.e. before sql/consume_user_item.sql has been applied).
+LEGACY_EFFECTS = {
+    1: {"type": "hp", "value": 30},             # HP potion: heal 30% of max HP
+    2: {"type": "energy", "value": 50},         # MP potion: restore 50% energy
+    3: {"type": "damageBoost", "value": 30},    # Damage Boost
+    4: {"type": "timeSlow", "duration": 5},     # Time Slow: slow enemy for 5 seconds
+}
+NO_EFFECT = {"type": "none"}
+
+
+def _effect_from_item(item):
+    effect_type = item.get("effect_type")
+    if not effect_type:
+        return LEGACY_EFFECTS.get(item["id"], NO_EFFECT)
+
+    effect = {"type": effect_type}
+    if item.get("effect_value") is not None:
+        effect["value"] = item["effect_value"]
+    if item.get("effect_duration") is not None:
+        effect["duration"] = item["effect_duration"]
+    return effect
+
+
+def get_potion_effect(supabase, item_id):
+    """Look up a potion's effect from the cached items catalog."""
+    item = catalog_cache.get_items(supabase).get(item_id)
+    if not item:
+        return LEGACY_EFFECTS.get(item_id, NO_EFFECT)
+    return _effect_from_item(item)
+
+
+def consume_item(supabase, user_id, item_id):
+    """
+    Atomically take one of `item_id` from the user's inventory.
+
+    Runs the consume_user_item RPC, which decrements only when quantity >= 1 and
+    deletes the row once it hits zero. Returns the remaining quantity, or None
+    if the user didn't own the item.
+    """
+    remaining = supabase.rpc("consume_user_item", {
+        "p_user_id": user_id,
+        "p_item_id": item_id
+    }).execute().data
+
+    if remaining is None or (isinstance(remaining, list) and not remaining):
+        return None
+    return int(remaining)
+
+
+@lru_cache(maxsize=1024)
+def item_image_url(filename):
+    """Public Storage URL for a shop item image."""
+    return f"{SHOPITEMS_URL}{filename}"
+
+
+def get_inventory(supabase, user_id):
+    """
+    Return the user's items merged with their catalog details.
+
+    One query for the user's quantities, everything else comes from the cached
+    items catalog. Each entry is a copy of the item row plus `quantity` and
+    `image_url`, in the order the user_items rows came back.
+    """
+    user_items = supabase.table("user_items") \
+        .select("item_id, quantity") \
+        .eq("user_id", user_id) \
+        .execute().data
+
+    if not user_items:
+        return []
+
+    catalog = catalog_cache.get_items(supabase)
+
+    inventory = []
+    for ui in user_items:
+        item = catalog.get(ui["item_id"])
+        if not item:
+            # Item was deleted from the shop but is still in user_items
+            continue
+        entry = dict(item)
+        entry["quantity"] = ui.get("quantity", 1)
+        entry["image_url"] = item_image_url(item["filename"])
+        inventory.append(entry)
+    return inventory
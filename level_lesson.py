@@ -1,30 +1,51 @@
 from flask import Blueprint, request, jsonify
-from supabase import create_client
-import os
-from dotenv import load_dotenv
+import logging
 import requests
-import traceback
+import catalog_cache
+import http_cache
+import metrics
+from services import supabase
 
-load_dotenv()
+log = logging.getLogger(__name__)
 
 level_bp = Blueprint("level_bp", __name__)
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+LESSONS = ["tagalog", "cebuano", "waray"]
+
+
+def lesson_file_url(filename):
+    """Public Storage URL for a lesson file, or None (shared with asgi.py)."""
+    # Get public URL of the file from Supabase Storage (no request is made)
+    res = supabase.storage.from_('lessons').get_public_url(filename)
+    log.debug("Supabase get_public_url result: %r", res)
+
+    # Determine URL format
+    if isinstance(res, dict) and 'publicURL' in res:
+        return res['publicURL']
+    elif isinstance(res, str):
+        return res
+    return None
+
 
 @level_bp.route("/api/lesson-content", methods=["GET"])
+@http_cache.cache_control(http_cache.CONTENT)
 def get_lesson_content():
     lesson = request.args.get("lesson")   # 'tagalog', 'cebuano', or 'waray'
     level = request.args.get("level")     # e.g., '1'
 
-    if lesson not in ["tagalog", "cebuano", "waray"]:
+    if lesson not in LESSONS:
         return jsonify({"success": False, "error": "Invalid lesson type"}), 400
 
     table_name = f"{lesson}_lessons"
     column_name = lesson  # the column has the same name as the lesson
 
     try:
+        # Lesson text only changes through admin.py, memoized (see catalog_cache.py)
+        cache_key = f"lesson:{lesson}:{int(level)}"
+        content = catalog_cache.cached_content(cache_key)
+        if content is not None:
+            return jsonify({"success": True, "content": content})
+
         # Query the table for the file name matching the level
         response = supabase.table(table_name).select(column_name).eq("level", int(level)).single().execute()
         
@@ -33,27 +54,20 @@ def get_lesson_content():
         else:
             return jsonify({"success": False, "error": "Lesson not found in database"}), 404
 
-        # Get public URL of the file from Supabase Storage
-        res = supabase.storage.from_('lessons').get_public_url(filename)
-        print("🪵 Supabase get_public_url result:", res)
-
-        # Determine URL format
-        if isinstance(res, dict) and 'publicURL' in res:
-            file_url = res['publicURL']
-        elif isinstance(res, str):
-            file_url = res
-        else:
+        file_url = lesson_file_url(filename)
+        if not file_url:
             return jsonify({"success": False, "error": "Unexpected Supabase response"}), 500
 
-        print("📂 Fetching file from:", file_url)
+        log.debug("Fetching lesson file from %s", file_url)
 
-        file_response = requests.get(file_url)
+        with metrics.upstream("storage"):
+            file_response = requests.get(file_url)
         if file_response.status_code == 200:
+            catalog_cache.store_content(cache_key, file_response.text)
             return jsonify({"success": True, "content": file_response.text})
         else:
             return jsonify({"success": False, "error": f"Failed to fetch file content (status {file_response.status_code})"}), 404
 
     except Exception as e:
-        print("❌ Exception occurred:", str(e))
-        traceback.print_exc()
+        log.exception("get_lesson_content failed")
         return jsonify({"success": False, "error": str(e)}), 500
@@ -0,0 +1,122 @@
+from datetime import datetime, timezone, timedelta
+
+# ❤️ Lives + regeneration, computed lazily
+#
+# The users row only stores `lives` and a regen anchor (`life_regen_start`).
+# The current number of lives is derived from those on every read:
+#
+#     lives_now = min(MAX_LIVES, lives + elapsed_since_anchor // REGEN_SECONDS)
+#
+# so polling never writes. We only write when the state actually changes
+# (losing a life, buying lives).
+
+MAX_LIVES = 5
+REGEN_SECONDS = 120
+LIVES_COLUMNS = "lives, life_regen_start"
+
+
+def _parse_time(value):
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        dt = value
+    else:
+        dt = datetime.fromisoformat(value)
+    # Handle naive datetime from DB
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt
+
+
+def compute(user, now=None):
+    """
+    Work out the player's current lives from the stored row.
+
+    Returns a dict with `lives`, `next_life_in` (seconds, or None when full),
+    `next_life_at` (ISO timestamp, or None) and `regen_start` (the anchor moved
+    forward past the lives already regenerated, as a datetime or None).
+    """
+    now = now or datetime.now(timezone.utc)
+    lives = user.get("lives")
+    if lives is None:
+        lives = MAX_LIVES
+    anchor = _parse_time(user.get("life_regen_start"))
+
+    if lives >= MAX_LIVES or not anchor:
+        return {"lives": min(lives, MAX_LIVES), "next_life_in": None, "next_life_at": None, "regen_start": None}
+
+    elapsed_seconds = max((now - anchor).total_seconds(), 0)
+    lives_gained = int(elapsed_seconds // REGEN_SECONDS)
+    current = min(MAX_LIVES, lives + lives_gained)
+
+    if current >= MAX_LIVES:
+        return {"lives": MAX_LIVES, "next_life_in": None, "next_life_at": None, "regen_start": None}
+
+    regen_start = anchor + timedelta(seconds=lives_gained * REGEN_SECONDS)
+    next_life_at = regen_start + timedelta(seconds=REGEN_SECONDS)
+    return {
+        "lives": current,
+        "next_life_in": int(REGEN_SECONDS - (elapsed_seconds % REGEN_SECONDS)),
+        "next_life_at": next_life_at.isoformat(),
+        "regen_start": regen_start
+    }
+
+
+def public_state(state):
+    """The part of compute() that goes to the client."""
+    return {
+        "lives": state["lives"],
+        "next_life_in": state["next_life_in"],
+        "next_life_at": state["next_life_at"]
+    }
+
+
+def lose_life_updates(user, now=None):
+    """
+    Build the users update for losing one life.
+
+    Returns (state after the loss, updates dict), or (state, None) when the
+    player has no lives to lose.
+    """
+    now = now or datetime.now(timezone.utc)
+    state = compute(user, now)
+    if state["lives"] <= 0:
+        return state, None
+
+    new_lives = state["lives"] - 1
+    # Keep partial progress towards the next life; start the clock if we were full
+    regen_start = state["regen_start"] or now
+    updates = {
+        "lives": new_lives,
+        "life_regen_start": regen_start.isoformat(),
+        "next_life_time": (regen_start + timedelta(seconds=REGEN_SECONDS)).isoformat()
+    }
+    return compute(updates, now), updates
+
+
+def gain_lives_updates(user, amount, now=None):
+    """
+    Build the users update for buying `amount` lives.
+
+    The regen clock keeps running if the player is still below MAX_LIVES, and is
+    cleared once they're full. Returns (state after the purchase, updates dict).
+    """
+    now = now or datetime.now(timezone.utc)
+    state = compute(user, now)
+    new_lives = min(MAX_LIVES, state["lives"] + amount)
+
+    if new_lives >= MAX_LIVES:
+        updates = {"lives": new_lives, "life_regen_start": None, "next_life_time": None}
+    else:
+        regen_start = state["regen_start"] or now
+        updates = {
+            "lives": new_lives,
+            "life_regen_start": regen_start.isoformat(),
+            "next_life_time": (regen_start + timedelta(seconds=REGEN_SECONDS)).isoformat()
+        }
+    return compute(updates, now), updates
+
+
+def refill_updates():
+    """Build the users update for a full refill."""
+    return {"lives": MAX_LIVES, "life_regen_start": None, "next_life_time": None}
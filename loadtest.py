@@ -0,0 +1,496 @@
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import seed_data
+
+# 🏋️ Load test: concurrent quiz and boss-fight sessions
+#
+#   python loadtest.py --sessions 50 --duration 60
+#   python loadtest.py --sessions 50 --accounts 10 --think-ms 0     (shared accounts, no pauses)
+#
+# By default it starts fake_supabase.py (seeded from seed_data.py, with slow
+# Gemini / TTS stand-ins) and the app on a local threaded server. To load a
+# real deployment shape instead, run both yourself and point at them:
+#
+#   python seed_data.py > seed.json
+#   python fake_supabase.py --seed seed.json --latency-ms 20 --gemini-latency-ms 800 --tts-latency-ms 300
+#   SUPABASE_URL=http://127.0.0.1:54321 SUPABASE_KEY=fake \
+#     GEMINI_API_ENDPOINT=http://127.0.0.1:54321 \
+#     GOOGLE_TTS_URL=http://127.0.0.1:54321/v1/text:synthesize GOOGLE_TTS_API_KEY=fake \
+#     gunicorn -c gunicorn.conf.py wsgi:application
+#   python loadtest.py --target http://127.0.0.1:8000 --backend http://127.0.0.1:54321
+#
+# Each virtual user logs in as a seeded account and loops through sessions,
+# making the same calls in the same order as the browser:
+#
+#   quiz (templates/levelscreen.html, templates/levels/quiz.html)
+#     level screen: /levelscreen, /api/bootstrap, /api/regenerate-lives,
+#     /api/dashboard-stats, /api/lesson-content; then /level, /api/bootstrap
+#     with the question pack; per question /api/google-tts (audio questions),
+#     /api/lose-life (wrong answers) and /api/feedback; at the end
+#     /api/complete_level, /api/reward, /api/streak-reward, /api/gain-exp and
+#     /api/words-discovered, all fired at once like the page does
+#   boss (static/js/general.js)
+#     /combat/combat.html, /get_words, /api/google-tts per listening word, then
+#     /api/boss-reward + /api/boss-exp-reward at once, then /api/complete_level
+#
+# Every coin and progress change the app reports back is tallied per account.
+# At the end (after the coin write buffer is flushed) the tally is compared
+# with what the backend actually holds: coins, unlocked levels or mastery
+# attempts missing there are lost updates, e.g. two requests that
+# read-modify-wrote the same row. See lost_updates() for how coins are checked.
+
+USER_AGENT = "loadtest.py"
+FULL_HEALTH_PRICE = 80
+
+
+# === Results ===
+
+class Results:
+    """Per-route latencies and statuses, plus the expected state per account."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.sessions = Counter()
+        self.granted = Counter()              # user_id -> coins the app said it granted
+        self.spent = Counter()                # user_id -> coins spent on full health
+        self.unlocked = {}                    # (user_id, lesson) -> highest level the app said it unlocked
+        self.attempts = Counter()             # (user_id, lesson, level) -> completions the app accepted
+
+    def record(self, route, seconds, status):
+        with self.lock:
+            self.latencies[route].append(seconds)
+            self.statuses[route][status] += 1
+
+    def session(self, kind, outcome):
+        with self.lock:
+            self.sessions[f"{kind}:{outcome}"] += 1
+
+    def grant(self, user_id, coins):
+        if coins:
+            with self.lock:
+                self.granted[user_id] += coins
+
+    def spend(self, user_id, coins):
+        with self.lock:
+            self.spent[user_id] += coins
+
+    def completed(self, user_id, lesson, level, unlocked):
+        with self.lock:
+            self.attempts[(user_id, lesson, str(level))] += 1
+            if unlocked:
+                key = (user_id, lesson)
+                self.unlocked[key] = max(self.unlocked.get(key, 0), unlocked)
+
+
+def _percentile(sorted_values, p):
+    index = min(len(sorted_values) - 1, max(0, round(p / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+# === Virtual users ===
+
+class VirtualUser:
+    """One browser: a cookie session, one seeded account and its own RNG."""
+
+    def __init__(self, base_url, account, results, pool, args, rng):
+        self.base_url = base_url
+        self.account = account
+        self.results = results
+        self.pool = pool
+        self.args = args
+        self.rng = rng
+        self.http = requests.Session()
+        self.http.headers["User-Agent"] = USER_AGENT
+
+    def call(self, method, path, route=None, **kwargs):
+        """Make one request; returns the JSON body (or {}) and records it under `route`."""
+        start = time.perf_counter()
+        try:
+            response = self.http.request(method, self.base_url + path, timeout=self.args.timeout, **kwargs)
+            status = response.status_code
+        except requests.RequestException as e:
+            response, status = None, type(e).__name__
+        self.results.record(route or path, time.perf_counter() - start, status)
+        if response is None or status >= 400:
+            return None
+        try:
+            return response.json()
+        except ValueError:
+            return {}
+
+    def fire(self, *calls):
+        """Send several requests at once, like un-awaited fetch() calls in the page."""
+        futures = [self.pool.submit(self.call, *call[:-1], **call[-1]) for call in calls]
+        return [future.result() for future in futures]
+
+    def think(self, scale=1.0):
+        if self.args.think_ms:
+            time.sleep(self.rng.uniform(0.5, 1.5) * scale * self.args.think_ms / 1000)
+
+    def login(self):
+        self.call("POST", "/login", data={"email": self.account["email"], "password": seed_data.PASSWORD},
+                  allow_redirects=False)
+        return "session" in self.http.cookies
+
+    def run(self, deadline):
+        if not self.login():
+            self.results.session("login", "failed")
+            return
+        while time.monotonic() < deadline:
+            if self.rng.random() < self.args.boss_ratio:
+                outcome = self.boss_session()
+                self.results.session("boss", outcome)
+            else:
+                outcome = self.quiz_session()
+                self.results.session("quiz", outcome)
+            self.think(3)
+
+    # --- templates/levelscreen.html + templates/levels/quiz.html ---
+
+    def quiz_session(self):
+        user_id, lesson = self.account["id"], self.account["lesson"]
+        self.call("GET", "/levelscreen")
+        screen = self.call("GET", f"/api/bootstrap?lesson={lesson}", "/api/bootstrap")
+        self.call("GET", "/api/regenerate-lives")
+        self.call("GET", "/api/dashboard-stats")
+        if not screen:
+            return "error"
+        level = screen["highest_unlocked"]
+        self.think()
+        self.call("GET", f"/api/lesson-content?lesson={lesson}&level={level}", "/api/lesson-content")
+        self.think()
+
+        self.call("GET", f"/level?lesson={lesson}&level={level}", "/level")
+        quiz = self.call("GET", f"/api/bootstrap?level={level}&lesson={lesson}", "/api/bootstrap")
+        if quiz and quiz["lives"] <= 0:
+            # Game over screen: "Buy Full Health"
+            bought = self.call("POST", "/api/buy-full-health", headers={"Idempotency-Key": uuid.uuid4().hex})
+            if not bought or not bought.get("success"):
+                return "no_lives"
+            self.results.spend(user_id, FULL_HEALTH_PRICE)
+            quiz = self.call("GET", f"/api/bootstrap?level={level}&lesson={lesson}", "/api/bootstrap")
+        if not quiz or not quiz.get("questions"):
+            return "error"
+
+        questions = quiz["questions"]
+        correct = streak = max_streak = wrong = 0
+        for question in questions:
+            if question.get("audio"):
+                # The "🔊 Play" button
+                self.call("POST", "/api/google-tts", json={"text": question["audio"], "language": lesson})
+            self.think()
+            if self.rng.random() < self.args.accuracy:
+                correct += 1
+                streak += 1
+                max_streak = max(max_streak, streak)
+            else:
+                wrong += 1
+                streak = 0
+                lives = self.call("POST", "/api/lose-life")
+                if lives and lives["lives"] <= 0:
+                    return "game_over"
+            self.call("POST", "/api/feedback", json={"user_answer": "", "correct_answer": "",
+                                                     "question": question.get("question", "")})
+
+        key = {"Idempotency-Key": uuid.uuid4().hex}
+        calls = [
+            ("POST", "/api/complete_level", {"json": {
+                "level": level, "lesson": lesson, "perfect_score": correct == len(questions),
+                "total_questions": len(questions), "correct_answers": correct
+            }}),
+            ("POST", "/api/reward", {"json": {"level": level, "lesson": lesson}, "headers": key}),
+            ("POST", "/api/gain-exp", {"json": {"level": level, "wrong_count": wrong}, "headers": key}),
+            ("POST", "/api/words-discovered", {"json": {"level": level, "words": []}}),
+        ]
+        if max_streak > 0:
+            calls.insert(2, ("POST", "/api/streak-reward", {"json": {"streak": max_streak}, "headers": key}))
+        replies = dict(zip((call[1] for call in calls), self.fire(*calls)))
+
+        progress = replies["/api/complete_level"]
+        if progress is not None:
+            self.results.completed(user_id, lesson, level, progress.get("next_level_unlocked"))
+        self.results.grant(user_id, (replies["/api/reward"] or {}).get("reward", 0))
+        self.results.grant(user_id, (replies.get("/api/streak-reward") or {}).get("streak_bonus", 0))
+        return "completed" if all(reply is not None for reply in replies.values()) else "error"
+
+    # --- static/js/general.js ---
+
+    def boss_session(self):
+        user_id, lesson = self.account["id"], self.account["lesson"]
+        boss = self.rng.randint(1, max(1, self.account["level"] // seed_data.LEVELS_PER_BOSS))
+        self.call("GET", f"/combat/combat.html?boss={boss}", "/combat/combat.html")
+        words = self.call("GET", f"/get_words?level={boss}", "/get_words")
+        if words is None:
+            return "error"
+        for word in next(iter(words.values()), []):
+            if word.get("type") != "speak":
+                self.call("POST", "/api/google-tts", json={"text": word.get("word") or "kamusta",
+                                                           "language": "id-ID"})
+            self.think()
+
+        key = {"Idempotency-Key": uuid.uuid4().hex}
+        body = {"boss": boss, "lesson": lesson}
+        coins, exp = self.fire(
+            ("POST", "/api/boss-reward", {"json": body, "headers": key}),
+            ("POST", "/api/boss-exp-reward", {"json": body, "headers": key}),
+        )
+        completed_level = boss * 100
+        progress = self.call("POST", "/api/complete_level", json={"lesson": lesson, "level": completed_level})
+        if progress is not None:
+            self.results.completed(user_id, lesson, completed_level, progress.get("next_level_unlocked"))
+        self.results.grant(user_id, (coins or {}).get("reward", 0))
+        return "completed" if None not in (coins, exp, progress) else "error"
+
+
+# === Backend state ===
+
+def _rest(backend, key, table, select):
+    response = requests.get(f"{backend}/rest/v1/{table}", params={"select": select},
+                            headers={"apikey": key, "Authorization": f"Bearer {key}"}, timeout=60)
+    response.raise_for_status()
+    return response.json()
+
+
+def snapshot(backend, key):
+    """Coins, unlocked levels and mastery attempts as the backend holds them."""
+    users = _rest(backend, key, "users", "id,email,coins,lesson_language")
+    progress = _rest(backend, key, "user_progress", "user_id,lesson,highest_unlocked,level_mastery")
+    applied = Counter()
+    for row in _rest(backend, key, "coin_batches", "user_id,coins"):
+        applied[row["user_id"]] += row["coins"]
+    attempts = Counter()
+    for row in progress:
+        mastery = row.get("level_mastery") or {}
+        if isinstance(mastery, str):
+            mastery = json.loads(mastery or "{}")
+        for level, stats in mastery.items():
+            attempts[(row["user_id"], row["lesson"], level)] = stats.get("attempts", 0)
+    return {
+        "users": users,
+        "coins": {row["id"]: row.get("coins") or 0 for row in users},
+        "applied": applied,
+        "unlocked": {(row["user_id"], row["lesson"]): row["highest_unlocked"] for row in progress},
+        "attempts": attempts,
+    }
+
+
+def lost_updates(before, after, results):
+    """
+    Compare what the app reported with what the backend ended up with.
+
+    Coins are checked twice. Every buffered grant lands as a coin_batches row
+    (sql/apply_coin_batch.sql), so the balance should move by exactly the
+    batches applied minus what was spent; anything else means a write clobbered
+    the row. And the grants the responses announced should all be among those
+    batches (EXP level-up coins aren't in the responses, so only a shortfall
+    counts there).
+    """
+    accounts = set(results.granted) | set(results.spent)
+    applied = {user_id: after["applied"][user_id] - before["applied"][user_id] for user_id in accounts}
+    coin_diffs = {
+        user_id: before["coins"].get(user_id, 0) + applied[user_id] - results.spent[user_id]
+        - after["coins"].get(user_id, 0)
+        for user_id in accounts
+    }
+    lost_coins = {user_id: diff for user_id, diff in coin_diffs.items() if diff > 0}
+    extra_coins = {user_id: -diff for user_id, diff in coin_diffs.items() if diff < 0}
+    unapplied = {
+        user_id: results.granted[user_id] - applied[user_id]
+        for user_id in accounts if results.granted[user_id] > applied[user_id]
+    }
+
+    lost_unlocks = {
+        key: expected - after["unlocked"].get(key, 0)
+        for key, expected in results.unlocked.items() if after["unlocked"].get(key, 0) < expected
+    }
+    lost_attempts = {
+        key: before["attempts"].get(key, 0) + count - after["attempts"].get(key, 0)
+        for key, count in results.attempts.items()
+        if after["attempts"].get(key, 0) < before["attempts"].get(key, 0) + count
+    }
+    return {
+        "coins": {"accounts": len(lost_coins), "total": sum(lost_coins.values())},
+        "extra_coins": {"accounts": len(extra_coins), "total": sum(extra_coins.values())},
+        "unapplied_grants": {"accounts": len(unapplied), "total": sum(unapplied.values())},
+        "unlocked_levels": {"rows": len(lost_unlocks), "total": sum(lost_unlocks.values())},
+        "mastery_attempts": {"levels": len(lost_attempts), "total": sum(lost_attempts.values())},
+    }
+
+
+# === Running ===
+
+def _start_local(args):
+    """fake_supabase + the app on a threaded werkzeug server, both in this process."""
+    import fake_supabase
+
+    dataset = seed_data.generate(users=args.users, levels=args.levels, seed=args.seed)
+    fake = fake_supabase.FakeSupabase(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, seed=dataset,
+        gemini_latency_ms=args.gemini_latency_ms, tts_latency_ms=args.tts_latency_ms
+    ).start()
+    os.environ.update({
+        "SUPABASE_URL": fake.url,
+        "SUPABASE_KEY": args.key,
+        "FLASK_SECRET_KEY": "loadtest",
+        "GEMINI_API_KEY": "loadtest",
+        "GEMINI_API_ENDPOINT": fake.url,
+        "GOOGLE_TTS_URL": fake.url + fake_supabase.TTS_PATH,
+        "GOOGLE_TTS_API_KEY": "loadtest",
+        "WRITE_BUFFER_DIR": tempfile.mkdtemp(prefix="loadtest-write-buffer-"),
+        "LOG_LEVEL": os.getenv("LOG_LEVEL", "ERROR"),
+    })
+    os.environ.pop("METRICS_DIR", None)
+
+    from werkzeug.serving import make_server
+    import app
+
+    # One access log line per request would drown the report
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+
+    server = make_server("127.0.0.1", 0, app.create_app(), threaded=True)
+    threading.Thread(target=server.serve_forever, name="loadtest-app", daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", fake.url, server, fake
+
+
+def _settle(args, server):
+    """Get the buffered coin grants into the backend before reading it back."""
+    if server is not None:
+        import services
+        import write_buffer
+        write_buffer.flush_all(services.supabase)
+    elif args.settle:
+        print(f"⏳ Waiting {args.settle:g}s for the write buffer to flush")
+        time.sleep(args.settle)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay concurrent quiz and boss sessions and look for lost updates")
+    parser.add_argument("--target", help="app URL (default: start the app and fake_supabase in-process)")
+    parser.add_argument("--backend", help="fake_supabase URL the target uses (required with --target)")
+    parser.add_argument("--key", default="loadtest", help="SUPABASE_KEY for reading the backend")
+    parser.add_argument("--sessions", type=int, default=20, help="concurrent virtual users")
+    parser.add_argument("--accounts", type=int, help="distinct accounts they share (default: one each)")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to run")
+    parser.add_argument("--ramp-up", type=float, default=5, help="seconds over which virtual users start")
+    parser.add_argument("--think-ms", type=float, default=1000, help="mean pause between player actions")
+    parser.add_argument("--accuracy", type=float, default=0.9, help="chance of answering a question right")
+    parser.add_argument("--boss-ratio", type=float, default=0.2, help="share of sessions that are boss fights")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--settle", type=float, default=6, help="with --target: wait for the write buffer flush")
+    parser.add_argument("--output", help="also write the results here as JSON")
+    local = parser.add_argument_group("in-process backend")
+    local.add_argument("--users", type=int, default=2000)
+    local.add_argument("--levels", type=int, default=300)
+    local.add_argument("--latency-ms", type=float, default=20)
+    local.add_argument("--jitter-ms", type=float, default=5)
+    local.add_argument("--gemini-latency-ms", type=float, default=800)
+    local.add_argument("--tts-latency-ms", type=float, default=300)
+    args = parser.parse_args()
+    if args.target and not args.backend:
+        parser.error("--target needs --backend to check for lost updates")
+
+    server = fake = None
+    if args.target:
+        base_url, backend = args.target.rstrip("/"), args.backend.rstrip("/")
+    else:
+        base_url, backend, server, fake = _start_local(args)
+
+    before = snapshot(backend, args.key)
+    rng = random.Random(args.seed)
+    pool_size = min(len(before["users"]), args.accounts or args.sessions)
+    accounts = [
+        {"id": row["id"], "email": row["email"], "lesson": row.get("lesson_language") or "tagalog",
+         "level": before["unlocked"].get((row["id"], row.get("lesson_language")), 1)}
+        for row in rng.sample(before["users"], pool_size)
+    ]
+
+    results = Results()
+    pool = ThreadPoolExecutor(max_workers=args.sessions * 5, thread_name_prefix="loadtest-fire")
+    print(f"🏋️ {args.sessions} virtual users on {len(accounts)} accounts for {args.duration:g}s against {base_url}")
+    started = time.monotonic()
+    deadline = started + args.duration
+    threads = []
+    for i in range(args.sessions):
+        user = VirtualUser(base_url, accounts[i % len(accounts)], results, pool, args, random.Random(rng.random()))
+        thread = threading.Thread(target=user.run, args=(deadline,), name=f"loadtest-vu-{i}", daemon=True)
+        threads.append(thread)
+        thread.start()
+        time.sleep(args.ramp_up / args.sessions)
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+    pool.shutdown()
+
+    _settle(args, server)
+    lost = lost_updates(before, snapshot(backend, args.key), results)
+
+    routes = {}
+    for route in sorted(results.latencies):
+        latencies = sorted(results.latencies[route])
+        statuses = results.statuses[route]
+        errors = sum(n for status, n in statuses.items() if not isinstance(status, int) or status >= 400)
+        routes[route] = {
+            "requests": len(latencies),
+            "error_rate": round(errors / len(latencies), 4),
+            "p50_ms": round(_percentile(latencies, 50) * 1000, 1),
+            "p95_ms": round(_percentile(latencies, 95) * 1000, 1),
+            "p99_ms": round(_percentile(latencies, 99) * 1000, 1),
+            "statuses": {str(status): n for status, n in statuses.items()},
+        }
+    total = sum(route["requests"] for route in routes.values())
+    errors = sum(round(route["requests"] * route["error_rate"]) for route in routes.values())
+    report = {
+        "config": {k: v for k, v in vars(args).items() if k != "key"},
+        "elapsed_seconds": round(elapsed, 1),
+        "requests": total,
+        "throughput_rps": round(total / elapsed, 1),
+        "error_rate": round(errors / total, 4) if total else 0,
+        "sessions": dict(results.sessions),
+        "lost_updates": lost,
+        "routes": routes,
+    }
+
+    print(f"{'route':<28}{'requests':>9}{'errors':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for route, row in routes.items():
+        print(f"{route:<28}{row['requests']:>9}{row['error_rate']:>9.1%}"
+              f"{row['p50_ms']:>9}{row['p95_ms']:>9}{row['p99_ms']:>9}")
+    print(f"\n{total} requests in {elapsed:.1f}s: {report['throughput_rps']} req/s, {report['error_rate']:.1%} errors")
+    print("Sessions: " + ", ".join(f"{name} {n}" for name, n in sorted(results.sessions.items())))
+    print(
+        f"Lost updates: {lost['coins']['total']} coins on {lost['coins']['accounts']} accounts "
+        f"(+{lost['extra_coins']['total']} unexpected on {lost['extra_coins']['accounts']}, "
+        f"{lost['unapplied_grants']['total']} granted but never applied), "
+        f"{lost['unlocked_levels']['total']} unlocked levels on {lost['unlocked_levels']['rows']} progress rows, "
+        f"{lost['mastery_attempts']['total']} mastery attempts"
+    )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"📄 Results written to {args.output}")
+
+    if server is not None:
+        import write_buffer
+        write_buffer.stop()
+        server.shutdown()
+        fake.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,223 @@
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import sys
+import uuid
+from datetime import datetime, timezone
+
+# 📝 Structured logging
+#
+# Modules log through `log = logging.getLogger(__name__)` instead of print().
+# setup() (called from create_app()) routes every record through a bounded
+# queue: the request thread only appends to it, and a background listener
+# thread formats and writes to stdout. When the queue is full records are
+# dropped and counted rather than blocking the request.
+#
+#   LOG_LEVEL               DEBUG / INFO (default) / WARNING / ERROR
+#   LOG_FORMAT              json (default, one object per line) or text
+#   LOG_DEBUG_SAMPLE_RATE   share of requests whose DEBUG lines are kept (1.0)
+#
+# Each request gets an ID (the incoming X-Request-ID header, or a new one),
+# attached to all of its log lines and echoed back in the response. Sampling
+# is decided once per request, so a sampled request keeps its full trace.
+#
+# At the default INFO level a log.debug(...) call costs one level check: pass
+# values as %-style arguments (never pre-format with f-strings) and guard
+# anything expensive to compute with `if log.isEnabledFor(logging.DEBUG)`.
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "1.0"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+# Chatty libraries that only get through at WARNING and above
+QUIET_LOGGERS = ("httpx", "httpcore", "hpack", "urllib3")
+
+REQUEST_ID_HEADER = "X-Request-ID"
+_VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._:-]{1,128}$")
+
+_request_id = contextvars.ContextVar("request_id", default=None)
+_debug_sampled = contextvars.ContextVar("debug_sampled", default=None)
+
+# Attributes every LogRecord has; anything else came in through `extra=`
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+_state = {"handler": None, "listener": None}
+dropped = 0
+
+
+# === Request context ===
+
+def new_request_id(incoming=None):
+    """Use the caller's request ID if it looks sane, otherwise make one."""
+    if incoming and _VALID_REQUEST_ID.match(incoming):
+        return incoming
+    return uuid.uuid4().hex
+
+
+def bind_request(request_id):
+    """Start a request's logging context. Returns a token for unbind_request()."""
+    sampled = LOG_DEBUG_SAMPLE_RATE >= 1 or random.random() < LOG_DEBUG_SAMPLE_RATE
+    return _request_id.set(request_id), _debug_sampled.set(sampled)
+
+
+def unbind_request(tokens):
+    id_token, sampled_token = tokens
+    try:
+        _request_id.reset(id_token)
+        _debug_sampled.reset(sampled_token)
+    except ValueError:
+        # Torn down from a different context than it was bound in
+        _request_id.set(None)
+        _debug_sampled.set(None)
+
+
+def current_request_id():
+    return _request_id.get()
+
+
+# === Filters, handler and formatters ===
+
+class _ContextFilter(logging.Filter):
+    """Tag records with the request ID and drop unsampled DEBUG lines."""
+
+    def filter(self, record):
+        if record.levelno <= logging.DEBUG:
+            sampled = _debug_sampled.get()
+            if sampled is None:
+                # Outside a request, sample line by line
+                sampled = LOG_DEBUG_SAMPLE_RATE >= 1 or random.random() < LOG_DEBUG_SAMPLE_RATE
+            if not sampled:
+                return False
+        record.request_id = _request_id.get()
+        return True
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Never block the caller: a full queue drops the record."""
+
+    def enqueue(self, record):
+        global dropped
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            dropped += 1
+
+    def prepare(self, record):
+        # Resolve the message now (args may change after we return) but leave
+        # the formatting to the listener thread
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS and key != "request_id":
+                entry[key] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s %(name)s [%(request_id)s] %(message)s")
+
+    def format(self, record):
+        if not hasattr(record, "request_id") or record.request_id is None:
+            record.request_id = "-"
+        return super().format(record)
+
+
+# === Setup ===
+
+def _start_listener():
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(TextFormatter() if LOG_FORMAT == "text" else JsonFormatter())
+    handler = _DroppingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    handler.addFilter(_ContextFilter())
+    listener = logging.handlers.QueueListener(handler.queue, stream, respect_handler_level=False)
+    listener.start()
+    _state["handler"], _state["listener"] = handler, listener
+    return handler
+
+
+def setup():
+    """Route the root logger through the queue. Safe to call more than once."""
+    if _state["handler"] is not None:
+        return
+    root = logging.getLogger()
+    root.setLevel(LOG_LEVEL)
+    root.addHandler(_start_listener())
+    # httpx logs every Supabase request at INFO; metrics.py already counts them
+    for name in QUIET_LOGGERS:
+        logging.getLogger(name).setLevel(max(logging.WARNING, root.level))
+
+
+def shutdown():
+    """Write out whatever is still queued."""
+    listener = _state["listener"]
+    if listener is not None:
+        listener.stop()
+        _state["listener"] = None
+
+
+def init_app(app):
+    """Give every Flask request an ID and echo it back in the response."""
+    from flask import g, request
+
+    @app.before_request
+    def _bind_request_id():
+        g.request_id = new_request_id(request.headers.get(REQUEST_ID_HEADER))
+        g._log_tokens = bind_request(g.request_id)
+
+    @app.after_request
+    def _send_request_id(response):
+        request_id = g.get("request_id")
+        if request_id:
+            response.headers[REQUEST_ID_HEADER] = request_id
+        return response
+
+    @app.teardown_request
+    def _unbind_request_id(exc):
+        tokens = g.pop("_log_tokens", None)
+        if tokens is not None:
+            unbind_request(tokens)
+
+
+def _after_fork_in_child():
+    # The listener thread doesn't survive fork(); give the child its own
+    old = _state["handler"]
+    if old is None:
+        return
+    _state["listener"] = None
+    root = logging.getLogger()
+    root.removeHandler(old)
+    root.addHandler(_start_listener())
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+atexit.register(shutdown)
@@ -0,0 +1,395 @@
+import atexit
+import contextvars
+import glob
+import hmac
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines
+    fcntl = None
+
+# 📈 Request and upstream metrics, exposed in Prometheus text format
+#
+#   http_requests_total{method,route,status}          requests served
+#   http_request_duration_seconds{method,route}       latency histogram
+#   upstream_call_duration_seconds{upstream,route}    one observation per call
+#                                                     to supabase / storage /
+#                                                     tts / gemini
+#   upstream_errors_total{upstream,route}             calls that raised or got
+#                                                     a 5xx response
+#   upstream_calls_per_request{upstream,route}        calls made by a single
+#                                                     request: an N+1 loop shows
+#                                                     up as a high bucket here
+#
+# `route` is the Flask URL rule ("/buy-avatar/<int:avatar_id>"), never the raw
+# path, so the number of series stays bounded. Upstream calls made outside a
+# request (the coin flusher, cache warm-up) are tagged route="-".
+#
+# Supabase and Storage calls are timed by wrapping the clients' HTTP sessions
+# (services.py), Gemini by the model wrapper in services.py, and plain HTTP
+# calls (TTS, lesson files) with `with metrics.upstream("tts"):`. Timings run
+# until the response headers arrive.
+#
+# Under gunicorn each worker keeps its own numbers. With METRICS_DIR set they
+# are snapshotted there (at most every METRICS_SNAPSHOT_SECONDS) and /metrics
+# merges every worker's snapshot, so any worker answers for all of them.
+# Snapshots of workers that have exited are folded into one archive file.
+# A relative METRICS_DIR is resolved once at import, so a worker that changes
+# directory still finds the others.
+#
+# /metrics wants `Authorization: Bearer $METRICS_TOKEN`. With no token set it
+# only answers scrapers on this machine (loopback address, no X-Forwarded-For);
+# behind a reverse proxy on the same host, set a token.
+
+METRICS_DIR = os.path.abspath(os.environ["METRICS_DIR"]) if os.getenv("METRICS_DIR") else None
+METRICS_SNAPSHOT_SECONDS = float(os.getenv("METRICS_SNAPSHOT_SECONDS", "5"))
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+LOOPBACK_ADDRESSES = {"127.0.0.1", "::1"}
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+CALLS_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+_HELP = {
+    "http_requests_total": ("counter", "Requests served."),
+    "http_request_duration_seconds": ("histogram", "Request latency."),
+    "upstream_call_duration_seconds": ("histogram", "Latency of calls to Supabase, Storage, TTS and Gemini."),
+    "upstream_errors_total": ("counter", "Upstream calls that raised or got a 5xx response."),
+    "upstream_calls_per_request": ("histogram", "Upstream calls made by one request."),
+}
+_BUCKETS = {
+    "http_request_duration_seconds": LATENCY_BUCKETS,
+    "upstream_call_duration_seconds": LATENCY_BUCKETS,
+    "upstream_calls_per_request": CALLS_BUCKETS,
+}
+
+_lock = threading.Lock()
+_counters = {}    # (name, labels) -> value
+_histograms = {}  # (name, labels) -> [bucket counts..., sum, count]
+_last_snapshot = [0.0]
+_listeners = []   # called with (upstream, calls so far) after each request call
+
+# Set for the duration of a request: the route label and {upstream: calls}
+_route = contextvars.ContextVar("metrics_route", default="-")
+_request_calls = contextvars.ContextVar("metrics_request_calls", default=None)
+
+
+# === Recording ===
+
+def _inc(name, labels, value=1):
+    key = (name, labels)
+    _counters[key] = _counters.get(key, 0) + value
+
+
+def _observe(name, labels, value):
+    buckets = _BUCKETS[name]
+    key = (name, labels)
+    hist = _histograms.get(key)
+    if hist is None:
+        hist = _histograms[key] = [0] * (len(buckets) + 2)
+    for i, bound in enumerate(buckets):
+        if value <= bound:
+            hist[i] += 1
+    hist[-2] += value
+    hist[-1] += 1
+
+
+def record_upstream(upstream, seconds, error=False):
+    """Count one call to `upstream` made by the current request (if any)."""
+    route = _route.get()
+    with _lock:
+        _observe("upstream_call_duration_seconds", (("upstream", upstream), ("route", route)), seconds)
+        if error:
+            _inc("upstream_errors_total", (("upstream", upstream), ("route", route)))
+        calls = _request_calls.get()
+        if calls is None:
+            return
+        calls[upstream] = count = calls.get(upstream, 0) + 1
+    for listener in _listeners:
+        listener(upstream, count)
+
+
+def on_upstream_call(listener):
+    """Register listener(upstream, calls) to run after each call made by a request."""
+    _listeners.append(listener)
+    return listener
+
+
+@contextmanager
+def upstream(name):
+    """Time the block as one call to `name` ("tts", "storage", ...)."""
+    start = time.perf_counter()
+    error = False
+    try:
+        yield
+    except BaseException:
+        error = True
+        raise
+    finally:
+        record_upstream(name, time.perf_counter() - start, error)
+
+
+def request_calls():
+    """{upstream: calls} made so far by the current request."""
+    return dict(_request_calls.get() or {})
+
+
+def begin_request(route):
+    """Start tracking a request. Returns a token for end_request()."""
+    return _route.set(route), _request_calls.set({}), time.perf_counter()
+
+
+def end_request(tokens, method, status):
+    route_token, calls_token, start = tokens
+    route = _route.get()
+    calls = _request_calls.get() or {}
+    elapsed = time.perf_counter() - start
+    with _lock:
+        _inc("http_requests_total", (("method", method), ("route", route), ("status", str(status))))
+        _observe("http_request_duration_seconds", (("method", method), ("route", route)), elapsed)
+        for name in ("supabase", "storage", "tts", "gemini"):
+            _observe("upstream_calls_per_request", (("upstream", name), ("route", route)), calls.get(name, 0))
+    try:
+        _route.reset(route_token)
+        _request_calls.reset(calls_token)
+    except ValueError:
+        _route.set("-")
+        _request_calls.set(None)
+    if METRICS_DIR and time.monotonic() - _last_snapshot[0] >= METRICS_SNAPSHOT_SECONDS:
+        _write_snapshot()
+
+
+# === HTTP clients ===
+
+class _TimedTransport:
+    """Wraps an httpx transport, timing each request until its headers arrive."""
+
+    def __init__(self, inner, name):
+        self._inner = inner
+        self._name = name
+
+    def handle_request(self, request):
+        start = time.perf_counter()
+        error = True
+        try:
+            response = self._inner.handle_request(request)
+            error = response.status_code >= 500
+            return response
+        finally:
+            record_upstream(self._name, time.perf_counter() - start, error)
+
+    async def handle_async_request(self, request):
+        start = time.perf_counter()
+        error = True
+        try:
+            response = await self._inner.handle_async_request(request)
+            error = response.status_code >= 500
+            return response
+        finally:
+            record_upstream(self._name, time.perf_counter() - start, error)
+
+    def __enter__(self):
+        self._inner.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        return self._inner.__exit__(*exc)
+
+    async def __aenter__(self):
+        await self._inner.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc):
+        return await self._inner.__aexit__(*exc)
+
+    def __getattr__(self, name):
+        return getattr(self._inner, name)
+
+
+def instrument_httpx(client, name):
+    """Count and time every request sent by an httpx Client / AsyncClient
+    (the Supabase and Storage sessions), including ones that fail to connect."""
+    client._transport = _TimedTransport(client._transport, name)
+
+
+# === Multi-process snapshots ===
+
+def _dump(counters, histograms):
+    return {
+        "counters": [[name, list(labels), value] for (name, labels), value in counters.items()],
+        "histograms": [[name, list(labels), list(hist)] for (name, labels), hist in histograms.items()],
+    }
+
+
+def _snapshot():
+    with _lock:
+        return _dump(_counters, _histograms)
+
+
+def _write_snapshot():
+    _last_snapshot[0] = time.monotonic()
+    try:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        path = os.path.join(METRICS_DIR, f"{os.getpid()}.json")
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(_snapshot(), f)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+
+
+def _merge(into, snapshot):
+    counters, histograms = into
+    for name, labels, value in snapshot["counters"]:
+        key = (name, tuple(map(tuple, labels)))
+        counters[key] = counters.get(key, 0) + value
+    for name, labels, hist in snapshot["histograms"]:
+        key = (name, tuple(map(tuple, labels)))
+        current = histograms.get(key)
+        histograms[key] = list(hist) if current is None else [a + b for a, b in zip(current, hist)]
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _collect_all():
+    """Merge the snapshots of every worker, archiving those that have exited."""
+    _write_snapshot()
+    merged = ({}, {})
+    archive_path = os.path.join(METRICS_DIR, "archived.json")
+    with open(os.path.join(METRICS_DIR, ".lock"), "a") as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+        archive = ({}, {})
+        if os.path.exists(archive_path):
+            with open(archive_path) as f:
+                _merge(archive, json.load(f))
+
+        dead = []
+        for path in glob.glob(os.path.join(METRICS_DIR, "*.json")):
+            name = os.path.basename(path)[:-len(".json")]
+            if not name.isdigit():
+                continue
+            try:
+                with open(path) as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if fcntl and not _pid_alive(int(name)):
+                _merge(archive, snapshot)
+                dead.append(path)
+            else:
+                _merge(merged, snapshot)
+
+        if dead:
+            with open(archive_path + ".tmp", "w") as f:
+                json.dump(_dump(*archive), f)
+            os.replace(archive_path + ".tmp", archive_path)
+            for path in dead:
+                os.remove(path)
+
+    _merge(merged, _dump(*archive))
+    return merged
+
+
+# === Exposition ===
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    if METRICS_DIR:
+        counters, histograms = _collect_all()
+    else:
+        with _lock:
+            counters, histograms = dict(_counters), {k: list(v) for k, v in _histograms.items()}
+
+    lines = []
+    for name, (kind, help_text) in _HELP.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        if kind == "counter":
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+            continue
+        buckets = _BUCKETS[name]
+        for (metric, labels), hist in sorted(histograms.items()):
+            if metric != name:
+                continue
+            for bound, count in zip(buckets, hist):
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {count}")
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {hist[-1]}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {hist[-2]}")
+            lines.append(f"{name}_count{_format_labels(labels)} {hist[-1]}")
+    return "\n".join(lines) + "\n"
+
+
+# === Flask ===
+
+def init_app(app):
+    """Time every request and serve GET /metrics."""
+    from flask import Response, g, request
+
+    @app.before_request
+    def _start_request_metrics():
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        g._metrics_tokens = begin_request(route)
+
+    @app.after_request
+    def _remember_status(response):
+        g._metrics_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def _finish_request_metrics(exc):
+        tokens = g.pop("_metrics_tokens", None)
+        if tokens is not None:
+            end_request(tokens, request.method, g.pop("_metrics_status", 500))
+
+    @app.route("/metrics")
+    def metrics_endpoint():
+        if METRICS_TOKEN:
+            allowed = hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {METRICS_TOKEN}")
+        else:
+            allowed = request.remote_addr in LOOPBACK_ADDRESSES and "X-Forwarded-For" not in request.headers
+        if not allowed:
+            return Response("Forbidden\n", status=403, mimetype="text/plain")
+        return Response(render(), mimetype="text/plain; version=0.0.4")
+
+
+def _after_fork_in_child():
+    global _lock
+    _lock = threading.Lock()
+    _counters.clear()
+    _histograms.clear()
+    _last_snapshot[0] = 0.0
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+if METRICS_DIR:
+    atexit.register(_write_snapshot)
@@ -0,0 +1,66 @@
+import time
+
+from flask import session
+
+# 🏷️ Per-user ownership sets (avatars / items) kept in the user's session
+#
+# Stored as sorted lists of ids, so the cookie grows with how many things the
+# user owns rather than with the largest id. The session copy is updated by
+# our own purchase / consume routes and re-read from the database after
+# OWNERSHIP_TTL_SECONDS in case an admin changed it.
+#
+# A miss loads every kind at once with the owned_ids RPC (sql/owned_ids.sql),
+# so /shop, which needs both, makes one read on a cold session instead of two.
+
+OWNERSHIP_TTL_SECONDS = 600
+
+# kind -> (table, id column), the tables owned_ids reads
+SOURCES = {
+    "avatars": ("user_avatars", "avatar_id"),
+    "items": ("user_items", "item_id"),
+}
+
+
+def _entry(kind):
+    """The cached entry for this kind, or None if missing/stale/another user's."""
+    entry = session.get(f"owned_{kind}")
+    if not entry or entry.get("uid") != session.get("user_id") or "ids" not in entry:
+        return None
+    if time.time() - entry.get("at", 0) > OWNERSHIP_TTL_SECONDS:
+        return None
+    return entry
+
+
+def _store(kind, ids, loaded_at=None):
+    session[f"owned_{kind}"] = {
+        "uid": session.get("user_id"),
+        "ids": sorted(ids),
+        "at": loaded_at if loaded_at is not None else time.time()
+    }
+
+
+def get_owned(supabase, kind):
+    """Return the set of owned avatar/item ids for the logged-in user."""
+    entry = _entry(kind)
+    if entry:
+        return set(entry["ids"])
+
+    loaded = supabase.rpc("owned_ids", {"p_user_id": session["user_id"]}).execute().data or {}
+    now = time.time()
+    for other in SOURCES:
+        _store(other, loaded.get(other) or [], now)
+    return set(loaded.get(kind) or [])
+
+
+def add_owned(kind, owned_id):
+    """Write-through after a purchase. No-op if nothing is cached yet."""
+    entry = _entry(kind)
+    if entry:
+        _store(kind, set(entry["ids"]) | {int(owned_id)}, entry["at"])
+
+
+def discard_owned(kind, owned_id):
+    """Write-through after the last one of something is used up."""
+    entry = _entry(kind)
+    if entry:
+        _store(kind, set(entry["ids"]) - {int(owned_id)}, entry["at"])
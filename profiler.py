@@ -0,0 +1,247 @@
+import glob
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+# 🔥 Sampling profiler, opt-in per request or for a time window
+#
+#   per request   an admin sends "X-Profile: 1"; the response carries an
+#                 X-Profile-Id header naming the profile
+#   time window   /admin/profiler starts one: every request in every worker
+#                 is sampled until it ends
+#
+# Profiles are listed and downloaded from /admin/profiler. They are in folded
+# format ("frame;frame;frame samples" per line), which flamegraph.pl, inferno
+# and speedscope all read. Frames look like "function (folder/file.py:line)":
+# Jinja templates show up as their .html file and network waits as the socket / ssl
+# frames under the Supabase call.
+#
+# Nothing runs while nothing is being profiled. While something is, one
+# sampler thread per process reads sys._current_frames() every
+# PROFILE_INTERVAL_MS and counts the stacks of the request threads it watches.
+#
+# Profiles are written to PROFILE_DIR, one file per process per profile, so
+# any gunicorn worker can serve them. Only the newest PROFILE_KEEP are kept.
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "instance", "profiles"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "50"))
+PROFILE_MAX_WINDOW_SECONDS = 300
+
+HEADER = "X-Profile"
+ID_HEADER = "X-Profile-Id"
+_WINDOW_FILE = "window.json"
+_WINDOW_CHECK_SECONDS = 1.0
+
+_lock = threading.Lock()
+_watched = {}     # thread id -> profile id
+_samples = {}     # profile id -> Counter of folded stacks
+_windows = {}     # profile id -> end time (time.time()) of windows sampled here
+_labels = {}      # code object -> "function (folder/file:line)"
+_sampler = [None]
+_window = {"id": None, "until": 0.0, "checked": 0.0, "mtime": None}
+
+
+# === Sampling ===
+
+def _label(code):
+    label = _labels.get(code)
+    if label is None:
+        # Parent folder too, so flask/app.py and our app.py stay apart
+        path = os.path.join(*code.co_filename.replace("\\", "/").split("/")[-2:])
+        label = _labels[code] = f"{code.co_name} ({path}:{code.co_firstlineno})"
+    return label
+
+
+def _fold(frame):
+    stack = []
+    while frame is not None:
+        stack.append(_label(frame.f_code))
+        frame = frame.f_back
+    stack.reverse()
+    return ";".join(stack)
+
+
+def _run_sampler():
+    interval = PROFILE_INTERVAL_MS / 1000
+    while True:
+        time.sleep(interval)
+        frames = sys._current_frames()
+        now = time.time()
+        with _lock:
+            for thread_id, profile_id in _watched.items():
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    _samples[profile_id][_fold(frame)] += 1
+            finished = [profile_id for profile_id, until in _windows.items() if until <= now]
+            for profile_id in finished:
+                del _windows[profile_id]
+            done = {profile_id: _samples.pop(profile_id) for profile_id in finished
+                    if profile_id not in _watched.values()}
+            idle = not _watched and not _windows
+            if idle:
+                _sampler[0] = None
+        del frames
+        for profile_id, samples in done.items():
+            _save(profile_id, samples)
+        if idle:
+            return
+
+
+def _watch(profile_id):
+    with _lock:
+        _watched[threading.get_ident()] = profile_id
+        _samples.setdefault(profile_id, Counter())
+        if _sampler[0] is None:
+            _sampler[0] = threading.Thread(target=_run_sampler, name="profiler", daemon=True)
+            _sampler[0].start()
+
+
+def _unwatch():
+    """Stop sampling this thread; returns (profile id, samples) when that finished a profile."""
+    with _lock:
+        profile_id = _watched.pop(threading.get_ident(), None)
+        if profile_id is None or profile_id in _windows or profile_id in _watched.values():
+            return None
+        return profile_id, _samples.pop(profile_id, Counter())
+
+
+# === Storage ===
+
+def _path(profile_id, pid=None):
+    return os.path.join(PROFILE_DIR, f"{profile_id}.{pid or os.getpid()}.folded")
+
+
+def _save(profile_id, samples):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    tmp = _path(profile_id) + f".{threading.get_ident()}.tmp"
+    with open(tmp, "w") as f:
+        f.writelines(f"{stack} {count}\n" for stack, count in samples.items())
+    os.replace(tmp, _path(profile_id))
+    _prune()
+
+
+def _prune():
+    for profile in list_profiles()[PROFILE_KEEP:]:
+        for path in glob.glob(os.path.join(PROFILE_DIR, f"{profile['id']}.*.folded")):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def list_profiles():
+    """Saved profiles, newest first: [{"id", "processes", "samples", "saved_at"}]."""
+    profiles = {}
+    for path in glob.glob(os.path.join(PROFILE_DIR, "*.folded")):
+        profile_id = os.path.basename(path).rsplit(".", 2)[0]
+        try:
+            with open(path) as f:
+                samples = sum(int(line.rsplit(" ", 1)[1]) for line in f if line.strip())
+            saved_at = os.path.getmtime(path)
+        except (OSError, ValueError, IndexError):
+            continue
+        profile = profiles.setdefault(profile_id, {"id": profile_id, "processes": 0, "samples": 0, "saved_at": 0})
+        profile["processes"] += 1
+        profile["samples"] += samples
+        profile["saved_at"] = max(profile["saved_at"], saved_at)
+    return sorted(profiles.values(), key=lambda p: p["saved_at"], reverse=True)
+
+
+def load(profile_id):
+    """One profile in folded format, merged across processes (None if unknown)."""
+    paths = glob.glob(os.path.join(PROFILE_DIR, f"{glob.escape(profile_id)}.*.folded"))
+    if not paths:
+        return None
+    merged = Counter()
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                stack, _, count = line.rstrip("\n").rpartition(" ")
+                if stack:
+                    merged[stack] += int(count)
+    return "".join(f"{stack} {count}\n" for stack, count in merged.most_common())
+
+
+# === Time windows ===
+
+def start_window(seconds):
+    """Sample every request in every worker for the next `seconds`; returns the profile id."""
+    seconds = max(1, min(int(seconds), PROFILE_MAX_WINDOW_SECONDS))
+    profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-window-{seconds}s-{uuid.uuid4().hex[:6]}"
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    tmp = os.path.join(PROFILE_DIR, f"{_WINDOW_FILE}.{os.getpid()}.tmp")
+    with open(tmp, "w") as f:
+        json.dump({"id": profile_id, "until": time.time() + seconds}, f)
+    os.replace(tmp, os.path.join(PROFILE_DIR, _WINDOW_FILE))
+    _window["checked"] = 0.0
+    return profile_id
+
+
+def active_window():
+    """The (profile id, end time) of the running window, or None. Checks the file at most once a second."""
+    now = time.time()
+    if now - _window["checked"] >= _WINDOW_CHECK_SECONDS:
+        _window["checked"] = now
+        path = os.path.join(PROFILE_DIR, _WINDOW_FILE)
+        try:
+            mtime = os.path.getmtime(path)
+            if mtime != _window["mtime"]:
+                with open(path) as f:
+                    window = json.load(f)
+                _window.update(id=window["id"], until=window["until"], mtime=mtime)
+        except (OSError, ValueError, KeyError):
+            _window.update(id=None, until=0.0, mtime=None)
+    if _window["id"] and now < _window["until"]:
+        return _window["id"], _window["until"]
+    return None
+
+
+# === Flask ===
+
+def init_app(app, allowed):
+    """Hook the profiler into every request; `allowed()` decides who may use X-Profile."""
+    from flask import g, request
+
+    @app.before_request
+    def _start_profile():
+        window = active_window()
+        if window is not None:
+            profile_id, until = window
+            with _lock:
+                _windows.setdefault(profile_id, until)
+            _watch(profile_id)
+        elif request.headers.get(HEADER) == "1" and allowed():
+            g.profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{request.endpoint or 'unmatched'}-{uuid.uuid4().hex[:6]}"
+            _watch(g.profile_id)
+
+    @app.after_request
+    def _send_profile_id(response):
+        profile_id = g.get("profile_id")
+        if profile_id:
+            response.headers[ID_HEADER] = profile_id
+        return response
+
+    @app.teardown_request
+    def _finish_profile(exc):
+        finished = _unwatch()
+        if finished is not None:
+            _save(*finished)
+
+
+def _after_fork_in_child():
+    global _lock
+    _lock = threading.Lock()
+    _watched.clear()
+    _samples.clear()
+    _windows.clear()
+    _sampler[0] = None
+    _window.update(id=None, until=0.0, checked=0.0, mtime=None)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
@@ -0,0 +1,110 @@
+import threading
+from bisect import bisect_right
+
+# ⭐ Account EXP / level-up engine
+#
+# Level L needs REQUIRED(L) = 50 * 1.05^(L-1) EXP to reach L+1, and reaching
+# level L pays COINS(L) = round(50 * 1.2^(L-1)) coins. Everything comes from
+# tables indexed by level, which grow on demand:
+#
+#   _required[L]     = REQUIRED(L), what required_exp() returns
+#   _cumulative[L]   = sum of REQUIRED(1..L-1), EXP spent getting to level L
+#   _coin_prefix[L]  = sum of COINS(2..L)
+#   _coin_prefix2[L] = sum of _coin_prefix[2..L]
+#
+# apply_exp() bisects _cumulative for the level a grant reaches, then takes
+# the float steps (current_exp -= _required[L]) only across the last few
+# levels, so a grant that lands exactly on a boundary levels up and the
+# leftover EXP is what subtracting level by level gives. Grants of up to
+# EXACT_LEVELS levels (all the game hands out) are stepped from the player's
+# level and are exact to the bit; bigger ones start two levels below the
+# bisected one, and their leftover EXP can be off in the last digits.
+#
+# The old loop added the *running* level_up_coins total to the balance after
+# every level gained (level 1 -> 3 pays COINS(2) + (COINS(2) + COINS(3))), and
+# we keep that behaviour so balances stay the same.
+
+BASE_EXP = 50
+EXP_GROWTH = 1.05
+BASE_LEVEL_UP_COINS = 50
+COIN_GROWTH = 1.2
+INITIAL_TABLE_LEVELS = 512
+EXACT_LEVELS = 8
+
+# Index 0 is unused so the lists can be indexed by level directly
+_required = [0.0]
+_cumulative = [0.0]
+_coin_prefix = [0]
+_coin_prefix2 = [0]
+_tables_lock = threading.Lock()
+
+
+def _extend_tables(max_level):
+    with _tables_lock:
+        while len(_required) <= max_level:
+            level = len(_required)
+            _required.append(BASE_EXP * (EXP_GROWTH ** (level - 1)))
+            if level == 1:
+                _cumulative.append(0.0)
+                _coin_prefix.append(0)
+                _coin_prefix2.append(0)
+            else:
+                _cumulative.append(_cumulative[level - 1] + _required[level - 1])
+                coins = int(round(BASE_LEVEL_UP_COINS * (COIN_GROWTH ** (level - 1))))
+                _coin_prefix.append(_coin_prefix[level - 1] + coins)
+                _coin_prefix2.append(_coin_prefix2[level - 1] + _coin_prefix[level])
+
+
+_extend_tables(INITIAL_TABLE_LEVELS)
+
+
+def required_exp(account_level):
+    """EXP needed to go from `account_level` to the next level."""
+    if account_level < 1:
+        return BASE_EXP * (EXP_GROWTH ** (account_level - 1))
+    if account_level >= len(_required):
+        _extend_tables(account_level * 2)
+    return _required[account_level]
+
+
+def apply_exp(account_level, current_exp, current_coins, gained_exp):
+    """
+    Add `gained_exp` to a player and resolve every level-up it causes.
+
+    Returns a dict with the new `account_level`, `current_exp`, `required_exp`,
+    `leveled_up`, `level_up_coins` and `new_coins`.
+    """
+    account_level = account_level or 1
+    current_exp = current_exp or 0
+    current_coins = current_coins or 0
+
+    total_exp = current_exp + gained_exp
+    if account_level >= len(_required):
+        _extend_tables(account_level * 2)
+    base = _cumulative[account_level]
+    while _cumulative[-1] - base <= total_exp:
+        _extend_tables(len(_required) * 2)
+
+    target = bisect_right(_cumulative, base + total_exp, lo=account_level) - 1
+    if target - account_level <= EXACT_LEVELS:
+        new_level, current_exp = account_level, total_exp
+    else:
+        new_level = target - 2
+        current_exp = total_exp - (_cumulative[new_level] - base)
+    while current_exp >= _required[new_level]:
+        current_exp -= _required[new_level]
+        new_level += 1
+    levels_gained = new_level - account_level
+
+    level_up_coins = _coin_prefix[new_level] - _coin_prefix[account_level]
+    paid_coins = (_coin_prefix2[new_level] - _coin_prefix2[account_level]) \
+        - levels_gained * _coin_prefix[account_level]
+
+    return {
+        "account_level": new_level,
+        "current_exp": current_exp,
+        "required_exp": _required[new_level],
+        "leveled_up": levels_gained > 0,
+        "level_up_coins": level_up_coins,
+        "new_coins": current_coins + paid_coins
+    }
@@ -0,0 +1,101 @@
+import contextvars
+import logging
+import os
+import traceback
+
+import metrics
+
+# 🚦 Per-request database call budget
+#
+# Every Supabase call a request makes is counted (see metrics.py). When a route
+# goes over its budget, the first call past the limit is reported with a short
+# stack summary pointing at the loop that made it:
+#
+#   warn   (default)        log a warning, the request carries on
+#   raise  (app.testing)    the request fails with QueryBudgetExceeded
+#   off                     no checks
+#
+# QUERY_BUDGET_MODE overrides the mode. Budgets come from, in order:
+#
+#   QUERY_BUDGETS="admin.user_detail=12,get_dashboard_stats=6"   (by endpoint)
+#   @query_budget(12) on the view
+#   QUERY_BUDGET (default 10)
+#
+# Raise a route's budget on purpose with @query_budget, not by bumping the
+# default: an N+1 loop is usually cheaper to fix than to allow.
+
+QUERY_BUDGET = int(os.getenv("QUERY_BUDGET", "10"))
+QUERY_BUDGET_MODE = os.getenv("QUERY_BUDGET_MODE")
+QUERY_BUDGETS = {
+    endpoint.strip(): int(limit)
+    for endpoint, limit in (
+        pair.split("=", 1) for pair in os.getenv("QUERY_BUDGETS", "").split(",") if "=" in pair
+    )
+}
+STACK_FRAMES = 6
+
+log = logging.getLogger(__name__)
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+_SKIP_FILES = {os.path.join(_HERE, "metrics.py"), os.path.abspath(__file__)}
+
+# [endpoint, limit, mode, report or None] for the current request
+_state = contextvars.ContextVar("query_budget", default=None)
+
+
+class QueryBudgetExceeded(RuntimeError):
+    pass
+
+
+def query_budget(limit):
+    """Allow the decorated view `limit` database calls per request."""
+    def decorator(f):
+        f._query_budget = limit
+        return f
+    return decorator
+
+
+def _stack_summary():
+    """The innermost frames from this repo (not libraries) that led to the call."""
+    frames = [
+        frame for frame in traceback.extract_stack()
+        if frame.filename.startswith(_HERE) and frame.filename not in _SKIP_FILES
+        and "site-packages" not in frame.filename
+    ]
+    return "".join(traceback.format_list(frames[-STACK_FRAMES:]))
+
+
+@metrics.on_upstream_call
+def _check(upstream, calls):
+    if upstream != "supabase":
+        return
+    state = _state.get()
+    if state is None or state[3] is not None or calls <= state[1]:
+        return
+    endpoint, limit, mode = state[0], state[1], state[2]
+    state[3] = f"{endpoint} went over its budget of {limit} database calls\n{_stack_summary()}"
+    if mode == "warn":
+        log.warning("%s", state[3], extra={"endpoint": endpoint, "budget": limit})
+
+
+def init_app(app):
+    """Check every request against its route's budget."""
+    from flask import request
+
+    @app.before_request
+    def _start_query_budget():
+        mode = QUERY_BUDGET_MODE or ("raise" if app.testing else "warn")
+        if mode == "off" or request.endpoint is None:
+            _state.set(None)
+            return
+        view = app.view_functions.get(request.endpoint)
+        limit = QUERY_BUDGETS.get(request.endpoint, getattr(view, "_query_budget", QUERY_BUDGET))
+        _state.set([request.endpoint, limit, mode, None])
+
+    @app.after_request
+    def _enforce_query_budget(response):
+        state = _state.get()
+        _state.set(None)
+        if state is not None and state[3] is not None and state[2] == "raise":
+            raise QueryBudgetExceeded(f"{state[3]}(calls: {metrics.request_calls()})")
+        return response
@@ -0,0 +1,209 @@
+import random
+import threading
+import time
+from collections import OrderedDict
+
+# 🎲 Block-challenge question sampler
+#
+# Instead of downloading every row of a level and picking one in Python, we keep
+# a small in-memory array of question IDs per level and only fetch the single
+# row that was drawn. Each fight gets its own shuffle-bag so questions don't
+# repeat until the whole level has been used, and questions the player missed
+# can be weighted to come back sooner.
+#
+# Bags live in the Flask session, which is a cookie, so a bag is only a shuffle
+# seed and a position in that shuffle (plus the few ids drawn out of order):
+# its size doesn't depend on how many questions the pool has. Only the current
+# fight's bags are kept. The shuffle a seed gives is cached per worker, so a
+# draw doesn't re-sort and re-shuffle the pool.
+#
+# A drawn question that has been deleted since its pool was cached reloads the
+# pool and draws again from it (the bag keeps its seed and position).
+
+POOL_TTL_SECONDS = 600      # How long a level's ID array is trusted
+MISSED_WEIGHT = 3           # A missed question is this many times likelier to be drawn
+MAX_MISSED = 10             # Cap on remembered misses per fight
+ANY_LEVEL = "*"             # Pool key for the "any question" fallback
+LANGUAGES = ("english", "tagalog", "waray", "cebuano")
+PAGE_SIZE = 1000            # PostgREST's default max-rows: bigger selects are cut short
+MAX_CACHED_ORDERS = 256     # Shuffles kept per worker, about one per fight in progress
+MAX_REDRAWS = 3             # Draws after finding the drawn question deleted
+
+_pools = {}                 # level -> (tuple of question ids, loaded_at)
+_pools_lock = threading.Lock()
+_orders = OrderedDict()     # (pool key, seed) -> (pool it was built from, shuffled ids)
+_orders_lock = threading.Lock()
+
+
+def invalidate(level=None):
+    """Forget cached ID arrays (one level, or all of them). Called by admin question edits."""
+    with _pools_lock:
+        if level is None:
+            _pools.clear()
+        else:
+            _pools.pop(level, None)
+            _pools.pop(ANY_LEVEL, None)
+
+
+def _select_all(make_query):
+    """Every row of `make_query()` (ordered by id), fetched PAGE_SIZE rows at a time."""
+    rows = []
+    while True:
+        page = make_query().order("id").range(len(rows), len(rows) + PAGE_SIZE - 1).execute().data or []
+        rows.extend(page)
+        if len(page) < PAGE_SIZE:
+            return rows
+
+
+def _load_pool(supabase, level):
+    def make_query():
+        query = supabase.table("questionanswer").select("id")
+        return query if level == ANY_LEVEL else query.eq("level", level)
+    return tuple(row["id"] for row in _select_all(make_query))
+
+
+def get_pool(supabase, level):
+    """Return the cached tuple of question IDs for a level, loading it if stale."""
+    now = time.monotonic()
+    with _pools_lock:
+        cached = _pools.get(level)
+    if cached and now - cached[1] < POOL_TTL_SECONDS:
+        return cached[0]
+
+    ids = _load_pool(supabase, level)
+    with _pools_lock:
+        _pools[level] = (ids, now)
+    return ids
+
+
+def warm(supabase):
+    """Load every level's ID array (and the any-level pool) with a single query."""
+    rows = _select_all(lambda: supabase.table("questionanswer").select("id, level"))
+    by_level = {}
+    for row in rows:
+        by_level.setdefault(row["level"], []).append(row["id"])
+
+    now = time.monotonic()
+    with _pools_lock:
+        for level, ids in by_level.items():
+            _pools[level] = (tuple(ids), now)
+        _pools[ANY_LEVEL] = (tuple(row["id"] for row in rows), now)
+    return len(rows)
+
+
+def _new_bag(fight):
+    return {"fight": fight, "seed": random.getrandbits(32), "pos": 0, "drawn": [], "missed": []}
+
+
+def _order(key, pool, seed):
+    """The bag's shuffle of `pool`, rebuilt from its seed unless it's cached."""
+    with _orders_lock:
+        cached = _orders.get((key, seed))
+        if cached and cached[0] is pool:
+            _orders.move_to_end((key, seed))
+            return cached[1]
+    order = sorted(pool)
+    random.Random(seed).shuffle(order)
+    with _orders_lock:
+        # Also replaces a shuffle of this key's previous pool
+        _orders[(key, seed)] = (pool, order)
+        _orders.move_to_end((key, seed))
+        while len(_orders) > MAX_CACHED_ORDERS:
+            _orders.popitem(last=False)
+    return order
+
+
+def _pick(state, order, weight_missed):
+    """Take the next question id from the bag, optionally favouring missed ones."""
+    missed = state["missed"]
+    drawn = state["drawn"]  # ids still ahead in `order` that were already taken
+
+    if weight_missed and missed:
+        total = len(order) - state["pos"] - len(drawn) + MISSED_WEIGHT * len(missed)
+        roll = random.random() * total
+        if roll < MISSED_WEIGHT * len(missed):
+            qid = missed.pop(int(roll // MISSED_WEIGHT))
+            if qid in order[state["pos"]:] and qid not in drawn:
+                drawn.append(qid)
+            return qid
+
+    while state["pos"] < len(order):
+        qid = order[state["pos"]]
+        state["pos"] += 1
+        if qid in drawn:
+            drawn.remove(qid)
+            continue
+        return qid
+    return None
+
+
+def draw(supabase, bags, level, language, fight=None, missed=None, weight_missed=True):
+    """
+    Draw one block-challenge question for `level`.
+
+    `bags` is a mutable dict (normally session["block_bags"]) holding the per-level
+    shuffle-bag state. `fight` identifies the current fight; a new value starts
+    a fresh bag and drops the old fight's bags. `missed` is the id of a question
+    the player just got wrong.
+    Returns a compact record or None when there are no questions at all.
+    """
+    if language not in LANGUAGES:
+        language = "english"
+    columns = "id, english, type" if language == "english" else f"id, english, {language}, type"
+
+    for _ in range(MAX_REDRAWS + 1):
+        qid = _next_id(supabase, bags, level, fight, missed, weight_missed)
+        if qid is None:
+            return None
+        result = supabase.table("questionanswer") \
+            .select(columns) \
+            .eq("id", qid) \
+            .maybe_single() \
+            .execute()
+        row = result.data if result else None
+        if row:
+            break
+        # Row was deleted since the pool was cached: reload it and draw again
+        invalidate(level)
+        missed = None
+    else:
+        return None
+
+    text = row.get(language) or row.get("english", "")
+    return {
+        "id": row["id"],
+        "question": text,
+        "answer": text,
+        "english_answer": row.get("english", ""),
+        "type": row.get("type", "speak"),
+    }
+
+
+def _next_id(supabase, bags, level, fight, missed, weight_missed):
+    """Draw the next question id from the fight's bag for `level`; None when there are no questions."""
+    key = str(level)
+    pool = get_pool(supabase, level)
+    if not pool:
+        # Fallback to any question, but still randomised instead of always row #1
+        key = ANY_LEVEL
+        pool = get_pool(supabase, ANY_LEVEL)
+    if not pool:
+        return None
+
+    for other in [k for k, bag in bags.items() if bag.get("fight") != fight]:
+        del bags[other]
+    state = bags.get(key)
+    if not state or "seed" not in state:
+        state = _new_bag(fight)
+
+    if missed is not None and missed in pool and missed not in state["missed"]:
+        state["missed"] = (state["missed"] + [missed])[-MAX_MISSED:]
+
+    qid = _pick(state, _order(key, pool, state["seed"]), weight_missed)
+    if qid is None:
+        # Bag is empty: every question was used once this fight, so refill it
+        state.update(seed=random.getrandbits(32), pos=0, drawn=[])
+        qid = _pick(state, _order(key, pool, state["seed"]), weight_missed)
+
+    bags[key] = state
+    return qid
@@ -0,0 +1,83 @@
+import threading
+
+# 🪙 Reward schedules for levels and bosses
+#
+# Every reward is a pure function of the level / boss number, so we precompute
+# them once per worker instead of recomputing powers or reading a per-user
+# history blob:
+#
+#   level L (first clear)  = round(10 * 1.15^(L-1))
+#   level L (repeat)       = round(10 * 1.15^(L-1) * 0.5)
+#   boss 1 coins / EXP     = 200 / 300
+#   boss n coins / EXP     = round(previous boss * 1.3)
+
+LEVEL_BASE_REWARD = 10
+LEVEL_REWARD_GROWTH = 1.15
+REPEAT_PENALTY = 0.5
+
+BOSS_BASE_COINS = 200
+BOSS_BASE_EXP = 300            # boss level * 100 * 3
+BOSS_REWARD_GROWTH = 1.3
+
+INITIAL_LEVELS = 500
+INITIAL_BOSSES = 50
+
+# Index 0 is unused so the lists can be indexed by level / boss directly
+_level_rewards = [0]
+_repeat_rewards = [0]
+_boss_coins = [0]
+_boss_exp = [0]
+_tables_lock = threading.Lock()
+
+
+def _extend_levels(max_level):
+    with _tables_lock:
+        while len(_level_rewards) <= max_level:
+            level = len(_level_rewards)
+            reward = LEVEL_BASE_REWARD * (LEVEL_REWARD_GROWTH ** (level - 1))
+            _level_rewards.append(int(round(reward)))
+            _repeat_rewards.append(int(round(reward * REPEAT_PENALTY)))
+
+
+def _extend_bosses(max_boss):
+    with _tables_lock:
+        while len(_boss_coins) <= max_boss:
+            boss = len(_boss_coins)
+            if boss == 1:
+                _boss_coins.append(BOSS_BASE_COINS)
+                _boss_exp.append(BOSS_BASE_EXP)
+            else:
+                _boss_coins.append(int(round(_boss_coins[boss - 1] * BOSS_REWARD_GROWTH)))
+                _boss_exp.append(int(round(_boss_exp[boss - 1] * BOSS_REWARD_GROWTH)))
+
+
+_extend_levels(INITIAL_LEVELS)
+_extend_bosses(INITIAL_BOSSES)
+
+
+def level_reward(level, is_repeat=False):
+    """Coins for clearing `level` (half for a repeat)."""
+    if level < 1:
+        reward = LEVEL_BASE_REWARD * (LEVEL_REWARD_GROWTH ** (level - 1))
+        return int(round(reward * REPEAT_PENALTY if is_repeat else reward))
+    if level >= len(_level_rewards):
+        _extend_levels(level * 2)
+    return _repeat_rewards[level] if is_repeat else _level_rewards[level]
+
+
+def boss_coins(boss):
+    """Coins for beating boss number `boss` (0 for anything below boss 1)."""
+    if boss < 1:
+        return 0
+    if boss >= len(_boss_coins):
+        _extend_bosses(boss * 2)
+    return _boss_coins[boss]
+
+
+def boss_exp(boss):
+    """EXP for beating boss number `boss` (0 for anything below boss 1)."""
+    if boss < 1:
+        return 0
+    if boss >= len(_boss_exp):
+        _extend_bosses(boss * 2)
+    return _boss_exp[boss]
@@ -0,0 +1,140 @@
+import argparse
+import hashlib
+import json
+import random
+import uuid
+from datetime import datetime, timedelta, timezone
+
+# 🌱 Synthetic dataset for benchmarks and load tests
+#
+#   python seed_data.py --users 2000 --levels 300 > seed.json
+#   python fake_supabase.py --seed seed.json
+#
+# or generate(...) in-process and hand it to fake_supabase.FakeSupabase. The
+# same arguments always produce the same dataset, so runs on different commits
+# are comparable. Column names follow what the routes read; there's no schema.
+
+LESSONS = ["tagalog", "waray", "cebuano"]
+LANGUAGES = ["english"] + LESSONS
+QUESTION_TYPES = ["fillblank-t", "choice-t2p", "choice-p2t", "audio-choice", "audio-input"]
+ITEMS_PER_LEVEL = 10
+# Every seeded user logs in with this (cheap hash, it's test data)
+PASSWORD = "password"
+_PASSWORD_HASH = "pbkdf2:sha256:1000$seed$" + hashlib.pbkdf2_hmac("sha256", PASSWORD.encode(), b"seed", 1000).hex()
+LEVELS_PER_BOSS = 10
+
+# Made-up syllables per language, enough for distinct words and phrases
+_SYLLABLES = {
+    "english": ["ba", "ter", "lo", "mi", "sen", "do", "ra", "kin", "po", "val"],
+    "tagalog": ["ka", "ma", "ga", "ng", "sa", "la", "ta", "pa", "ya", "na"],
+    "waray": ["hi", "ru", "ba", "ay", "ma", "ka", "ni", "ot", "la", "gi"],
+    "cebuano": ["ku", "ta", "ba", "ug", "si", "ay", "mo", "na", "ha", "li"],
+}
+
+POTIONS = [
+    {"id": 1, "name": "Health Potion", "price": 30, "image": "health.png", "effect_type": "hp", "effect_value": 30},
+    {"id": 2, "name": "Energy Potion", "price": 40, "image": "energy.png", "effect_type": "energy", "effect_value": 50},
+    {"id": 3, "name": "Power Potion", "price": 50, "image": "power.png", "effect_type": "damageBoost", "effect_value": 30},
+    {"id": 4, "name": "Time Potion", "price": 60, "image": "time.png", "effect_type": "timeSlow", "effect_duration": 5},
+]
+
+
+def _word(rng, language):
+    return "".join(rng.choice(_SYLLABLES[language]) for _ in range(rng.randint(2, 3)))
+
+
+def _phrase(rng, language, words):
+    return " ".join(_word(rng, language) for _ in range(words))
+
+
+def _entry(rng, words):
+    """The same phrase in every language."""
+    return {language: _phrase(rng, language, words) for language in LANGUAGES}
+
+
+def generate(users=2000, levels=300, avatars=20, seed=42):
+    """Return {"tables": {...}, "storage": {...}} for fake_supabase."""
+    rng = random.Random(seed)
+    now = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    bosses = max(1, levels // LEVELS_PER_BOSS)
+
+    questions, distractors = [], []
+    for level in range(1, levels + 1):
+        for itemnum in range(1, ITEMS_PER_LEVEL + 1):
+            words = rng.randint(3, 6)
+            questions.append({
+                "id": len(questions) + 1, "level": level, "itemnum": itemnum,
+                "type": QUESTION_TYPES[(itemnum - 1) % len(QUESTION_TYPES)], **_entry(rng, words)
+            })
+            distractors.append({"id": len(distractors) + 1, "level": level, "itemnum": itemnum, **_entry(rng, words)})
+
+    boss_levels = [
+        {"id": (boss - 1) * ITEMS_PER_LEVEL + itemnum, "boss": boss, "itemnum": itemnum,
+         "type": "speak", **_entry(rng, rng.randint(1, 3))}
+        for boss in range(1, bosses + 1) for itemnum in range(1, ITEMS_PER_LEVEL + 1)
+    ]
+
+    avatar_rows = [
+        {"id": i, "name": f"Avatar {i}", "price": 50 * i, "image": f"avatar{i}.png"}
+        for i in range(1, avatars + 1)
+    ]
+
+    user_rows, progress, user_items, user_avatars = [], [], [], []
+    for i in range(users):
+        user_id = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+        created = now - timedelta(days=rng.randint(0, 365))
+        user_rows.append({
+            "id": user_id, "username": f"user{i}", "email": f"user{i}@example.com",
+            "password": _PASSWORD_HASH, "role": "admin" if i == 0 else "user",
+            "coins": rng.randint(0, 5000), "lives": rng.randint(0, 5), "life_regen_start": None,
+            "account_level": rng.randint(1, 40), "current_exp": rng.randint(0, 500),
+            "lesson_language": rng.choice(LESSONS), "preferred_language": rng.choice(["tagalog", "english"]),
+            "created_at": created.isoformat()
+        })
+        for lesson in LESSONS:
+            # Most players are early on, a few are far in
+            highest = int(levels * rng.random() ** 3) + 1
+            mastery = {
+                str(level): {"attempts": rng.randint(1, 4), "best_score": 100,
+                             "perfect_attempts": 1, "mastered": True}
+                for level in range(1, highest)
+            }
+            progress.append({
+                "user_id": user_id, "lesson": lesson, "highest_unlocked": highest,
+                "level_mastery": json.dumps(mastery)
+            })
+        for potion in rng.sample(POTIONS, rng.randint(0, len(POTIONS))):
+            user_items.append({"user_id": user_id, "item_id": potion["id"], "quantity": rng.randint(1, 5)})
+        for avatar_id in rng.sample(range(1, avatars + 1), rng.randint(0, 3)):
+            user_avatars.append({"user_id": user_id, "avatar_id": avatar_id})
+
+    tables = {
+        "users": user_rows, "user_progress": progress,
+        "questionanswer": questions, "distractor": distractors, "boss_levels": boss_levels,
+        "items": [dict(p) for p in POTIONS], "avatars": avatar_rows,
+        "user_items": user_items, "user_avatars": user_avatars,
+    }
+    storage = {"lessons": {}}
+    for lesson in LESSONS:
+        tables[f"{lesson}_lessons"] = [
+            {"id": level, "level": level, lesson: f"{lesson}_lvl{level}.txt"} for level in range(1, levels + 1)
+        ]
+        for level in range(1, levels + 1):
+            storage["lessons"][f"{lesson}_lvl{level}.txt"] = "\n".join(
+                _phrase(rng, lesson, 8) for _ in range(20)
+            )
+    return {"tables": tables, "storage": storage}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print a synthetic dataset as JSON for fake_supabase.py")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--levels", type=int, default=300)
+    parser.add_argument("--avatars", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    print(json.dumps(generate(args.users, args.levels, args.avatars, args.seed)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import os
+import threading
+
+from dotenv import load_dotenv
+from werkzeug.local import LocalProxy
+
+import metrics
+
+# 🔌 Shared external clients, created on first use
+#
+# Importing the app used to import google.generativeai, configure Gemini and
+# build four Supabase clients (one per module). Now there's one Supabase client
+# and one Gemini model per process, both created the first time something
+# actually uses them. Modules import the `supabase` / `model` proxies below and
+# call them exactly like the real objects.
+#
+# Both are instrumented for metrics.py: every Supabase / Storage HTTP request
+# and every Gemini call is counted and timed, tagged with the current route.
+#
+# After a fork (gunicorn --preload) the child drops the parent's clients and
+# makes its own, so no connection or gRPC channel is shared across processes.
+
+load_dotenv()
+
+SUPABASE_URL = os.getenv("SUPABASE_URL")
+SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
+# Point Gemini at another host over REST (e.g. fake_supabase.py for load tests)
+GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT")
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_supabase():
+    """The process-wide Supabase client."""
+    client = _clients.get("supabase")
+    if client is None:
+        with _clients_lock:
+            client = _clients.get("supabase")
+            if client is None:
+                if not SUPABASE_URL or not SUPABASE_KEY:
+                    raise ValueError("SUPABASE_URL and SUPABASE_KEY must be set in environment variables")
+                from supabase import create_client
+                client = create_client(SUPABASE_URL, SUPABASE_KEY)
+                metrics.instrument_httpx(client.postgrest.session, "supabase")
+                metrics.instrument_httpx(client.storage.session, "storage")
+                _clients["supabase"] = client
+    return client
+
+
+def reset_supabase():
+    """Throw the client away so the next use reconnects."""
+    with _clients_lock:
+        _clients.pop("supabase", None)
+    return get_supabase()
+
+
+def get_model():
+    """The process-wide Gemini model (google.generativeai is only imported here)."""
+    model = _clients.get("gemini")
+    if model is None:
+        with _clients_lock:
+            model = _clients.get("gemini")
+            if model is None:
+                import google.generativeai as genai
+                if GEMINI_API_ENDPOINT:
+                    genai.configure(api_key=GEMINI_API_KEY, transport="rest",
+                                    client_options={"api_endpoint": GEMINI_API_ENDPOINT})
+                else:
+                    genai.configure(api_key=GEMINI_API_KEY)
+                model = _clients["gemini"] = _TimedModel(genai.GenerativeModel(GEMINI_MODEL))
+    return model
+
+
+class _TimedModel:
+    """A GenerativeModel whose generate calls are counted in metrics.py."""
+
+    def __init__(self, model):
+        self._model = model
+
+    def generate_content(self, *args, **kwargs):
+        with metrics.upstream("gemini"):
+            return self._model.generate_content(*args, **kwargs)
+
+    async def generate_content_async(self, *args, **kwargs):
+        with metrics.upstream("gemini"):
+            return await self._model.generate_content_async(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._model, name)
+
+
+def _after_fork_in_child():
+    global _clients_lock
+    _clients_lock = threading.Lock()
+    _clients.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+supabase = LocalProxy(get_supabase)
+model = LocalProxy(get_model)
@@ -1,35 +1,27 @@
 from flask import Blueprint, render_template, request, jsonify, Response, session
 import json
 import time
-from supabase import create_client, Client
-from dotenv import load_dotenv
 import os
-# Load .env file
-load_dotenv()
+import question_sampler
+import inventory_service
+import ownership
+import user_cache
+import catalog_cache
+import http_cache
+from services import supabase  # === Supabase: shared, created on first use ===
 speech_bp = Blueprint('speech', __name__)
 
-# === Supabase setup ===
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-
-if not SUPABASE_URL or not SUPABASE_KEY:
-    raise ValueError("SUPABASE_URL and SUPABASE_KEY must be set in environment variables")
-
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 
 # === ROUTES ===
 @speech_bp.route('/get_words')
+@http_cache.cache_control(http_cache.USER_STATE)
 def get_words():
     user_id = session.get("user_id")
     if not user_id:
         return jsonify({"error": "Not logged in"}), 401
 
     # 🔍 Get user's lesson language from the users table
-    user = supabase.table("users") \
-        .select("lesson_language") \
-        .eq("id", user_id) \
-        .single() \
-        .execute().data
+    user = user_cache.get_user(supabase, user_id, "lesson_language")
 
     if not user:
         return jsonify({"error": "User not found"}), 404
@@ -39,14 +31,15 @@ def get_words():
     # 🔢 Get boss level number from query params (e.g., ?level=1)
     level = int(request.args.get('level', 1))
 
-    # 🧠 Query boss level table using the current lesson language
-    response = supabase.table('boss_levels') \
-        .select('*') \
-        .eq('boss', level) \
-        .order('itemnum') \
-        .execute()
+    # 🧠 Query boss level table (the same for everyone, memoized per boss, see catalog_cache.py)
+    def load_rows():
+        return supabase.table('boss_levels') \
+            .select('*') \
+            .eq('boss', level) \
+            .order('itemnum') \
+            .execute().data
 
-    rows = response.data
+    rows = catalog_cache.get_content(f"boss_words:{level}", load_rows)
 
     if not rows:
         return jsonify({language: []})
@@ -145,29 +138,18 @@ def get_potions():
     if not user_id:
         return jsonify([])
 
-    # Get user's owned potions
-    user_items = supabase.table("user_items") \
-        .select("item_id, quantity") \
-        .eq("user_id", user_id) \
-        .execute().data
-
-    if not user_items:
-        return jsonify([])
-
-    item_ids = [item["item_id"] for item in user_items]
-
-    # Fetch item details
-    items_data = supabase.table("items") \
-        .select("id, description, filename") \
-        .in_("id", item_ids) \
-        .execute().data
-
-    # Merge quantities into items
-    item_map = {item["item_id"]: item["quantity"] for item in user_items}
-    for item in items_data:
-        item["quantity"] = item_map.get(item["id"], 0)
+    # Get user's owned potions (quantities merged with the cached items catalog)
+    potions = [
+        {
+            "id": item["id"],
+            "description": item.get("description"),
+            "filename": item["filename"],
+            "quantity": item["quantity"]
+        }
+        for item in inventory_service.get_inventory(supabase, user_id)
+    ]
 
-    return jsonify(items_data)
+    return jsonify(potions)
 
 
 # === NEW: Get block challenge question ===
@@ -178,11 +160,7 @@ def get_block_question():
         return jsonify({"error": "Not logged in"}), 401
 
     # Get user's lesson language
-    user = supabase.table("users") \
-        .select("lesson_language") \
-        .eq("id", user_id) \
-        .single() \
-        .execute().data
+    user = user_cache.get_user(supabase, user_id, "lesson_language")
 
     if not user:
         return jsonify({"error": "User not found"}), 404
@@ -191,37 +169,19 @@ def get_block_question():
 
     # Get current boss level for question difficulty
     boss_level = request.args.get('level', 1, type=int)
-    
-    # Get a random question from the questionanswer table
-    # We'll get questions from the same level as the boss
-    response = supabase.table('questionanswer') \
-        .select('*') \
-        .eq('level', boss_level) \
-        .execute()
-
-    questions = response.data
-    if not questions:
-        # Fallback to any question if none found for this level
-        response = supabase.table('questionanswer') \
-            .select('*') \
-            .limit(1) \
-            .execute()
-        questions = response.data
+    fight = request.args.get('fight')
+    missed = request.args.get('missed', type=int)
+
+    # 🎲 Draw from this fight's shuffle-bag (no repeats until the level is used up)
+    bags = session.get("block_bags", {})
+    question = question_sampler.draw(supabase, bags, boss_level, language, fight=fight, missed=missed)
+    session["block_bags"] = bags
+    session.modified = True
 
-    if not questions:
+    if not question:
         return jsonify({"error": "No questions available"}), 404
 
-    # Select a random question
-    import random
-    question = random.choice(questions)
-    
-    # Return the question in the user's lesson language
-    return jsonify({
-        "question": question.get(language, question.get("english", "")),
-        "answer": question.get(language, question.get("english", "")),  # Use same language as question
-        "english_answer": question.get("english", ""),  # Keep English for reference
-        "type": question.get("type", "speak")
-    })
+    return jsonify(question)
 
 
 # === NEW: Use a potion ===
@@ -231,48 +191,19 @@ def use_potion(item_id):
     if not user_id:
         return jsonify({"success": False, "message": "Not logged in"})
 
-    # Check if the user has this potion
-    result = supabase.table("user_items") \
-        .select("id, quantity") \
-        .eq("user_id", user_id) \
-        .eq("item_id", item_id) \
-        .single() \
-        .execute()
-
-    entry = result.data
-
-    if not entry or entry["quantity"] < 1:
+    # === Take one potion in a single round trip (atomic, safe against double-taps) ===
+    remaining = inventory_service.consume_item(supabase, user_id, item_id)
+    if remaining is None:
         return jsonify({"success": False, "message": "You don't have this potion."})
+    if remaining == 0:
+        ownership.discard_owned("items", item_id)
 
-    # === Apply Potion Effect ===
-    effect = {}
-    if item_id == 1:
-        # HP potion: heal 30% of max HP
-        effect = {"type": "hp", "value": 30}
-    elif item_id == 2:
-        # MP potion: restore 50% energy
-        effect = {"type": "energy", "value": 50}
-    elif item_id == 3:
-        # Damage Boost: increase damage by 20% (can be extended)
-        effect = {"type": "damageBoost", "value": 30}
-    elif item_id == 4:
-        # Time Slow: slow enemy for 5 seconds (can be extended)
-        effect = {"type": "timeSlow", "duration": 5}
-    else:
-        effect = {"type": "none"}
-
-    # === Update quantity in DB ===
-    new_qty = entry["quantity"] - 1
-    if new_qty <= 0:
-        supabase.table("user_items").delete().eq("id", entry["id"]).execute()
-    else:
-        supabase.table("user_items").update({"quantity": new_qty}).eq("id", entry["id"]).execute()
+    # === Apply Potion Effect (from the cached items catalog) ===
+    effect = inventory_service.get_potion_effect(supabase, item_id)
 
     return jsonify({
         "success": True,
         "message": "Potion used!",
         "effect": effect,
-        "remaining": new_qty
+        "remaining": remaining
     })
-
-
@@ -0,0 +1,38 @@
+-- 🪣 Batched coin grants from write_buffer.py
+-- Run once in the Supabase SQL editor.
+
+-- Every batch a worker has applied, so a batch replayed from a journal after a
+-- crash is only counted once
+create table if not exists coin_batches (
+    batch_id   uuid primary key,
+    user_id    uuid not null,
+    coins      integer not null,
+    applied_at timestamptz not null default now()
+);
+
+-- Atomically add a batch of coins to a user and return the new balance.
+-- A batch id that was already applied changes nothing.
+create or replace function apply_coin_batch(p_batch_id uuid, p_user_id uuid, p_coins integer)
+returns integer
+language plpgsql
+as $$
+declare
+    new_balance integer;
+begin
+    insert into coin_batches (batch_id, user_id, coins)
+    values (p_batch_id, p_user_id, p_coins)
+    on conflict (batch_id) do nothing;
+
+    if not found then
+        select coins into new_balance from users where id = p_user_id;
+        return new_balance;
+    end if;
+
+    update users
+       set coins = coalesce(coins, 0) + p_coins
+     where id = p_user_id
+    returning coins into new_balance;
+
+    return new_balance;
+end;
+$$;
@@ -0,0 +1,43 @@
+-- 🧪 Potion effects + atomic potion consumption
+-- Run once in the Supabase SQL editor.
+
+-- Data-driven potion effects (read by inventory_service.get_potion_effect)
+alter table items add column if not exists effect_type text;
+alter table items add column if not exists effect_value integer;
+alter table items add column if not exists effect_duration integer;
+
+update items set effect_type = 'hp',          effect_value = 30 where id = 1 and effect_type is null;
+update items set effect_type = 'energy',      effect_value = 50 where id = 2 and effect_type is null;
+update items set effect_type = 'damageBoost', effect_value = 30 where id = 3 and effect_type is null;
+update items set effect_type = 'timeSlow', effect_duration = 5  where id = 4 and effect_type is null;
+
+-- Decrement one item only if the user still has it, and return what's left.
+-- Returns NULL when the user owns none, so double-taps can't go negative.
+create or replace function consume_user_item(p_user_id uuid, p_item_id integer)
+returns integer
+language plpgsql
+as $$
+declare
+    remaining integer;
+begin
+    update user_items
+       set quantity = quantity - 1
+     where user_id = p_user_id
+       and item_id = p_item_id
+       and quantity >= 1
+    returning quantity into remaining;
+
+    if remaining is null then
+        return null;
+    end if;
+
+    if remaining = 0 then
+        delete from user_items
+         where user_id = p_user_id
+           and item_id = p_item_id
+           and quantity = 0;
+    end if;
+
+    return remaining;
+end;
+$$;
@@ -0,0 +1,64 @@
+-- 🔁 Idempotency keys for reward / purchase POSTs (idempotency.py)
+-- Run once in the Supabase SQL editor.
+
+-- One row per (user, path, Idempotency-Key). The primary key lets exactly one
+-- request claim a key, whichever worker it lands on; status / mimetype / body
+-- stay null until that request has answered.
+create table if not exists idempotency_keys (
+    user_id     uuid not null,
+    path        text not null,
+    key         text not null,
+    fingerprint text not null,
+    status      integer,
+    mimetype    text,
+    body        text,
+    created_at  timestamptz not null default now(),
+    primary key (user_id, path, key)
+);
+
+-- Workers prune expired rows by age
+create index if not exists idempotency_keys_created_at on idempotency_keys (created_at);
+
+-- Claim a key, or return whoever has it, in one round trip. Returns NULL when
+-- the caller now owns the key, otherwise the existing row as JSON (answered
+-- or still running). An answer older than p_ttl_seconds, or a claim left
+-- unanswered for p_stale_seconds (its worker died), is deleted and the key
+-- claimed afresh.
+create or replace function claim_idempotency_key(
+    p_user_id uuid, p_path text, p_key text, p_fingerprint text,
+    p_ttl_seconds integer, p_stale_seconds integer
+)
+returns jsonb
+language plpgsql
+as $$
+declare
+    existing idempotency_keys;
+begin
+    loop
+        insert into idempotency_keys (user_id, path, key, fingerprint)
+        values (p_user_id, p_path, p_key, p_fingerprint)
+        on conflict (user_id, path, key) do nothing;
+
+        if found then
+            return null;
+        end if;
+
+        select * into existing
+          from idempotency_keys
+         where user_id = p_user_id and path = p_path and key = p_key;
+
+        if not found then
+            continue;  -- deleted between the insert and the select
+        end if;
+
+        if (existing.status is not null and existing.created_at > now() - make_interval(secs => p_ttl_seconds))
+           or (existing.status is null and existing.created_at > now() - make_interval(secs => p_stale_seconds)) then
+            return to_jsonb(existing);
+        end if;
+
+        delete from idempotency_keys
+         where user_id = p_user_id and path = p_path and key = p_key
+           and created_at = existing.created_at;
+    end loop;
+end;
+$$;
@@ -0,0 +1,17 @@
+-- 🏷️ Everything a user owns, for ownership.py
+-- Run once in the Supabase SQL editor.
+
+-- Owned avatar and item ids in one call, so a cold /shop makes one read for
+-- both instead of a select per table.
+create or replace function owned_ids(p_user_id uuid)
+returns jsonb
+language sql
+stable
+as $$
+    select jsonb_build_object(
+        'avatars', coalesce((select jsonb_agg(avatar_id order by avatar_id)
+                               from user_avatars where user_id = p_user_id), '[]'::jsonb),
+        'items',   coalesce((select jsonb_agg(item_id order by item_id)
+                               from user_items where user_id = p_user_id), '[]'::jsonb)
+    );
+$$;
@@ -0,0 +1,15 @@
+-- 🔢 Questions per level, for the admin user detail page
+-- Run once in the Supabase SQL editor.
+
+-- One row per level up to p_max_level. A plain select of every question's
+-- level would be cut off at PostgREST's max-rows (1000 by default).
+create or replace function question_counts_by_level(p_max_level integer)
+returns table (level integer, questions integer)
+language sql
+stable
+as $$
+    select level, count(*)::integer
+      from questionanswer
+     where level <= p_max_level
+     group by level;
+$$;
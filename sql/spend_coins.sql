@@ -0,0 +1,23 @@
+-- 💸 Atomic coin spending for the shop and life purchases
+-- Run once in the Supabase SQL editor.
+
+-- Take p_amount coins from a user only if they have that many, and return the
+-- new balance. Returns NULL when they can't afford it, so two purchases (or a
+-- purchase racing a coin batch from another worker) can't overwrite each
+-- other or go negative.
+create or replace function spend_coins(p_user_id uuid, p_amount integer)
+returns integer
+language plpgsql
+as $$
+declare
+    new_balance integer;
+begin
+    update users
+       set coins = coins - p_amount
+     where id = p_user_id
+       and coins >= p_amount
+    returning coins into new_balance;
+
+    return new_balance;
+end;
+$$;
@@ -4,18 +4,23 @@ const enemySprite = document.getElementById('enemy-sprite');
 
 let currentEnemyAnimation = '';
 let enemyAnimationTimeout = null;
-let enemyPreloadedImages = {};
+// Sprite GIFs fetched once as blobs; a fresh blob: URL of them restarts the
+// GIF without downloading it again (see player-animation.js)
+let enemyPreloadedBlobs = {};
+let enemySpriteObjectUrl = null;
 
 // Preload all enemy animations for smooth switching
 function preloadEnemyAnimations() {
   const animations = ['idle', 'attack', 'hurt', 'retreat'];
   
   animations.forEach(state => {
-    const path = `/static/sprites/enemy${state}.gif`;
-    if (!enemyPreloadedImages[path]) {
-      const img = new Image();
-      img.src = path;
-      enemyPreloadedImages[path] = img;
+    const path = spriteUrl(`enemy${state}.gif`);
+    if (!(path in enemyPreloadedBlobs)) {
+      enemyPreloadedBlobs[path] = null;
+      fetch(path)
+        .then(response => response.ok ? response.blob() : null)
+        .then(blob => { enemyPreloadedBlobs[path] = blob; })
+        .catch(() => {});
     }
   });
 }
@@ -28,28 +33,28 @@ function setEnemyAnimation(state) {
   currentEnemyAnimation = state;
 
   let path = '';
-  const cacheBuster = `?_=${Date.now()}`;
   switch (state) {
     case 'idle':
-      path = '/static/sprites/enemyidle.gif' + cacheBuster;
+      path = spriteUrl('enemyidle.gif');
       break;
     case 'attack':
-      path = '/static/sprites/enemyattack.gif' + cacheBuster;
+      path = spriteUrl('enemyattack.gif');
       break;
     case 'hurt':
-      path = '/static/sprites/enemyhurt.gif' + cacheBuster;
+      path = spriteUrl('enemyhurt.gif');
       break;
     case 'retreat':
-      path = '/static/sprites/enemyretreat.gif' + cacheBuster;
+      path = spriteUrl('enemyretreat.gif');
       break;
     default:
-      path = '/static/sprites/enemyidle.gif' + cacheBuster;
+      path = spriteUrl('enemyidle.gif');
   }
 
-  // Only update if the path changes
-  if (enemySprite.style.backgroundImage !== `url("${path}")`) {
-    enemySprite.style.backgroundImage = `url("${path}")`;
-  }
+  // A new object URL restarts the GIF; until its blob has loaded, use the sprite URL
+  const previousObjectUrl = enemySpriteObjectUrl;
+  enemySpriteObjectUrl = enemyPreloadedBlobs[path] ? URL.createObjectURL(enemyPreloadedBlobs[path]) : null;
+  enemySprite.style.backgroundImage = `url("${enemySpriteObjectUrl || path}")`;
+  if (previousObjectUrl) URL.revokeObjectURL(previousObjectUrl);
 
   // Remove opacity flicker
   enemySprite.style.opacity = '1';
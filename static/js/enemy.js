@@ -115,7 +115,8 @@ function enemyAttack() {
     fetch('/api/boss-reward-reduced', {
       method: 'POST',
       headers: {
-        'Content-Type': 'application/json'
+        'Content-Type': 'application/json',
+        'Idempotency-Key': battleRewardKey
       },
       body: JSON.stringify({
         boss: bossNum,
@@ -130,7 +131,8 @@ function enemyAttack() {
     fetch('/api/boss-exp-reward-reduced', {
       method: 'POST',
       headers: {
-        'Content-Type': 'application/json'
+        'Content-Type': 'application/json',
+        'Idempotency-Key': battleRewardKey
       },
       body: JSON.stringify({
         boss: bossNum,
@@ -1,5 +1,10 @@
 // general.js
 
+// 🔁 One idempotency key per battle, so a retried reward call can't pay twice
+const battleRewardKey = (window.crypto && crypto.randomUUID)
+  ? crypto.randomUUID()
+  : `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+
 // Queue for typewriter effects to prevent overlapping
 let typewriterQueue = [];
 let isTypewriterRunning = false;
@@ -244,6 +249,7 @@ function checkAnswer() {
       showShieldBarrier();
     } else {
       player.energy = Math.floor(player.energy / 2);
+      missedBlockQuestionId = blockChallengeId; // 🎲 Ask the sampler to bring it back sooner
       setMessageWithTypewriter(`❌ Block failed! You typed "${cleanUserAnswer}" but expected "${cleanBlockAnswer}". Energy reduced by 50%.`);
     }
 
@@ -326,7 +332,8 @@ if (enemy.hp <= 0) {
     fetch('/api/boss-reward', {
       method: 'POST',
       headers: {
-        'Content-Type': 'application/json'
+        'Content-Type': 'application/json',
+        'Idempotency-Key': battleRewardKey
       },
       body: JSON.stringify({
         boss: bossNum,
@@ -338,7 +345,8 @@ if (enemy.hp <= 0) {
     fetch('/api/boss-exp-reward', {
       method: 'POST',
       headers: {
-        'Content-Type': 'application/json'
+        'Content-Type': 'application/json',
+        'Idempotency-Key': battleRewardKey
       },
       body: JSON.stringify({
         boss: bossNum,
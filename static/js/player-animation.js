@@ -2,7 +2,11 @@ const playerSprite = document.getElementById('player-sprite');
 
 let currentPlayerAnimation = '';
 let animationTimeout = null;
-let preloadedImages = {};
+// Sprite GIFs fetched once as blobs. Each animation switch shows a fresh
+// blob: URL of the same bytes, which restarts the GIF from its first frame
+// without asking the server again (the sprite URLs are cached as immutable).
+let preloadedBlobs = {};
+let playerSpriteObjectUrl = null;
 
 // Helper to map language to animation suffix
 function getLanguageSuffix() {
@@ -20,11 +24,13 @@ function preloadPlayerAnimations() {
   const animations = ['idle', 'attack', 'hurt', 'retreat'];
   
   animations.forEach(state => {
-    const path = `/static/sprites/mc${state}${langSuffix}.gif`;
-    if (!preloadedImages[path]) {
-      const img = new Image();
-      img.src = path;
-      preloadedImages[path] = img;
+    const path = spriteUrl(`mc${state}${langSuffix}.gif`);
+    if (!(path in preloadedBlobs)) {
+      preloadedBlobs[path] = null;
+      fetch(path)
+        .then(response => response.ok ? response.blob() : null)
+        .then(blob => { preloadedBlobs[path] = blob; })
+        .catch(() => {});
     }
   });
 }
@@ -37,30 +43,30 @@ function setPlayerAnimation(state) {
 
   const langSuffix = getLanguageSuffix();
   let path = '';
-  const cacheBuster = `?_=${Date.now()}`;
 
   switch (state) {
     case 'idle':
-      path = `/static/sprites/mcidle${langSuffix}.gif` + cacheBuster;
+      path = spriteUrl(`mcidle${langSuffix}.gif`);
       break;
     case 'attack':
-      path = `/static/sprites/mcattack${langSuffix}.gif` + cacheBuster;
+      path = spriteUrl(`mcattack${langSuffix}.gif`);
       fireSwordSlash();
       break;
     case 'hurt':
-      path = `/static/sprites/mchurt${langSuffix}.gif` + cacheBuster;
+      path = spriteUrl(`mchurt${langSuffix}.gif`);
       break;
     case 'retreat':
-      path = `/static/sprites/mcretreat${langSuffix}.gif` + cacheBuster;
+      path = spriteUrl(`mcretreat${langSuffix}.gif`);
       break;
     default:
-      path = `/static/sprites/mcidle${langSuffix}.gif` + cacheBuster;
+      path = spriteUrl(`mcidle${langSuffix}.gif`);
   }
 
-  // Only update if the path changes
-  if (playerSprite.style.backgroundImage !== `url("${path}")`) {
-    playerSprite.style.backgroundImage = `url("${path}")`;
-  }
+  // A new object URL restarts the GIF; until its blob has loaded, use the sprite URL
+  const previousObjectUrl = playerSpriteObjectUrl;
+  playerSpriteObjectUrl = preloadedBlobs[path] ? URL.createObjectURL(preloadedBlobs[path]) : null;
+  playerSprite.style.backgroundImage = `url("${playerSpriteObjectUrl || path}")`;
+  if (previousObjectUrl) URL.revokeObjectURL(previousObjectUrl);
 
   // Remove opacity flicker
   playerSprite.style.opacity = '1';
@@ -9,6 +9,11 @@ const player = {
   isBoosted: false // ✅ NEW
 };
 
+// 🎲 Block challenge shuffle-bag: one id per fight, plus the last question we missed
+const blockFightId = Date.now().toString(36) + Math.random().toString(36).slice(2, 6);
+let blockChallengeId = null;
+let missedBlockQuestionId = null;
+
 
 function updatePlayerBar() {
   const heroBar = document.getElementById('hero-bar');
@@ -54,7 +59,12 @@ async function setBlockChallengeWord() {
   const boss = getQueryParam("boss") || 1;
   
   try {
-    const response = await fetch(`/get_block_question?level=${boss}`);
+    let url = `/get_block_question?level=${boss}&fight=${blockFightId}`;
+    if (missedBlockQuestionId !== null) {
+      url += `&missed=${missedBlockQuestionId}`;
+      missedBlockQuestionId = null;
+    }
+    const response = await fetch(url);
     const data = await response.json();
     
     if (data.error) {
@@ -64,6 +74,7 @@ async function setBlockChallengeWord() {
     }
     
     // Store the question and answer
+    blockChallengeId = data.id;
     blockChallengeQuestion = data.question;
     blockChallengeAnswer = data.answer; // This is now in the user's lesson language
     
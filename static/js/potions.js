@@ -18,7 +18,7 @@ function loadPotions() {
         if (potion.quantity <= 0) {
           div.classList.add("potion-disabled");
         } else {
-          div.onclick = () => usePotion(potion.id);
+          div.onclick = () => usePotion(potion.id, div);
         }
 
         div.innerHTML = `
@@ -36,7 +36,7 @@ function loadPotions() {
 
 
 
-function usePotion(itemId) {
+function usePotion(itemId, div) {
   fetch('/use-potion/' + itemId, {
     method: 'POST'
   })
@@ -44,11 +44,23 @@ function usePotion(itemId) {
   .then(data => {
     if (data.success) {
       applyPotionEffect(data.effect);
-      loadPotions();
+      updatePotionQuantity(div, data.remaining); // ✅ No need to reload the whole list
     }
   });
 }
 
+function updatePotionQuantity(div, remaining) {
+  if (!div) {
+    loadPotions();
+    return;
+  }
+  div.querySelector('.potion-qty').textContent = remaining;
+  if (remaining <= 0) {
+    div.classList.add("potion-disabled");
+    div.onclick = null;
+  }
+}
+
 function applyPotionEffect(effect) {
   if (!effect || !effect.type) return;
 
@@ -0,0 +1,384 @@
+import argparse
+import hashlib
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+import http_cache
+
+# 🖼️ Static asset pipeline: smaller formats, content-hashed names, cached forever
+#
+#   python static_assets.py build            (on deploy, before the app starts)
+#   python static_assets.py build --strict   (fail instead of skipping a converter)
+#
+# Needs Pillow (in requirements.txt) and the ffmpeg binary with libopus, which
+# pip can't install: apt-get install ffmpeg, brew install ffmpeg... A build
+# missing either still runs, prints a warning banner to stderr at the start
+# and the end, and only hashes the files it couldn't convert.
+#
+# Transcodes the heavy game assets in static/ into static/dist/:
+#
+#   sprites/*.gif    animated WebP                          (Pillow)
+#   img/*.png        WebP and AVIF at each of ASSET_WIDTHS  (Pillow; AVIF needs
+#                    a Pillow with AVIF support or pillow-avif-plugin)
+#   sounds/*.mp3     Opus in Ogg                            (ffmpeg with libopus)
+#
+# Every output, and a copy of every original, has a hash of its bytes in its
+# name (mcidle1.3f9a0c12de.webp) and is listed in static/dist/manifest.json.
+# Changing a source changes the name, so /static/dist/ is served with
+# http_cache.IMMUTABLE and browsers never ask about those files again.
+#
+# A conversion that isn't smaller than the original is dropped, and so is one
+# whose encoder isn't installed: the hashed original is served instead, still
+# cached forever. Sources that haven't changed since the last build are not
+# converted again, and the previous build's files are kept so pages rendered
+# by still-running old workers keep loading during a deploy.
+#
+# Templates ask for assets by their path under static/:
+#
+#   {{ asset_url('sprites/shield.gif') }}            smallest file any browser shows
+#   {{ asset_image_set('img/Andresbackground.png', 960) }}
+#                                                    CSS image-set(): AVIF, WebP,
+#                                                    PNG at most 960px wide
+#   {{ asset_audio_sources('sounds/heal.mp3') }}     <source> tags: Opus, then MP3
+#   {{ asset_urls('sprites/') | tojson }}            {path: url} for scripts
+#
+# Without a build (development) every helper falls back to the file in static/.
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+DIST = "dist"
+MANIFEST = "manifest.json"
+
+ASSET_WIDTHS = [int(w) for w in os.getenv("ASSET_WIDTHS", "640,960,1280,1920").split(",")]
+ASSET_WEBP_QUALITY = int(os.getenv("ASSET_WEBP_QUALITY", "80"))
+ASSET_AVIF_QUALITY = int(os.getenv("ASSET_AVIF_QUALITY", "60"))
+ASSET_OPUS_BITRATE = os.getenv("ASSET_OPUS_BITRATE", "48k")
+HASH_LENGTH = 10
+
+# source folder -> (source extension, what it's converted to)
+SOURCES = {
+    "sprites": (".gif", "animated webp"),
+    "img": (".png", "webp / avif"),
+    "sounds": (".mp3", "opus"),
+}
+
+TYPES = {
+    ".gif": "image/gif", ".png": "image/png", ".webp": "image/webp", ".avif": "image/avif",
+    ".mp3": "audio/mpeg", ".ogg": 'audio/ogg; codecs="opus"',
+}
+# Formats every supported browser shows, for plain url() / <img src> / scripts
+_UNIVERSAL = {"image/gif", "image/png", "image/webp", "audio/mpeg"}
+# Most preferred first, for <source> lists and image-set()
+_PREFERENCE = ["image/avif", "image/webp", "image/gif", "image/png", 'audio/ogg; codecs="opus"', "audio/mpeg"]
+
+_manifest = {}
+
+
+# === Build ===
+
+def _settings_key():
+    # Part of each source's hash, so changing a setting rebuilds everything
+    return f"{ASSET_WIDTHS}|{ASSET_WEBP_QUALITY}|{ASSET_AVIF_QUALITY}|{ASSET_OPUS_BITRATE}".encode()
+
+
+def _write_hashed(static_dir, name, data):
+    """Write `data` as dist/<name> with its hash in the name; returns the path under static/."""
+    stem, ext = os.path.splitext(name)
+    rel = f"{DIST}/{stem}.{hashlib.sha256(data).hexdigest()[:HASH_LENGTH]}{ext}"
+    path = os.path.join(static_dir, rel)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".tmp", "wb") as f:
+            f.write(data)
+        os.replace(path + ".tmp", path)
+    return rel
+
+
+def _pillow():
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    try:
+        import pillow_avif  # noqa: F401  registers AVIF on Pillow without built-in support
+    except ImportError:
+        pass
+    Image.init()
+    return Image
+
+
+def _save(image, fmt, **options):
+    out = io.BytesIO()
+    image.save(out, fmt, **options)
+    return out.getvalue()
+
+
+def _animated_webp(Image, path):
+    from PIL import ImageSequence
+    with Image.open(path) as gif:
+        frames, durations = [], []
+        for frame in ImageSequence.Iterator(gif):
+            frames.append(frame.convert("RGBA"))
+            durations.append(frame.info.get("duration", gif.info.get("duration", 100)))
+        return _save(
+            frames[0], "WEBP", save_all=True, append_images=frames[1:], duration=durations,
+            loop=gif.info.get("loop", 0), quality=ASSET_WEBP_QUALITY, method=6, allow_mixed=True
+        )
+
+
+def _resized(Image, source):
+    """(width, image) for each of ASSET_WIDTHS narrower than `source`, then `source` itself."""
+    for width in sorted(w for w in ASSET_WIDTHS if w < source.width):
+        yield width, source.resize((width, round(source.height * width / source.width)), Image.LANCZOS)
+    yield source.width, source
+
+
+def _opus(path):
+    if shutil.which("ffmpeg") is None:
+        return None
+    result = subprocess.run(
+        ["ffmpeg", "-v", "error", "-i", path, "-vn", "-c:a", "libopus", "-b:a", ASSET_OPUS_BITRATE, "-f", "ogg", "pipe:1"],
+        capture_output=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.decode(errors="replace").strip())
+    return result.stdout
+
+
+def _original(static_dir, folder, filename):
+    """The hashed copy of a source, as its only variant."""
+    with open(os.path.join(static_dir, folder, filename), "rb") as f:
+        original = f.read()
+    variant = {"url": _write_hashed(static_dir, f"{folder}/{filename}", original),
+               "type": TYPES[os.path.splitext(filename)[1]], "width": None}
+    return [variant], len(original)
+
+
+def _convert(static_dir, folder, filename, Image):
+    """Variants for one source, original included: [{"url", "type", "width"}]."""
+    path = os.path.join(static_dir, folder, filename)
+    stem, ext = os.path.splitext(filename)
+    variants, original_size = _original(static_dir, folder, filename)
+    candidates = []  # (name, bytes, width)
+
+    if folder == "sounds":
+        candidates.append((f"{folder}/{stem}.ogg", _opus(path), None))
+    elif Image is not None and ext == ".gif":
+        candidates.append((f"{folder}/{stem}.webp", _animated_webp(Image, path), None))
+    elif Image is not None:
+        with Image.open(path) as source:
+            source.load()
+        variants[0]["width"] = source.width
+        for width, image in _resized(Image, source):
+            suffix = "" if width == source.width else f"-{width}w"
+            if "WEBP" in Image.SAVE:
+                candidates.append((f"{folder}/{stem}{suffix}.webp", _save(image, "WEBP", quality=ASSET_WEBP_QUALITY, method=6), width))
+            if "AVIF" in Image.SAVE:
+                candidates.append((f"{folder}/{stem}{suffix}.avif", _save(image, "AVIF", quality=ASSET_AVIF_QUALITY), width))
+
+    for name, data, width in candidates:
+        # A full-size conversion only earns its place by being smaller
+        if data is None or (width == variants[0]["width"] and len(data) >= original_size):
+            continue
+        variants.append({"url": _write_hashed(static_dir, name, data), "type": TYPES[os.path.splitext(name)[1]], "width": width})
+    return variants
+
+
+def _best_url(variants, static_dir):
+    """The smallest full-size variant in a format every browser shows."""
+    full_width = max((v["width"] or 0) for v in variants) or None
+    usable = [v for v in variants if v["type"] in _UNIVERSAL and v["width"] == full_width]
+    return min(usable, key=lambda v: os.path.getsize(os.path.join(static_dir, v["url"])))["url"]
+
+
+def missing_converters(Image):
+    """What this build can't convert, one line each; empty when everything is installed."""
+    missing = []
+    if Image is None:
+        missing.append("Pillow isn't installed (pip install -r requirements.txt): "
+                       "sprites/*.gif and img/*.png are only hashed, not converted")
+    elif "AVIF" not in Image.SAVE:
+        missing.append("this Pillow can't write AVIF (pip install pillow-avif-plugin): img/*.png gets WebP only")
+    if shutil.which("ffmpeg") is None:
+        missing.append("ffmpeg isn't on PATH (apt-get install ffmpeg): sounds/*.mp3 are only hashed, not converted")
+    return missing
+
+
+def _warn_missing(missing):
+    if not missing:
+        return
+    bar = "=" * 78
+    print(bar, file=sys.stderr)
+    for line in missing:
+        print(f"⚠️  {line}", file=sys.stderr)
+    print(bar, file=sys.stderr)
+
+
+def build(static_dir=STATIC_DIR, force=False, strict=False):
+    """Convert and hash every source asset, write the manifest; returns it.
+
+    With `strict`, raises RuntimeError instead of building without a converter.
+    """
+    manifest_path = os.path.join(static_dir, DIST, MANIFEST)
+    try:
+        with open(manifest_path) as f:
+            previous = json.load(f)
+    except (OSError, ValueError):
+        previous = {}
+
+    Image = _pillow()
+    missing = missing_converters(Image)
+    _warn_missing(missing)
+    if missing and strict:
+        raise RuntimeError("static asset converters missing: " + "; ".join(missing))
+
+    manifest = {}
+    for folder, (ext, target) in SOURCES.items():
+        source_dir = os.path.join(static_dir, folder)
+        if not os.path.isdir(source_dir):
+            continue
+        for filename in sorted(os.listdir(source_dir)):
+            if not filename.lower().endswith(ext):
+                continue
+            key = f"{folder}/{filename}"
+            with open(os.path.join(source_dir, filename), "rb") as f:
+                source_hash = hashlib.sha256(f.read() + _settings_key()).hexdigest()
+            old = previous.get(key)
+            if (not force and old and old["source_hash"] == source_hash
+                    and all(os.path.exists(os.path.join(static_dir, v["url"])) for v in old["variants"])):
+                manifest[key] = old
+                continue
+            try:
+                variants = _convert(static_dir, folder, filename, Image)
+            except Exception as e:
+                print(f"⚠️ {key}: {target} conversion failed ({e}); serving the original")
+                variants = _original(static_dir, folder, filename)[0]
+            variants.sort(key=lambda v: (_PREFERENCE.index(v["type"]), v["width"] or 0))
+            manifest[key] = {"source_hash": source_hash, "url": _best_url(variants, static_dir), "variants": variants}
+            before = os.path.getsize(os.path.join(source_dir, filename))
+            after = os.path.getsize(os.path.join(static_dir, manifest[key]["url"]))
+            print(f"{key:<34} {before / 1024:>8.1f} KiB → {after / 1024:>8.1f} KiB  ({len(variants)} files)")
+
+    os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+    with open(manifest_path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(manifest_path + ".tmp", manifest_path)
+    _prune(static_dir, manifest, previous)
+    _warn_missing(missing)  # again, so it isn't lost above the per-file lines
+    return manifest
+
+
+def _prune(static_dir, manifest, previous):
+    """Delete built files neither this build nor the previous one refers to."""
+    keep = {v["url"] for entries in (manifest, previous) for entry in entries.values() for v in entry["variants"]}
+    dist_dir = os.path.join(static_dir, DIST)
+    for root, _, files in os.walk(dist_dir):
+        for filename in files:
+            rel = os.path.relpath(os.path.join(root, filename), static_dir).replace(os.sep, "/")
+            if filename != MANIFEST and rel not in keep:
+                os.remove(os.path.join(root, filename))
+
+
+# === Templates ===
+
+def load_manifest(static_dir=STATIC_DIR):
+    """(Re)read static/dist/manifest.json; an empty manifest when nothing has been built."""
+    try:
+        with open(os.path.join(static_dir, DIST, MANIFEST)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+    _manifest.clear()
+    _manifest.update(manifest)
+    return _manifest
+
+
+def _static_url(filename):
+    from flask import url_for
+    return url_for("static", filename=filename)
+
+
+def asset_url(path):
+    """URL of the smallest universally supported file for a static/ path."""
+    entry = _manifest.get(path)
+    return _static_url(entry["url"] if entry else path)
+
+
+def asset_urls(prefix):
+    """{path: asset_url(path)} for every asset under `prefix`, for handing to scripts."""
+    paths = [path for path in _manifest if path.startswith(prefix)]
+    if not paths:
+        folder = os.path.join(STATIC_DIR, prefix)
+        paths = [prefix + name for name in sorted(os.listdir(folder))] if os.path.isdir(folder) else []
+    return {path: asset_url(path) for path in paths}
+
+
+def asset_image_set(path, width=None):
+    """CSS image-set() of every format of an image, each the widest file up to `width` wide."""
+    from markupsafe import Markup
+    entry = _manifest.get(path)
+    if not entry:
+        return Markup('url("{}")').format(_static_url(path))
+    chosen = {}
+    for variant in entry["variants"]:  # narrowest first within each format
+        best = chosen.get(variant["type"])
+        fits = width is None or variant["width"] is None or variant["width"] <= width
+        if best is None or fits:
+            chosen[variant["type"]] = variant
+    options = Markup(", ").join(
+        Markup('url("{}") type("{}")').format(_static_url(v["url"]), v["type"])
+        for v in sorted(chosen.values(), key=lambda v: _PREFERENCE.index(v["type"]))
+    )
+    return Markup("image-set({})").format(options)
+
+
+def asset_audio_sources(path):
+    """<source> tags for an <audio> element, best format first."""
+    from markupsafe import Markup, escape
+    entry = _manifest.get(path)
+    variants = entry["variants"] if entry else [{"url": path, "type": TYPES[os.path.splitext(path)[1]]}]
+    return Markup("").join(
+        Markup('<source src="{}" type="{}">').format(_static_url(v["url"]), escape(v["type"])) for v in variants
+    )
+
+
+# === Flask ===
+
+def init_app(app):
+    """Load the manifest, add the template helpers and cache built files forever."""
+    from flask import request
+
+    load_manifest(app.static_folder)
+    app.add_template_global(asset_url)
+    app.add_template_global(asset_urls)
+    app.add_template_global(asset_image_set)
+    app.add_template_global(asset_audio_sources)
+
+    @app.after_request
+    def _cache_built_assets(response):
+        if (request.endpoint == "static" and response.status_code in (200, 206, 304)
+                and (request.view_args or {}).get("filename", "").startswith(DIST + "/")):
+            response.headers["Cache-Control"] = http_cache.IMMUTABLE
+        return response
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build static/dist/: converted, content-hashed game assets")
+    parser.add_argument("command", choices=["build"])
+    parser.add_argument("--force", action="store_true", help="convert every source again, changed or not")
+    parser.add_argument("--strict", action="store_true", help="fail when Pillow or ffmpeg is missing")
+    args = parser.parse_args()
+    try:
+        manifest = build(force=args.force, strict=args.strict)
+    except RuntimeError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    print(f"📄 {len(manifest)} assets in {os.path.join(STATIC_DIR, DIST, MANIFEST)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
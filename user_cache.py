@@ -0,0 +1,162 @@
+import threading
+import time
+
+from flask import g, has_app_context
+
+# 👤 User-row cache
+#
+# Most routes start by reading a few columns of the logged-in user's `users`
+# row, and one page load can hit several of them. Reads go through get_user():
+#
+#   1. per-request memo on flask.g, so a row is fetched at most once per request
+#   2. a short-TTL per-user cache shared by requests in this worker
+#
+# Inside fanout.run(), where `g` is off limits, use prefetch_user(): it only
+# fills (2), and the get_user() that follows on the request thread reads it.
+#
+# Writes go through update_user(), which writes through to both so the next
+# read sees the new values. Routes that do read-modify-write on coins/EXP pass
+# fresh=True to skip (2) and always start from the database value. Coin grants
+# don't write here at all, they go through write_buffer.py.
+
+USER_TTL_SECONDS = 10
+MAX_CACHED_USERS = 5000
+
+# Everything the app reads about a user except the password hash
+PROFILE_COLUMNS = (
+    "id, username, email, role, coins, lives, life_regen_start, account_level, "
+    "current_exp, preferred_language, lesson_language, profile_picture, created_at"
+)
+FORBIDDEN_COLUMNS = {"*", "password"}
+
+_rows = {}                  # user_id -> (row dict, fetched_at)
+_rows_lock = threading.Lock()
+
+
+def _parse_columns(columns):
+    wanted = []
+    for group in columns:
+        for column in group.split(","):
+            column = column.strip()
+            if not column:
+                continue
+            if column in FORBIDDEN_COLUMNS:
+                raise ValueError(f"user_cache never selects '{column}', list the columns you need")
+            if column not in wanted:
+                wanted.append(column)
+    return wanted
+
+
+def _request_rows():
+    if not has_app_context():
+        return {}
+    if "user_rows" not in g:
+        g.user_rows = {}
+    return g.user_rows
+
+
+def _cached_row(user_id):
+    with _rows_lock:
+        entry = _rows.get(user_id)
+    if entry and time.monotonic() - entry[1] < USER_TTL_SECONDS:
+        return dict(entry[0])
+    return None
+
+
+def _store(user_id, row):
+    with _rows_lock:
+        if len(_rows) >= MAX_CACHED_USERS and user_id not in _rows:
+            # Drop the oldest entry (dicts keep insertion order)
+            _rows.pop(next(iter(_rows)))
+        _rows[user_id] = (dict(row), time.monotonic())
+
+
+def get_user(supabase, user_id, *columns, fresh=False):
+    """
+    Return a dict with the requested `users` columns for `user_id`, or None.
+
+    `columns` are column names or comma-separated groups, e.g.
+    get_user(supabase, uid, "coins", "lives, life_regen_start").
+    """
+    wanted = _parse_columns(columns)
+    request_rows = _request_rows()
+
+    row = request_rows.get(user_id)
+    if row is None and not fresh:
+        row = _cached_row(user_id)
+
+    row = _complete(supabase, user_id, row, wanted)
+    if row is None:
+        return None
+
+    request_rows[user_id] = row
+    return {c: row.get(c) for c in wanted}
+
+
+def prefetch_user(supabase, user_id, *columns):
+    """Load columns into the worker cache without touching `g`, for fanout.run() callables."""
+    _complete(supabase, user_id, _cached_row(user_id), _parse_columns(columns))
+
+
+def _complete(supabase, user_id, row, wanted):
+    """`row` if it has every `wanted` column, else the row re-read and cached; None for no user."""
+    if row is not None and all(c in row for c in wanted):
+        return row
+    # Re-read everything we already know about this user plus what's missing,
+    # so the cached row never mixes old and new columns
+    select = list(row) if row else []
+    select += [c for c in wanted if c not in select]
+    fetched = supabase.table("users") \
+        .select(", ".join(select)) \
+        .eq("id", user_id) \
+        .single() \
+        .execute().data
+    if not fetched:
+        return None
+    _store(user_id, fetched)
+    return fetched
+
+
+async def aget_user(asupabase, user_id, *columns):
+    """
+    get_user() for the async handlers in asgi.py: same columns and shared TTL
+    cache, read through an async Supabase client. There's no per-request memo.
+    """
+    wanted = _parse_columns(columns)
+    row = _cached_row(user_id)
+
+    if row is None or any(c not in row for c in wanted):
+        select = list(row) if row else []
+        select += [c for c in wanted if c not in select]
+        response = await asupabase.table("users") \
+            .select(", ".join(select)) \
+            .eq("id", user_id) \
+            .single() \
+            .execute()
+        if not response.data:
+            return None
+        row = response.data
+        _store(user_id, row)
+
+    return {c: row.get(c) for c in wanted}
+
+
+def update_user(supabase, user_id, updates):
+    """Update the user's row and write the new values through to both caches."""
+    result = supabase.table("users").update(updates).eq("id", user_id).execute()
+
+    request_rows = _request_rows()
+    if user_id in request_rows:
+        request_rows[user_id].update(updates)
+    with _rows_lock:
+        entry = _rows.get(user_id)
+        if entry:
+            entry[0].update(updates)
+    return result
+
+
+def invalidate(user_id):
+    """Forget a user's cached row (e.g. after an admin edit)."""
+    _request_rows().pop(user_id, None)
+    with _rows_lock:
+        _rows.pop(user_id, None)
@@ -0,0 +1,374 @@
+import atexit
+import glob
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+import user_cache
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines
+    fcntl = None
+
+log = logging.getLogger(__name__)
+
+# 🪣 Write-behind buffer for coin grants
+#
+# A quiz ends with /api/reward, /api/streak-reward and /api/gain-exp all firing
+# at once, and each used to read the user's coins and write them back. Now coin
+# grants are added to an in-memory per-user delta and flushed later as ONE
+# apply_coin_batch RPC (an atomic `coins = coins + delta`, see
+# sql/apply_coin_batch.sql), either by the background flusher
+# FLUSH_INTERVAL_SECONDS after the first grant, or right before the user
+# spends coins. The grants of one level end arrive together, so a short
+# window is enough to send them as one batch.
+#
+# Pending coins live in the worker that granted them. Until the flush (about
+# FLUSH_INTERVAL_SECONDS) another gunicorn worker doesn't see them: balances
+# it shows are that much behind, and spend() there only succeeds on a retry
+# after SPEND_RETRY_SECONDS, by which time the granting worker has flushed.
+#
+# Every change is appended (and fsynced) to a journal file first, so pending
+# coins survive a worker restart: on start-up we replay journals left behind by
+# dead workers. Each flush gets a batch id that the RPC records, so replaying a
+# batch that already reached the database is a no-op.
+#
+# A journal is named after its process *and* a random id, so a new worker
+# that gets a dead worker's pid never mistakes that journal for its own. It
+# stays flock()ed while its worker lives. Adopting an orphan keeps that lock
+# until the orphan is deleted, and our journal records which orphans it took
+# over, so a crash halfway through never replays the same coins twice.
+
+FLUSH_INTERVAL_SECONDS = float(os.getenv("WRITE_BUFFER_FLUSH_SECONDS", "1"))
+# How long a refused purchase waits for other workers' pending coins (0: don't)
+SPEND_RETRY_SECONDS = float(os.getenv("WRITE_BUFFER_SPEND_RETRY_SECONDS", str(FLUSH_INTERVAL_SECONDS * 1.5)))
+JOURNAL_DIR = os.getenv("WRITE_BUFFER_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "instance", "write_buffer"))
+COMPACT_AFTER_LINES = 1000
+FSYNC = os.getenv("WRITE_BUFFER_FSYNC", "1") == "1"
+
+_lock = threading.RLock()
+_pending = {}           # user_id -> [coins, first_added_at]
+_batches = {}           # batch id -> (user_id, coins) sent but not confirmed
+_journal = None
+_journal_id = None      # random per process start, part of the journal's name
+_journal_lines = 0
+_supabase = None
+_flusher = None
+_stop = threading.Event()
+_atexit_registered = False
+
+
+# === Journal ===
+
+def _journal_path():
+    global _journal_id
+    if _journal_id is None:
+        _journal_id = uuid.uuid4().hex[:12]
+    return os.path.join(JOURNAL_DIR, f"coins-{os.getpid()}-{_journal_id}.journal")
+
+
+def _lock_file(f):
+    """Take f's flock without waiting; False when another live process holds it."""
+    if not fcntl:
+        return True
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except OSError:
+        return False
+
+
+def _sync(f):
+    f.flush()
+    if FSYNC:
+        os.fsync(f.fileno())
+
+
+def _sync_dir():
+    if FSYNC and hasattr(os, "O_DIRECTORY"):
+        fd = os.open(JOURNAL_DIR, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def _open_journal():
+    global _journal, _journal_lines
+    os.makedirs(JOURNAL_DIR, exist_ok=True)
+    _journal = open(_journal_path(), "a", encoding="utf-8")
+    _journal_lines = 0
+    # Held for the life of the process so other workers know we're alive
+    _lock_file(_journal)
+
+
+def _log(entry):
+    global _journal_lines
+    if _journal is None:
+        _open_journal()
+    _journal.write(json.dumps(entry, separators=(",", ":")) + "\n")
+    _sync(_journal)
+    _journal_lines += 1
+
+
+def _compact(adopted=()):
+    """
+    Rewrite our journal as just the current pending deltas and open batches,
+    plus an "adopted" marker for each orphan journal (by name) merged into them.
+    """
+    global _journal, _journal_lines
+    os.makedirs(JOURNAL_DIR, exist_ok=True)
+    path = _journal_path()
+    tmp = path + ".tmp"
+    f = open(tmp, "w", encoding="utf-8")
+    # Locked before it takes our journal's name, so nobody can adopt it in between
+    _lock_file(f)
+    for name in adopted:
+        f.write(json.dumps({"op": "adopted", "journal": name}) + "\n")
+    for user_id, (coins, _) in _pending.items():
+        f.write(json.dumps({"op": "add", "user": user_id, "coins": coins}) + "\n")
+    for batch_id, (user_id, coins) in _batches.items():
+        f.write(json.dumps({"op": "add", "user": user_id, "coins": coins}) + "\n")
+        f.write(json.dumps({"op": "batch", "id": batch_id, "user": user_id, "coins": coins}) + "\n")
+    _sync(f)
+    os.replace(tmp, path)
+    _sync_dir()
+    old, _journal, _journal_lines = _journal, f, 0
+    if old:
+        old.close()
+
+
+def _read_journal(path):
+    """
+    Replay a journal file into (pending {user: coins}, open batches {id: (user, coins)},
+    names of the journals it adopted).
+    """
+    pending, batches, adopted = {}, {}, set()
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # Torn last line from a crash
+            op = entry.get("op")
+            if op == "add":
+                pending[entry["user"]] = pending.get(entry["user"], 0) + entry["coins"]
+            elif op == "batch":
+                pending[entry["user"]] = pending.get(entry["user"], 0) - entry["coins"]
+                batches[entry["id"]] = (entry["user"], entry["coins"])
+            elif op == "done":
+                batches.pop(entry["id"], None)
+            elif op == "adopted":
+                adopted.add(entry["journal"])
+    return {u: c for u, c in pending.items() if c}, batches, adopted
+
+
+def _adopt_orphaned_journals():
+    """Take over journals from workers that are no longer running."""
+    orphans = {}  # name -> (locked file, pending, batches, adopted)
+    os.makedirs(JOURNAL_DIR, exist_ok=True)
+    # One worker adopts at a time, so two starting together never split a
+    # journal from the ones it adopted
+    guard = open(os.path.join(JOURNAL_DIR, "adopt.lock"), "a")
+    if fcntl:
+        fcntl.flock(guard.fileno(), fcntl.LOCK_EX)
+    try:
+        for path in sorted(glob.glob(os.path.join(JOURNAL_DIR, "coins-*.journal"))):
+            if path == _journal_path():
+                continue
+            f = open(path, "a+", encoding="utf-8")
+            try:
+                # Locked and still the file at `path`: another worker that adopted
+                # and deleted it first leaves us holding an unlinked inode
+                if _lock_file(f) and os.fstat(f.fileno()).st_ino == os.stat(path).st_ino:
+                    orphans[os.path.basename(path)] = (f, *_read_journal(path))
+                    continue
+            except OSError:
+                pass  # Deleted while we looked
+            f.close()
+
+        # A journal that crashed right after adopting others still lists them;
+        # their coins are already in it, so those files are only deleted
+        already = set().union(*(adopted for _, _, _, adopted in orphans.values()))
+        replay = {name: o for name, o in orphans.items() if name not in already}
+        if replay:
+            with _lock:
+                now = time.monotonic()
+                for _, pending, batches, _ in replay.values():
+                    for user_id, coins in pending.items():
+                        _pending.setdefault(user_id, [0, now])[0] += coins
+                    _batches.update(batches)
+                _compact(adopted=orphans)
+        for name in orphans:
+            os.remove(os.path.join(JOURNAL_DIR, name))
+        if orphans:
+            _sync_dir()
+        for name, (_, pending, batches, _) in replay.items():
+            log.info("Replayed coin journal %s: %s pending, %s unsent batches", name, len(pending), len(batches))
+    finally:
+        # Only now, with the orphans gone, let go of their locks
+        for f, _, _, _ in orphans.values():
+            f.close()
+        guard.close()
+
+
+# === Public API ===
+
+def add_coins(user_id, coins):
+    """Queue a coin grant for `user_id`."""
+    coins = int(coins)
+    if not coins:
+        return
+    with _lock:
+        _log({"op": "add", "user": user_id, "coins": coins})
+        entry = _pending.setdefault(user_id, [0, time.monotonic()])
+        entry[0] += coins
+
+
+def pending_coins(user_id):
+    """Coins granted to `user_id` that haven't reached the database yet."""
+    with _lock:
+        entry = _pending.get(user_id)
+        total = entry[0] if entry else 0
+        total += sum(c for u, c in _batches.values() if u == user_id)
+    return total
+
+
+def balance(supabase, user_id):
+    """The user's coins as they'll be once everything pending is flushed."""
+    user = user_cache.get_user(supabase, user_id, "coins")
+    if not user:
+        return None
+    return (user.get("coins") or 0) + pending_coins(user_id)
+
+
+def _send(supabase, batch_id, user_id, coins):
+    supabase.rpc("apply_coin_batch", {
+        "p_batch_id": batch_id,
+        "p_user_id": user_id,
+        "p_coins": coins
+    }).execute()
+    with _lock:
+        _batches.pop(batch_id, None)
+        _log({"op": "done", "id": batch_id})
+    # Our cached coins are now behind the database
+    user_cache.invalidate(user_id)
+
+
+def flush_user(supabase, user_id):
+    """Send this user's pending coins now (call before reading coins to spend them)."""
+    with _lock:
+        entry = _pending.pop(user_id, None)
+        retry = [(b, c) for b, (u, c) in _batches.items() if u == user_id]
+        if entry and entry[0]:
+            batch_id = str(uuid.uuid4())
+            _batches[batch_id] = (user_id, entry[0])
+            _log({"op": "batch", "id": batch_id, "user": user_id, "coins": entry[0]})
+            retry.append((batch_id, entry[0]))
+
+    for batch_id, coins in retry:
+        try:
+            _send(supabase, batch_id, user_id, coins)
+        except Exception as e:
+            # Batch stays in _batches and the journal, the flusher retries it
+            log.warning("Coin flush failed for %s: %s", user_id, e)
+
+
+def _spend(supabase, user_id, coins):
+    # Conditional decrement in the database (sql/spend_coins.sql), so it can't
+    # race other workers' coin batches or a second purchase
+    balance = supabase.rpc("spend_coins", {"p_user_id": user_id, "p_amount": int(coins)}).execute().data
+    if balance is None or (isinstance(balance, list) and not balance):
+        return None
+    return balance
+
+
+def spend(supabase, user_id, coins):
+    """
+    Take `coins` from the user if they can afford them (pending grants included);
+    returns the new balance, or None when they can't.
+    """
+    flush_user(supabase, user_id)
+    balance = _spend(supabase, user_id, coins)
+    if balance is None and SPEND_RETRY_SECONDS > 0:
+        # The coins may still be pending in the worker that granted them
+        time.sleep(SPEND_RETRY_SECONDS)
+        balance = _spend(supabase, user_id, coins)
+    if balance is None:
+        return None
+    user_cache.invalidate(user_id)
+    return int(balance)
+
+
+def flush_all(supabase, older_than=0):
+    """Flush every user whose oldest pending grant is at least `older_than` seconds old."""
+    now = time.monotonic()
+    with _lock:
+        due = {u for u, (_, added) in _pending.items() if now - added >= older_than}
+        due.update(u for u, _ in _batches.values())
+
+    for user_id in due:
+        flush_user(supabase, user_id)
+
+    with _lock:
+        if _journal_lines > COMPACT_AFTER_LINES:
+            _compact()
+
+
+def _run_flusher():
+    # Check a few times per interval, so grants go out close to FLUSH_INTERVAL_SECONDS
+    while not _stop.wait(FLUSH_INTERVAL_SECONDS / 4):
+        flush_all(_supabase, older_than=FLUSH_INTERVAL_SECONDS)
+
+
+def start(supabase):
+    """Start the background flusher for this worker (safe to call more than once)."""
+    global _supabase, _flusher, _atexit_registered
+    _supabase = supabase
+    with _lock:
+        if _flusher is not None:
+            return
+        if _journal is None:
+            _open_journal()
+        _adopt_orphaned_journals()
+        _flusher = threading.Thread(target=_run_flusher, name="coin-write-buffer", daemon=True)
+        _flusher.start()
+        if not _atexit_registered:
+            atexit.register(stop)
+            _atexit_registered = True
+
+
+def stop():
+    """Stop the flusher and push out everything that's left."""
+    _stop.set()
+    if _supabase is not None:
+        flush_all(_supabase)
+
+
+def _after_fork_in_child():
+    """
+    A preforking server (gunicorn --preload) imports the app in the master and
+    forks workers from it. The child must not share the master's journal or
+    rely on its flusher thread (threads don't survive fork), so it starts over
+    with its own journal and flusher.
+    """
+    global _lock, _journal, _journal_id, _journal_lines, _flusher, _stop
+    was_started = _flusher is not None
+    _lock = threading.RLock()
+    _pending.clear()    # Anything pending stays in the parent's journal
+    _batches.clear()
+    _journal = None
+    _journal_id = None
+    _journal_lines = 0
+    _flusher = None
+    _stop = threading.Event()
+    if was_started:
+        start(_supabase)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
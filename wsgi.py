@@ -0,0 +1,47 @@
+import logging
+import os
+
+import catalog_cache
+import question_sampler
+import services
+
+# 🚀 Production WSGI entry point
+#
+#   gunicorn -c gunicorn.conf.py            (settings live in gunicorn.conf.py)
+#
+# create_app() returns the Flask app with its log listener and coin write
+# buffer running, and this module then warms the per-worker content caches
+# (shop catalogs, question-ID pools; the reward / EXP tables are built on
+# import). With preload_app the master does this once before forking, so every
+# worker starts with warm caches shared copy-on-write instead of each one
+# hitting Supabase on its first requests.
+
+log = logging.getLogger(__name__)
+
+
+def warm_caches():
+    """Fill the global content caches. Uses a throwaway client so no pooled
+    connection from the master is inherited by forked workers."""
+    from supabase import create_client
+    client = create_client(services.SUPABASE_URL, services.SUPABASE_KEY)
+    try:
+        catalog_cache.get_items(client)
+        catalog_cache.get_avatars(client)
+        questions = question_sampler.warm(client)
+        log.info("Warmed caches: %s question ids, items and avatars", questions)
+    except Exception as e:
+        # A cold cache only costs a few queries later, don't refuse to boot
+        log.warning("Cache warm-up failed: %s", e)
+    finally:
+        client.postgrest.session.close()
+
+
+def create_app():
+    import app
+    flask_app = app.create_app()
+    if os.getenv("WARM_CACHES", "1") == "1":
+        warm_caches()
+    return flask_app
+
+
+app = create_app()